@@ -0,0 +1,68 @@
+"""Naklady na vytvoreni kontextu s loadery pro jeden dotaz.
+
+Porovnava puvodni createLoaders (nova trida pres type() pro kazdy dotaz)
+se soucasnym (rozlozeni spocitane jednou, slotted instance, loadery vznikaji az pri pouziti).
+
+spusteni (z korene repozitare):
+    python -m benchmarks.bench_loaders
+"""
+import timeit
+from functools import cache
+
+from uoishelpers.dataloaders import createIdLoader
+
+from src.DBDefinitions import BaseModel
+from src.Dataloaders import (
+    createLoadersContext,
+    createFkeyLoader,
+    getFkeyColumnNames,
+    AuthorizationCache
+)
+
+def legacyCreateLoaders(asyncSessionMaker):
+    "createLoaders before the layout was precomputed"
+    def createLambda(loaderName, DBModel):
+        return lambda self: createIdLoader(asyncSessionMaker, DBModel)
+
+    def createFkeyLambda(idLoaderName, DBModel, foreignKeyName):
+        return lambda self: createFkeyLoader(asyncSessionMaker, DBModel, foreignKeyName, idLoader=getattr(self, idLoaderName))
+
+    attrs = {}
+    for DBModel in BaseModel.registry.mappers:
+        cls = DBModel.class_
+        attrs[cls.__tablename__] = property(cache(createLambda(asyncSessionMaker, cls)))
+        attrs[cls.__name__] = attrs[cls.__tablename__]
+        for foreignKeyName in getFkeyColumnNames(cls):
+            attrs[f"{cls.__tablename__}_{foreignKeyName}"] = property(cache(createFkeyLambda(cls.__tablename__, cls, foreignKeyName)))
+            attrs[f"{cls.__name__}_{foreignKeyName}"] = attrs[f"{cls.__tablename__}_{foreignKeyName}"]
+
+    attrs["authorizations"] = property(cache(lambda self: AuthorizationCache()))
+    Loaders = type('Loaders', (), attrs)
+    return Loaders()
+
+def legacyCreateLoadersContext(asyncSessionMaker):
+    return {"loaders": legacyCreateLoaders(asyncSessionMaker)}
+
+# 👇 typicky dotaz pouzije jen nekolik loaderu
+usedLoaders = ["UserModel", "GroupModel", "RoleModel", "RoleModel_user_id", "memberships_user_id", "authorizations"]
+
+def request(createContext):
+    context = createContext(None)
+    loaders = context["loaders"]
+    for name in usedLoaders:
+        getattr(loaders, name)
+        getattr(loaders, name)
+    return context
+
+def main(number=2000):
+    for label, createContext in [
+        ("legacy (type() per request)", legacyCreateLoadersContext),
+        ("current (precomputed layout)", createLoadersContext)
+    ]:
+        createContext(None)
+        contextOnly = min(timeit.repeat(lambda: createContext(None), number=number, repeat=5)) / number
+        withUse = min(timeit.repeat(lambda: request(createContext), number=number, repeat=5)) / number
+        print(f"{label:32} context {contextOnly * 1e6:9.1f} us, context + {len(usedLoaders)} loaders {withUse * 1e6:9.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -13,32 +13,82 @@ from strawberry.asgi import GraphQL
 
 import logging
 import logging.handlers
-
-from src.GraphTypeDefinitions import schema
-from src.DBDefinitions import startEngine, ComposeConnectionString
-from src.DBFeeder import initDB
-from uoishelpers.authenticationMiddleware import createAuthentizationSentinel
+import queue
+import atexit
+import random
+import uuid
+import decimal
+import datetime
 
 # region logging setup
 
-logging.basicConfig(
-    level=logging.INFO, 
-    format='%(asctime)s.%(msecs)03d\t%(levelname)s:\t%(message)s', 
+# 👇 nemenne typy, zprava s takovymi argumenty muze byt slozena pozdeji (v jinem vlakne) se stejnym vysledkem
+DEFERRABLE_LOG_ARG_TYPES = (str, int, float, bool, type(None), bytes, uuid.UUID, datetime.datetime, datetime.date, decimal.Decimal)
+
+def isDeferrableLogArg(arg):
+    if isinstance(arg, tuple):
+        return all(isDeferrableLogArg(item) for item in arg)
+    return isinstance(arg, DEFERRABLE_LOG_ARG_TYPES)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Vklada zaznamy do fronty, zprava s nemennymi argumenty je slozena az ve vlakne QueueListener.
+    Zprava s jinymi argumenty (dict, ORM objekty, request, ...) je slozena hned jako v QueueHandler,
+    listener by jinak cetl objekt z jineho vlakna a v pozdejsim stavu.
+    """
+    def prepare(self, record):
+        if record.args and not isDeferrableLogArg(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # traceback musi byt vyrenderovan hned, pozdeji uz ramce neexistuji
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+logFormatter = logging.Formatter(
+    fmt='%(asctime)s.%(msecs)03d\t%(levelname)s:\t%(message)s', 
     datefmt='%Y-%m-%dT%I:%M:%S')
+logHandlers = [logging.StreamHandler()]
+
 SYSLOGHOST = os.getenv("SYSLOGHOST", None)
 if SYSLOGHOST is not None:
     [address, strport, *_] = SYSLOGHOST.split(':')
     assert len(_) == 0, f"SYSLOGHOST {SYSLOGHOST} has unexpected structure, try `localhost:514` or similar (514 is UDP port)"
     port = int(strport)
-    my_logger = logging.getLogger()
-    my_logger.setLevel(logging.INFO)
     handler = logging.handlers.SysLogHandler(address=(address, port), socktype=socket.SOCK_DGRAM)
     #handler = logging.handlers.SocketHandler('10.10.11.11', 611)
-    my_logger.addHandler(handler)
+    logHandlers.append(handler)
+
+for handler in logHandlers:
+    handler.setFormatter(logFormatter)
 
+# 👇 zapis (stdout, syslog pres UDP) probiha ve vlakne listeneru, dotaz jen vlozi zaznam do fronty
+logQueue = queue.SimpleQueue()
+logListener = logging.handlers.QueueListener(logQueue, *logHandlers, respect_handler_level=True)
+logListener.start()
+atexit.register(logListener.stop)
+
+my_logger = logging.getLogger()
+my_logger.setLevel(os.getenv("LOGLEVEL", "INFO"))
+my_logger.addHandler(DeferredQueueHandler(logQueue))
+
+# 👇 podil dotazu (0..1), pro ktere je na urovni DEBUG zalogovan cely kontext
+LOGCONTEXTSAMPLE = float(os.getenv("LOGCONTEXTSAMPLE", "0.01"))
+
+def sampleContextLog():
+    return my_logger.isEnabledFor(logging.DEBUG) and (random.random() < LOGCONTEXTSAMPLE)
 
 # endregion
 
+# 👇 az po nastaveni logovani, jinak prvni logging.info pri importu nastavi vychozi (synchronni) handler
+from src.GraphTypeDefinitions import schema
+from src.GraphTypeDefinitions._GraphExtensions import documentCache, queryHash
+from src.DBDefinitions import startEngine, ComposeConnectionString, ComposeReplicaConnectionString
+from src.DBFeeder import initDB
+from src.Readiness import initState
+from uoishelpers.authenticationMiddleware import createAuthentizationSentinel
+from src.Authentication import CachedSentinel
+
 # region DB setup
 
 ## Definice GraphQL typu (pomoci strawberry https://strawberry.rocks/)
@@ -75,9 +125,15 @@ async def RunOnceAndReturnSessionMaker():
     makeDrop = os.getenv("DEMODATA", None) in ["True", "true"]
     logging.info(f'starting engine for "{connectionString} makeDrop={makeDrop}"')
 
-    result = await startEngine(
-        connectionstring=connectionString, makeDrop=makeDrop, makeUp=True
-    )
+    initState.starting()
+    try:
+        result = await startEngine(
+            connectionstring=connectionString, makeDrop=makeDrop, makeUp=True,
+            replicaconnectionstring=ComposeReplicaConnectionString()
+        )
+    except Exception as e:
+        initState.failed(e)
+        raise
 
     logging.info(f"initializing system structures")
 
@@ -86,8 +142,9 @@ async def RunOnceAndReturnSessionMaker():
     # zde definujte do funkce asyncio.gather
     # vlozte asynchronni funkce, ktere maji data uvest do prvotniho konzistentniho stavu
     # await initDB(result)
-    coroutine = initDB(result)
-    asyncio.create_task(coroutine)
+    # 👇 dotazy, ktere potrebuji ciselniky, cekaji na initState (viz src.Caches), stav je na /health/ready
+    coroutine = initDB(result, onTable=initState.tableImported)
+    asyncio.create_task(initState.track(coroutine))
     
     #
     #
@@ -105,20 +162,48 @@ apolloQuery = "query __ApolloGetServiceDefinition__ { _service { sdl } }"
 graphiQLQuery = "\n    query IntrospectionQuery {\n      __schema {\n        \n        queryType { name }\n        mutationType { name }\n        subscriptionType { name }\n        types {\n          ...FullType\n        }\n        directives {\n          name\n          description\n          \n          locations\n          args(includeDeprecated: true) {\n            ...InputValue\n          }\n        }\n      }\n    }\n\n    fragment FullType on __Type {\n      kind\n      name\n      description\n      \n      fields(includeDeprecated: true) {\n        name\n        description\n        args(includeDeprecated: true) {\n          ...InputValue\n        }\n        type {\n          ...TypeRef\n        }\n        isDeprecated\n        deprecationReason\n      }\n      inputFields(includeDeprecated: true) {\n        ...InputValue\n      }\n      interfaces {\n        ...TypeRef\n      }\n      enumValues(includeDeprecated: true) {\n        name\n        description\n        isDeprecated\n        deprecationReason\n      }\n      possibleTypes {\n        ...TypeRef\n      }\n    }\n\n    fragment InputValue on __InputValue {\n      name\n      description\n      type { ...TypeRef }\n      defaultValue\n      isDeprecated\n      deprecationReason\n    }\n\n    fragment TypeRef on __Type {\n      kind\n      name\n      ofType {\n        kind\n        name\n        ofType {\n          kind\n          name\n          ofType {\n            kind\n            name\n            ofType {\n              kind\n              name\n              ofType {\n                kind\n                name\n                ofType {\n                  kind\n                  name\n                  ofType {\n                    kind\n                    name\n                  }\n                }\n              }\n            }\n          }\n        }\n      }\n    }\n  "
 roleTypeQuery = """query($limit: Int) {roleTypePage(limit: $limit) {id, name, nameEn}}"""
 
-sentinel = createAuthentizationSentinel(
-    JWTPUBLICKEY=JWTPUBLICKEYURL,
-    JWTRESOLVEUSERPATH=JWTRESOLVEUSERPATHURL,
-    queriesWOAuthentization=[apolloQuery, graphiQLQuery, roleTypeQuery],
-    onAuthenticationError=lambda item: JSONResponse({"data": None, "errors": ["Unauthenticated", item.query, f"{item.variables}"]}, 
-    status_code=401))
+queriesWOAuthentization = [apolloQuery, graphiQLQuery, roleTypeQuery]
+onAuthenticationError = lambda item: JSONResponse({"data": None, "errors": ["Unauthenticated", item.query, f"{item.variables}"]}, status_code=401)
+
+# 👇 autentizace jednou za dotaz, overene tokeny do jejich exp, verejny klic obnovovan na pozadi (viz lifespan)
+sentinel = CachedSentinel(
+    sentinel=createAuthentizationSentinel(
+        JWTPUBLICKEY=JWTPUBLICKEYURL,
+        JWTRESOLVEUSERPATH=JWTRESOLVEUSERPATHURL,
+        queriesWOAuthentization=queriesWOAuthentization,
+        onAuthenticationError=onAuthenticationError),
+    queriesWOAuthentization=queriesWOAuthentization,
+    onAuthenticationError=onAuthenticationError
+)
 
 # endregion
 
 # region FastAPI setup
 class Item(BaseModel):
-    query: str
+    query: str = None
     variables: dict = {}
     operationName: str = None
+    extensions: dict = {}
+
+def resolvePersistedQuery(item: Item):
+    """Apollo Automatic Persisted Queries (https://www.apollographql.com/docs/apollo-server/performance/apq/).
+    Klient posle jen extensions.persistedQuery.sha256Hash, text dotazu se vezme z documentCache.
+    Pokud hash neni znam, vraci se PersistedQueryNotFound a klient dotaz zopakuje i s textem,
+    ktery se pri provedeni ulozi do documentCache.
+    Vraci None, nebo odpoved s chybou.
+    """
+    persistedQuery = (item.extensions or {}).get("persistedQuery", None)
+    if not persistedQuery:
+        return None
+    sha256Hash = persistedQuery.get("sha256Hash", None)
+    if item.query is None:
+        query = documentCache.getQuery(sha256Hash) if sha256Hash else None
+        if query is None:
+            return {"data": None, "errors": [{"message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]}
+        item.query = query
+    elif sha256Hash != queryHash(item.query):
+        return {"data": None, "errors": [{"message": "provided sha does not match query", "extensions": {"code": "BAD_REQUEST"}}]}
+    return None
 
 async def get_context(request: Request):
     asyncSessionMaker = await RunOnceAndReturnSessionMaker()
@@ -129,21 +214,25 @@ async def get_context(request: Request):
     i = Item(query = "")
     # i.query = ""
     # i.variables = {}
-    logging.info(f"before sentinel current user is {request.scope.get('user', None)}")
+    logging.debug("before sentinel current user is %s", request.scope.get('user', None))
+    # 👇 pokud uz sentinel v ramci dotazu probehl (apollo_gql), znovu se neoveruje
     await sentinel(request, i)
-    logging.info(f"after sentinel current user is {request.scope.get('user', None)}")
+    logging.debug("after sentinel current user is %s", request.scope.get('user', None))
     # connectionContext = createUgConnectionContext(request=request)
     # result = {**context, **connectionContext}
     result = {**context}
     result["request"] = request
     result["user"] = request.scope.get("user", None)
-    logging.info(f"context created {result}")
+    if sampleContextLog():
+        logging.debug("context created %s", result)
     return result
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     initizalizedEngine = await RunOnceAndReturnSessionMaker()
+    publicKeyRefresh = asyncio.create_task(sentinel.refreshPublicKey())
     yield
+    publicKeyRefresh.cancel()
 
 app = FastAPI(lifespan=lifespan)
 # app.mount("/gql", graphql_app)
@@ -164,25 +253,33 @@ async def graphiql(request: Request):
 async def apollo_gql(request: Request, item: Item):
     DEMOE = os.getenv("DEMO", None)
 
+    # 👇 az po doplneni textu dotazu, sentinel porovnava text s dotazy bez autentizace
+    persistedQueryError = resolvePersistedQuery(item)
+    if persistedQueryError:
+        return persistedQueryError
+
     sentinelResult = await sentinel(request, item)
     if DEMOE in ["False", "false"]:
         if sentinelResult:
-            logging.info(f"sentinel test failed for query={item} \n request={request}")
-            print(f"sentinel test failed for query={item} \n request={request}")
+            logging.info("sentinel test failed for query=%s \n request=%s", item, request)
             return sentinelResult
-        logging.info(f"sentinel test passed for query={item} for user {request.scope.get('user', None)}")
-    else:
+        logging.debug("sentinel test passed for query=%s for user %s", item, request.scope.get('user', None))
+    elif not sentinel.isAuthenticated(request):
         request.scope["user"] = {"id": "2d9dc5ca-a4a2-11ed-b9df-0242ac120003"}
-        logging.info(f"sentinel skippend because of DEMO mode for query={item} for user {request.scope['user']}")
+        logging.debug("sentinel skippend because of DEMO mode for query=%s for user %s", item, request.scope['user'])
+    else:
+        logging.debug("DEMO mode, query=%s for authenticated user %s", item, request.scope['user'])
     try:
         context = await get_context(request)
         schemaresult = await schema.execute(query=item.query, variable_values=item.variables, operation_name=item.operationName, context_value=context)
     except Exception as e:
-        logging.info(f"error during schema execute {e}")
+        logging.info("error during schema execute %s", e)
         return {"data": None, "errors": [{f"{type(e).__name__}": "{e}"}]}
     
     # logging.info(f"schema execute result \n{schemaresult}")
     result = {"data": schemaresult.data}
+    if schemaresult.extensions:
+        result["extensions"] = schemaresult.extensions
     if schemaresult.errors:
         result["errors"] = [
             {
@@ -197,6 +294,36 @@ async def apollo_gql(request: Request, item: Item):
             } for error in schemaresult.errors]
     return result
 
+@app.get("/health/ready")
+async def healthReady():
+    "200 az je databaze inicializovana (initDB dobehl), jinak 503, vhodne pro readinessProbe"
+    return JSONResponse(initState.asDict(), status_code=200 if initState.state == "ready" else 503)
+
+from fastapi.responses import StreamingResponse
+from src.Export import exportModels, exportNDJSON, isAdmin
+
+@app.get("/export/{entity}")
+async def export(request: Request, entity: str):
+    """Cela tabulka (users, groups, memberships, roles) jako NDJSON stream, jen pro administratory."""
+    DBModel = exportModels.get(entity, None)
+    if DBModel is None:
+        return JSONResponse({"errors": [f"unknown entity {entity}, use one of {list(exportModels.keys())}"]}, status_code=404)
+
+    DEMOE = os.getenv("DEMO", None)
+    sentinelResult = await sentinel(request, Item(query=f"export {entity}"))
+    if DEMOE in ["False", "false"]:
+        if sentinelResult:
+            return sentinelResult
+    elif not sentinel.isAuthenticated(request):
+        request.scope["user"] = {"id": "2d9dc5ca-a4a2-11ed-b9df-0242ac120003"}
+
+    context = await get_context(request)
+    if not await isAdmin(context):
+        logging.info("export of %s refused for user %s", entity, context["user"])
+        return JSONResponse({"errors": ["Forbidden"]}, status_code=403)
+    asyncSessionMaker = context["loaders"].asyncSessionMaker
+    return StreamingResponse(exportNDJSON(asyncSessionMaker, DBModel), media_type="application/x-ndjson")
+
 logging.info("All initialization is done")
 
 # @app.get('/hello')
@@ -0,0 +1,134 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+import jwt
+from starlette.authentication import AuthenticationError
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+JWTPUBLICKEY_REFRESH = float(os.getenv("JWTPUBLICKEY_REFRESH", "300"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+def getToken(request):
+    "jwt z cookies authorization nebo z hlavicky Authorization: Bearer (stejne jako sentinel)"
+    token = request.cookies.get("authorization", None)
+    if token is None:
+        header = request.headers.get("Authorization", None)
+        if header is not None and header.startswith("Bearer "):
+            token = header[len("Bearer "):]
+    return token
+
+def tokenExpiresAt(claims, ttl=AUTH_CACHE_TTL):
+    """Do kdy lze overenou identitu pamatovat: exp z tokenu,
+    bez exp podle expires_in (od iat, jinak od ted), jinak ted + ttl.
+    """
+    exp = claims.get("exp", None)
+    if exp is not None:
+        return exp
+    now = time.time()
+    expiresIn = claims.get("expires_in", None)
+    if expiresIn is not None:
+        return claims.get("iat", now) + float(expiresIn)
+    return now + ttl
+
+class TokenCache:
+    """Overene identity podle tokenu (klicem je sha256 tokenu, token samotny se nedrzi).
+    Polozka plati do exp z tokenu (viz tokenExpiresAt), pocet polozek je omezen (LRU).
+    """
+    def __init__(self, maxsize=AUTH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token):
+        key = self.key(token)
+        item = self._items.get(key, None)
+        if item is None:
+            return None
+        (expiresAt, user) = item
+        if expiresAt <= time.time():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return user
+
+    def put(self, token, user, expiresAt):
+        if self.maxsize <= 0 or expiresAt is None or expiresAt <= time.time():
+            return
+        key = self.key(token)
+        self._items[key] = (expiresAt, user)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self):
+        self._items.clear()
+
+class CachedSentinel:
+    """Obal nad sentinelem z uoishelpers.
+    - autentizace probehne nejvyse jednou za dotaz (vysledek je v request.scope["authenticated"]),
+    - overena identita se pamatuje podle tokenu az do jeho exp (bez exp podle expires_in, jinak AUTH_CACHE_TTL),
+    - verejny klic muze byt obnovovan na pozadi (refreshPublicKey), overeni pak na autoritu neceka.
+    """
+    def __init__(self, sentinel, queriesWOAuthentization, onAuthenticationError, tokenCache=None):
+        self.sentinel = sentinel
+        self.queriesWOAuthentization = queriesWOAuthentization
+        self.onAuthenticationError = onAuthenticationError
+        self.tokenCache = TokenCache() if tokenCache is None else tokenCache
+
+    def isAuthenticated(self, request):
+        return request.scope.get("authenticated", False)
+
+    async def authenticate(self, request):
+        scope = request.scope
+        authenticated = scope.get("authenticated", None)
+        if authenticated is not None:
+            if not authenticated:
+                raise AuthenticationError("not authenticated")
+            return
+
+        token = getToken(request)
+        user = None if token is None else self.tokenCache.get(token)
+        if user is not None:
+            scope["jwt"] = token
+            scope["user"] = {**user}
+            scope["authenticated"] = True
+            return
+
+        try:
+            await self.sentinel.authenticate(request=request)
+        except Exception:
+            scope["authenticated"] = False
+            raise
+        scope["authenticated"] = True
+        token = scope["jwt"]
+        # 👇 podpis uz overil sentinel, zde se jen cte exp
+        claims = jwt.decode(token, options={"verify_signature": False})
+        self.tokenCache.put(token, {**scope["user"]}, tokenExpiresAt(claims))
+
+    async def __call__(self, request, item):
+        try:
+            await self.authenticate(request)
+        except Exception as e:
+            if item.query in self.queriesWOAuthentization:
+                logging.debug("sentinel: free access to %s", item.query)
+                return None
+            logging.info("sentinel: unauthorized access (%s)", e)
+            return self.onAuthenticationError(item)
+        return None
+
+    async def refreshPublicKey(self, interval=JWTPUBLICKEY_REFRESH):
+        "periodicky obnovuje verejny klic, spoustet jako task (viz lifespan v main.py)"
+        while True:
+            try:
+                await self.sentinel.getPublicKey()
+                logging.debug("public key refreshed")
+            except Exception as e:
+                logging.warning("public key refresh failed: %s", e)
+            await asyncio.sleep(interval)
@@ -0,0 +1,270 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from src.Readiness import initState
+
+from src.DBDefinitions import (
+    RoleTypeModel,
+    GroupTypeModel,
+    RoleCategoryModel,
+    StatemachineTypeModel,
+    StateModel,
+    RoleTypeListModel
+)
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+USERROLES_CACHE_TTL = float(os.getenv("USERROLES_CACHE_TTL", "10"))
+USERROLES_CACHE_SIZE = int(os.getenv("USERROLES_CACHE_SIZE", "1000"))
+RBACKINDS_CACHE_SIZE = int(os.getenv("RBACKINDS_CACHE_SIZE", "100000"))
+STATEMATRIX_CACHE_TTL = float(os.getenv("STATEMATRIX_CACHE_TTL", "300"))
+
+class SingleFlight:
+    """Nejvyse jedno soubezne nacitani pro danou generaci pameti.
+    Soubezni zadatele (studena pamet, vyprseny ttl) cekaji na jeden sdileny future, nespousti vlastni dotaz.
+    Po invalidate (jina generace) se zacne nacitat znovu.
+    """
+    def __init__(self):
+        self._future = None
+        self._generation = None
+
+    async def run(self, generation, load):
+        future = self._future
+        if (future is None) or (self._generation != generation):
+            future = asyncio.ensure_future(load())
+            future.add_done_callback(self._forget)
+            self._future = future
+            self._generation = generation
+        # 👇 shield, zruseni jednoho cekajiciho nesmi zrusit nacitani pro ostatni
+        return await asyncio.shield(future)
+
+    def _forget(self, future):
+        if self._future is future:
+            self._future = None
+
+class CatalogCache:
+    """Procesova pamet pro male systemove ciselniky (typy roli, typy skupin, ...).
+    Drzi vsechny radky jako dict {"id", "name", "name_en"} s indexy podle id a podle name.
+    Obsah je platny do vyprseni ttl, nebo do zvyseni generation (invalidate),
+    ktere provadeji mutace nad prislusnym ciselnikem.
+    """
+    def __init__(self, DBModel, ttl=CATALOG_CACHE_TTL):
+        self.DBModel = DBModel
+        self.ttl = ttl
+        self.generation = 0
+        self._loadedGeneration = None
+        self._expiresAt = 0
+        self._items = []
+        self._byId = {}
+        self._byName = {}
+        self._loading = SingleFlight()
+
+    def invalidate(self):
+        self.generation += 1
+        logging.info("catalog %s invalidated, generation %s", self.DBModel.__tablename__, self.generation)
+
+    def isValid(self):
+        return (self._loadedGeneration == self.generation) and (time.monotonic() < self._expiresAt)
+
+    async def _ensure(self, info):
+        if self.isValid():
+            return
+        # 👇 behem initDB by se nacetl (a zapamatoval) jen cast ciselniku
+        await initState.waitReady()
+        if self.isValid():
+            return
+        await self._loading.run(self.generation, lambda: self._load(info))
+
+    async def _load(self, info):
+        from src.Dataloaders import getLoadersFromInfo
+        generation = self.generation
+        loader = getattr(getLoadersFromInfo(info), self.DBModel.__name__)
+        rows = await loader.execute_select(select(self.DBModel))
+        items = [{"id": row.id, "name": row.name, "name_en": row.name_en} for row in rows]
+        if generation != self.generation:
+            # 👇 behem nacitani doslo ke zmene, vysledek se pouzije, ale neulozi jako platny
+            self._expiresAt = 0
+        else:
+            self._expiresAt = time.monotonic() + self.ttl
+        self._loadedGeneration = generation
+        self._items = items
+        self._byId = {item["id"]: item for item in items}
+        self._byName = {item["name"]: item for item in items}
+        logging.info("catalog %s loaded, %s items", self.DBModel.__tablename__, len(items))
+
+    async def all(self, info):
+        await self._ensure(info)
+        return self._items
+
+    async def byId(self, info):
+        "returns dict id -> item"
+        await self._ensure(info)
+        return self._byId
+
+    async def byName(self, info):
+        "returns dict name -> item"
+        await self._ensure(info)
+        return self._byName
+
+    async def get(self, info, id):
+        index = await self.byId(info)
+        return index.get(id, None)
+
+    async def getByName(self, info, name):
+        index = await self.byName(info)
+        return index.get(name, None)
+
+roleTypeCache = CatalogCache(RoleTypeModel)
+groupTypeCache = CatalogCache(GroupTypeModel)
+roleCategoryCache = CatalogCache(RoleCategoryModel)
+statemachineTypeCache = CatalogCache(StatemachineTypeModel)
+
+class UserRolesCache:
+    """Procesova pamet roli uzivatelu (vysledek RBACPermission.getUserRoles) sdilena mezi dotazy.
+    Polozka plati ttl sekund, pocet polozek je omezen (LRU), mutace roli polozky zneplatnuji.
+    Polozka nese generaci ciselniku typu roli, po zmene typu roli je neplatna.
+    Kazde invalidate zvysi version, put s version prectenou pred nactenim roli se po invalidate zahodi
+    (nacteni zacate pred mutaci by jinak ulozilo stare role).
+    """
+    def __init__(self, ttl=USERROLES_CACHE_TTL, maxsize=USERROLES_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.version = 0
+        self._items = OrderedDict()
+
+    def get(self, user_id, generation=None):
+        item = self._items.get(user_id, None)
+        if item is None:
+            return None
+        (expiresAt, itemGeneration, roles) = item
+        if (expiresAt < time.monotonic()) or (itemGeneration != generation):
+            del self._items[user_id]
+            return None
+        self._items.move_to_end(user_id)
+        return roles
+
+    def put(self, user_id, roles, generation=None, version=None):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        if (version is not None) and (version != self.version):
+            return
+        self._items[user_id] = (time.monotonic() + self.ttl, generation, roles)
+        self._items.move_to_end(user_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        self.version += 1
+        if user_id is None:
+            self._items.clear()
+        else:
+            self._items.pop(user_id, None)
+
+userRolesCache = UserRolesCache()
+
+class RBACObjectKinds:
+    """Index id -> druh RBAC objektu ("user" nebo "group"), omezeny pocet polozek (LRU).
+    Druh entity se pro dane id nemeni, polozka se odstranuje jen pokud entita zanikla.
+    """
+    def __init__(self, maxsize=RBACKINDS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, id):
+        kind = self._items.get(id, None)
+        if kind is not None:
+            self._items.move_to_end(id)
+        return kind
+
+    def put(self, id, kind):
+        if self.maxsize <= 0:
+            return
+        self._items[id] = kind
+        self._items.move_to_end(id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, id=None):
+        if id is None:
+            self._items.clear()
+        else:
+            self._items.pop(id, None)
+
+rbacObjectKinds = RBACObjectKinds()
+
+class StatePermissionMatrix:
+    """Matice (state_id, access) -> frozenset(roletype_id), access je "read" (readerslist_id) nebo "write" (writerslist_id).
+    Nacita se cela najednou (stavy + seznamy typu roli), plati do vyprseni ttl, nebo do invalidate,
+    ktere provadeji mutace stavu, prechodu a seznamu typu roli.
+    Zmeny z jinych procesu (repliky, primo v DB) se invalidate nedozvi, ttl je tedy mez jejich zastaralosti.
+    Jen neznamy stav (zalozeny jinde) vede hned k jednomu znovunacteni matice, teprve pak se pristup odepre.
+    """
+    def __init__(self, ttl=STATEMATRIX_CACHE_TTL):
+        self.ttl = ttl
+        self.generation = 0
+        self._loadedGeneration = None
+        self._expiresAt = 0
+        self._matrix = {}
+        self._missed = set()
+        self._loading = SingleFlight()
+
+    def invalidate(self):
+        self.generation += 1
+        logging.info("state permission matrix invalidated, generation %s", self.generation)
+
+    def isValid(self):
+        return (self._loadedGeneration == self.generation) and (time.monotonic() < self._expiresAt)
+
+    async def _ensure(self, info):
+        if self.isValid():
+            return
+        await initState.waitReady()
+        if self.isValid():
+            return
+        await self._loading.run(self.generation, lambda: self._load(info))
+
+    async def _load(self, info):
+        from src.Dataloaders import getLoadersFromInfo
+        generation = self.generation
+        loaders = getLoadersFromInfo(info)
+        states = await loaders.StateModel.execute_select(select(StateModel))
+        items = await loaders.RoleTypeListModel.execute_select(select(RoleTypeListModel))
+        lists = {}
+        for item in items:
+            lists.setdefault(item.list_id, set()).add(item.type_id)
+        matrix = {}
+        for state in states:
+            matrix[(state.id, "read")] = frozenset(lists.get(state.readerslist_id, ()))
+            matrix[(state.id, "write")] = frozenset(lists.get(state.writerslist_id, ()))
+        self._expiresAt = 0 if generation != self.generation else time.monotonic() + self.ttl
+        self._loadedGeneration = generation
+        self._matrix = matrix
+        self._missed = set()
+        logging.info("state permission matrix loaded, %s states", len(matrix) // 2)
+
+    async def roletypeIds(self, info, state_id, access):
+        "frozenset id typu roli, ktere maji pro stav state_id pristup access (read / write)"
+        await self._ensure(info)
+        roletypeIds = self._matrix.get((state_id, access), None)
+        if (roletypeIds is None) and (state_id not in self._missed):
+            # 👇 soubezne dotazy na neznamy stav zneplatni matici jen jednou a cekaji na stejne nacteni
+            if self._loadedGeneration == self.generation:
+                self.invalidate()
+            await self._ensure(info)
+            self._missed.add(state_id)
+            roletypeIds = self._matrix.get((state_id, access), None)
+        return frozenset() if roletypeIds is None else roletypeIds
+
+statePermissionMatrix = StatePermissionMatrix()
+
+def resetCaches():
+    "drops content of all process caches (e.g. database has been (re)initialized)"
+    for catalog in [roleTypeCache, groupTypeCache, roleCategoryCache, statemachineTypeCache]:
+        catalog.invalidate()
+    userRolesCache.invalidate()
+    rbacObjectKinds.invalidate()
+    statePermissionMatrix.invalidate()
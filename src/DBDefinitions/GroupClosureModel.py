@@ -0,0 +1,29 @@
+import sqlalchemy
+from sqlalchemy import (
+    Column,
+    Integer,
+    Index,
+    UniqueConstraint
+)
+
+from .UUID import UUIDColumn, UUIDFKey
+from .Base import BaseModel
+
+class GroupClosureModel(BaseModel):
+    """Udrzuje tranzitivni uzaver stromu skupin (predek, potomek, vzdalenost)
+    Kazda skupina ma radek sama se sebou (depth=0), dvojice (predek, potomek) je unikatni.
+    Tabulka je odvozena z groups.mastergroup_id, lze ji kdykoliv znovu sestavit (src.GroupTree.rebuildGroupClosure)
+    """
+
+    __tablename__ = "groupclosures"
+
+    id = UUIDColumn()
+    ancestor_id = UUIDFKey(nullable=False, comment="group which is above (or same as) descendant")
+    descendant_id = UUIDFKey(nullable=False, comment="group which is below (or same as) ancestor")
+    depth = Column(Integer, nullable=False, comment="number of mastergroup hops between ancestor and descendant")
+
+    __table_args__ = (
+        UniqueConstraint("ancestor_id", "descendant_id", name="uq_groupclosures_ancestor_descendant"),
+        Index("ix_groupclosures_descendant_depth", "descendant_id", "depth"),
+        Index("ix_groupclosures_ancestor_depth", "ancestor_id", "depth"),
+    )
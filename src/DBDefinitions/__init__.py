@@ -16,6 +16,7 @@ from .RoleModel import (
     RoleCategoryModel
 )
 from .RoleTypeListModel import RoleTypeListModel
+from .GroupClosureModel import GroupClosureModel
 
 from .StateTransitionModel import StateTransitionModel
 from .StateMachineModel import (
@@ -73,13 +74,59 @@ def startSyncEngine(connectionstring=None) -> Session:
     return sessionMaker
 
 
-async def startEngine(connectionstring=None, makeDrop=False, makeUp=True) -> AsyncSession:
+class RoutingSessionMaker:
+    """SessionMaker nad primarni DB a read replikou.
+    Primo volany vraci session na primarni DB (inicializace, feeder).
+    forRequest() vraci pohled pro jeden dotaz, ktery cte z repliky, dokud neni pripnut na primarni DB.
+    """
+    def __init__(self, primary, replica):
+        self.primary = primary
+        self.replica = replica
+
+    def __call__(self, **kwargs):
+        return self.primary(**kwargs)
+
+    @property
+    def kw(self):
+        return self.primary.kw
+
+    def forRequest(self):
+        return RequestSessionMaker(self)
+
+class RequestSessionMaker:
+    """Pohled na RoutingSessionMaker pro jeden dotaz.
+    Po pinToPrimary (mutace) jdou vsechny dalsi session dotazu na primarni DB (read-your-writes).
+    """
+    __slots__ = ("router", "pinned")
+
+    def __init__(self, router):
+        self.router = router
+        self.pinned = False
+
+    def pinToPrimary(self):
+        self.pinned = True
+
+    @property
+    def current(self):
+        return self.router.primary if self.pinned else self.router.replica
+
+    def __call__(self, **kwargs):
+        return self.current(**kwargs)
+
+    @property
+    def kw(self):
+        return self.current.kw
+
+async def startEngine(connectionstring=None, makeDrop=False, makeUp=True, replicaconnectionstring=None) -> AsyncSession:
     if connectionstring is None:
         connectionstring = ComposeConnectionString()
     global dbInitIsDone
-    """Provede nezbytne ukony a vrati asynchronni SessionMaker"""
-    asyncEngine = create_async_engine(connectionstring, pool_pre_ping=True)
+    """Provede nezbytne ukony a vrati asynchronni SessionMaker.
+    Je-li zadan replicaconnectionstring, vraci RoutingSessionMaker (cteni dotazu jde na repliku).
+    """
+    asyncEngine = create_async_engine(connectionstring, **ComposeEngineOptions(connectionstring))
     # pool_size=20, max_overflow=10, pool_recycle=60) #pool_pre_ping=True, pool_recycle=3600
+    exposePoolMetrics(asyncEngine.pool, poolName="primary")
 
     async with asyncEngine.begin() as conn:
         if makeDrop:
@@ -98,6 +145,13 @@ async def startEngine(connectionstring=None, makeDrop=False, makeUp=True) -> Asy
     async_sessionMaker = sessionmaker(
         asyncEngine, expire_on_commit=False, class_=AsyncSession
     )
+    if replicaconnectionstring is not None:
+        replicaEngine = create_async_engine(replicaconnectionstring, **ComposeEngineOptions(replicaconnectionstring, poolName="replica"))
+        exposePoolMetrics(replicaEngine.pool, poolName="replica")
+        replica_sessionMaker = sessionmaker(
+            replicaEngine, expire_on_commit=False, class_=AsyncSession
+        )
+        async_sessionMaker = RoutingSessionMaker(primary=async_sessionMaker, replica=replica_sessionMaker)
     return async_sessionMaker
 
 
@@ -138,3 +192,82 @@ def ComposeConnectionString():
     print(connectionstring)
     return connectionstring
 
+def ComposeReplicaConnectionString():
+    """connectionString pro read repliku, stejne prihlasovaci udaje jako primarni DB, host z POSTGRES_REPLICA_HOST.
+    Vraci None, pokud replika neni nastavena.
+    """
+    replicaHostWithPort = os.environ.get("POSTGRES_REPLICA_HOST", None)
+    if replicaHostWithPort is None:
+        return None
+    user = os.environ.get("POSTGRES_USER", "postgres")
+    password = os.environ.get("POSTGRES_PASSWORD", "example")
+    database = os.environ.get("POSTGRES_DB", "data")
+    isCockroach = os.environ.get("IS_COCKROACH", "False")
+
+    if isCockroach == "True":
+        return f"cockroachdb+asyncpg://{user}:{password}@{replicaHostWithPort}/{database}?ssl=disable"
+    return f"postgresql+asyncpg://{user}:{password}@{replicaHostWithPort}/{database}"
+
+
+
+def ComposeEngineOptions(connectionstring, poolName="primary"):
+    """Odvozuje parametry async engine (pool, cache prepared statements) z promennych prostredi.
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE (sekundy, -1 = bez recyklace),
+    DB_POOL_PRE_PING (True/False), DB_STATEMENT_CACHE_SIZE, DB_PREPARED_STATEMENT_CACHE_SIZE (jen asyncpg)
+    poolName je label metrik poolu (primary / replica).
+    """
+    options = {
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "True") in ["True", "true"]
+    }
+    if not connectionstring.startswith("sqlite"):
+        # 👇 sqlite (testy) pouziva pool, ktery tyto parametry nema
+        options["poolclass"] = instrumentedPoolClass(poolName)
+        options["pool_size"] = int(os.environ.get("DB_POOL_SIZE", "5"))
+        options["max_overflow"] = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+        options["pool_timeout"] = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+        options["pool_recycle"] = int(os.environ.get("DB_POOL_RECYCLE", "-1"))
+    if "+asyncpg" in connectionstring:
+        options["connect_args"] = {
+            "statement_cache_size": int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100")),
+            "prepared_statement_cache_size": int(os.environ.get("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+        }
+    return options
+
+import time
+from functools import cache
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from prometheus_client import Gauge, Histogram
+
+# 👇 label pool: primary nebo replica (read replika, viz RoutingSessionMaker)
+poolCheckedOut = Gauge("db_pool_checked_out", "connections currently checked out from the pool", ["pool"], namespace="gql_ug")
+poolOverflow = Gauge("db_pool_overflow", "connections opened above pool_size", ["pool"], namespace="gql_ug")
+poolSize = Gauge("db_pool_size", "configured pool size", ["pool"], namespace="gql_ug")
+poolCheckoutSeconds = Histogram(
+    "db_pool_checkout_seconds", "time spent waiting for a connection from the pool (including pre ping)", ["pool"], namespace="gql_ug",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, ktery meri dobu ziskani spojeni, poolName je hodnota labelu pool (viz instrumentedPoolClass)"""
+    poolName = "primary"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            poolCheckoutSeconds.labels(self.poolName).observe(time.perf_counter() - start)
+
+@cache
+def instrumentedPoolClass(poolName):
+    "trida poolu s danym labelem (pool.recreate() vytvari instanci stejne tridy, label se tak neztrati)"
+    if poolName == InstrumentedAsyncQueuePool.poolName:
+        return InstrumentedAsyncQueuePool
+    return type(f"InstrumentedAsyncQueuePool_{poolName}", (InstrumentedAsyncQueuePool,), {"poolName": poolName})
+
+def exposePoolMetrics(pool, poolName="primary"):
+    "binds /metrics gauges to the pool (only QueuePool based pools provide the numbers)"
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return
+    poolCheckedOut.labels(poolName).set_function(pool.checkedout)
+    poolOverflow.labels(poolName).set_function(lambda: max(pool.overflow(), 0))
+    poolSize.labels(poolName).set_function(pool.size)
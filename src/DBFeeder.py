@@ -933,7 +933,213 @@ def get_demodata():
 
     return jsonData
 
-async def initDB(asyncSessionMaker):
+import re
+import time
+import logging
+from sqlalchemy import insert, select, DateTime, Uuid
+
+DEMODATA_BATCH_SIZE = int(os.getenv("DEMODATA_BATCH_SIZE", "1000"))
+
+_whitespace = re.compile(r"\s*")
+_decoder = json.JSONDecoder()
+
+class JsonStream:
+    "cteni json hodnot ze souboru po blocich (raw_decode nad bufferem)"
+    def __init__(self, f, blockSize):
+        self.f = f
+        self.blockSize = blockSize
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        "nacte dalsi blok, False na konci souboru"
+        if self.eof:
+            return False
+        block = self.f.read(self.blockSize)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        "dalsi nebily znak ("" na konci souboru), pozice se za nej neposouva"
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if (char == "") or (char not in chars):
+            raise ValueError(f"json: expected one of {chars!r}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                (value, end) = _decoder.raw_decode(self.buffer, self.pos)
+                # 👇 cislo na konci bufferu muze pokracovat v dalsim bloku (napr. "-3." z "-3.5e10")
+                if self.eof or ((end < len(self.buffer)) and (self.buffer[end] not in "0123456789.eE+-")):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+def iterJsonTables(path, tableNames=None, blockSize=1 << 16):
+    """Postupne cte json tvaru {"tabulka": [radek, ...], ...} a vraci dvojice (tabulka, radek).
+    Radky se parsuji po jednom, soubor neni v pameti cely, radky tabulek mimo tableNames se zahodi hned.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        stream = JsonStream(f, blockSize)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            tableName = stream.value()
+            stream.expect(":")
+            wanted = (tableNames is None) or (tableName in tableNames)
+            if stream.peek() == "[":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.expect("]")
+                else:
+                    while True:
+                        row = stream.value()
+                        if wanted:
+                            yield (tableName, row)
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                stream.value()
+            if stream.expect(",}") == "}":
+                break
+
+def toDateTime(value):
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=None)
+
+def toUUID(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(value)
+
+def columnConverter(column):
+    if isinstance(column.type, Uuid):
+        return toUUID
+    if isinstance(column.type, DateTime):
+        return toDateTime
+    return None
+
+def convertRows(DBModel, rows):
+    """Radky z jsonu na dicty pro insert, prevadi se po sloupcich podle typu sloupce v modelu.
+    Klice mimo model a hodnoty None se vynechavaji (jako ImportModels),
+    chybejici sloupce s python defaultem (id, valid, ...) se doplni, aby COPY dostalo stejne hodnoty jako ORM.
+    """
+    result = [{} for _ in rows]
+    for column in DBModel.__table__.columns:
+        name = column.name
+        convert = columnConverter(column)
+        for (row, target) in zip(rows, result):
+            value = row.get(name, None)
+            if (value is None) or (convert is not None and value == ""):
+                continue
+            if convert is not None:
+                try:
+                    value = convert(value)
+                except ValueError:
+                    logging.warning("%s.%s: cannot convert %r", DBModel.__tablename__, name, value)
+                    continue
+            target[name] = value
+        default = column.default
+        if default is not None and (default.is_scalar or default.is_callable):
+            for target in result:
+                if name not in target:
+                    target[name] = default.arg if default.is_scalar else default.arg(None)
+    return result
+
+def parentsFirst(table, rows):
+    "u tabulky odkazujici sama na sebe (groups.mastergroup_id) jsou nadrizene radky pred podrizenymi"
+    selfColumns = [column.name for column in table.columns if any(fk.column.table is table for fk in column.foreign_keys)]
+    if len(selfColumns) == 0:
+        return rows
+    pending = {row["id"]: row for row in rows}
+    result = []
+    while pending:
+        ready = [
+            row for row in pending.values()
+            if all(row.get(name, None) not in pending for name in selfColumns)
+        ]
+        # 👇 cyklus, zbytek se ulozi jak je (postgres kontroluje klice az na konci prikazu)
+        if len(ready) == 0:
+            ready = list(pending.values())
+        for row in ready:
+            del pending[row["id"]]
+        result.extend(ready)
+    return result
+
+async def insertRows(session, table, rows, batchSize=DEMODATA_BATCH_SIZE):
+    """Vlozi radky (dicty) do tabulky, na postgresu (asyncpg) pres COPY, jinak vice radkovymi INSERT.
+    Po sobe jdouci radky se stejnymi sloupci jdou jednim prikazem (nevyplnene sloupce dostanou server default).
+    """
+    connection = await session.connection()
+    useCopy = (connection.dialect.name == "postgresql") and (connection.dialect.driver == "asyncpg")
+    for (columns, group) in itertools.groupby(rows, key=lambda row: tuple(row.keys())):
+        group = list(group)
+        if useCopy:
+            rawConnection = await connection.get_raw_connection()
+            await rawConnection.driver_connection.copy_records_to_table(
+                table.name,
+                records=[tuple(row[name] for name in columns) for row in group],
+                columns=list(columns),
+                schema_name=table.schema
+            )
+            continue
+        # 👇 limit poctu parametru jednoho prikazu (sqlite 32766, postgres 32767)
+        size = max(1, min(batchSize, 30000 // max(1, len(columns))))
+        for start in range(0, len(group), size):
+            await session.execute(insert(table).values(group[start:start + size]))
+
+async def importTables(asyncSessionMaker, DBModels, path="./systemdata.json", batchSize=DEMODATA_BATCH_SIZE, onTable=None):
+    """Rychla nahrada ImportModels(asyncSessionMaker, DBModels, get_demodata()).
+    Json se cte postupne a drzi se jen tabulky z DBModels, tabulky se ukladaji v poradi DBModels (cizi klice),
+    kazda v jedne transakci, radky s id, ktere uz v DB je, se preskoci.
+    Po kazde tabulce se vola onTable(tabulka, pocet vlozenych radku, sekundy) (pokud je zadano).
+    Vraci dict tabulka -> (pocet vlozenych radku, sekundy).
+    """
+    tables = {DBModel.__tablename__: DBModel for DBModel in DBModels}
+    rawRows = {tableName: [] for tableName in tables}
+    start = time.perf_counter()
+    for (tableName, row) in iterJsonTables(path, tables):
+        rawRows[tableName].append(row)
+    logging.info("%s parsed in %.3f s", path, time.perf_counter() - start)
+
+    timings = {}
+    for (tableName, DBModel) in tables.items():
+        start = time.perf_counter()
+        table = DBModel.__table__
+        rows = rawRows.pop(tableName)
+        if len(rows) > 0 and "_chunk" in rows[0]:
+            rows.sort(key=lambda row: row.get("_chunk", 0))
+        rows = convertRows(DBModel, rows)
+        async with asyncSessionMaker() as session:
+            async with session.begin():
+                existing = set((await session.execute(select(table.c.id))).scalars())
+                rows = [row for row in rows if row.get("id", None) not in existing]
+                rows = parentsFirst(table, rows)
+                await insertRows(session, table, rows, batchSize=batchSize)
+        timings[tableName] = (len(rows), time.perf_counter() - start)
+        logging.info("table %s: %s rows imported in %.3f s", tableName, *timings[tableName])
+        if onTable is not None:
+            onTable(tableName, *timings[tableName])
+    return timings
+
+async def initDB(asyncSessionMaker, onTable=None):
 
     DEMODATA = os.environ.get("DEMODATA", None) in ["True", "true"]        
     if DEMODATA:
@@ -941,6 +1147,12 @@ async def initDB(asyncSessionMaker):
     else:
         dbModels = systemModels
        
-    jsonData = get_demodata()
-    await ImportModels(asyncSessionMaker, dbModels, jsonData)
+    await importTables(asyncSessionMaker, dbModels, onTable=onTable)
+
+    # uzaver stromu skupin je odvozeny z groups.mastergroup_id
+    from src.GroupTree import rebuildGroupClosure
+    await rebuildGroupClosure(asyncSessionMaker)
+
+    from src.Caches import resetCaches
+    resetCaches()
     pass
\ No newline at end of file
@@ -1,14 +1,17 @@
 import logging
+import asyncio
 from uoishelpers.dataloaders import createIdLoader
 import uuid
+from prometheus_client import Counter
 
 from src.DBDefinitions import (
     BaseModel,
     # UserModel,
-    # MembershipModel,
-    # GroupModel,
+    MembershipModel,
+    GroupModel,
+    GroupClosureModel,
     # GroupTypeModel,
-    # RoleModel,
+    RoleModel,
     # RoleTypeModel,
     # RoleCategoryModel,
     # RoleTypeListModel
@@ -18,22 +21,237 @@ from src.DBDefinitions import (
 
 from uoishelpers.dataloaders import createIdLoader
 from functools import cache
+from aiodataloader import DataLoader
+from sqlalchemy import select, and_, or_
 
-def createLoaders(asyncSessionMaker):
+def getFkeyColumnNames(DBModel):
+    "returns names of columns which refer to other rows (foreign keys and indexed *_id columns)"
+    return [
+        column.name for column in DBModel.__table__.columns
+        if (not column.primary_key) and column.name.endswith("_id") and (column.foreign_keys or column.index)
+    ]
+
+def createKeyConverter(column):
+    "vraci funkci, ktera prevede klic (napr. str z JWT) na typ sloupce, zatim jen uuid"
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    if python_type is not uuid.UUID:
+        return lambda key: key
+    return lambda key: uuid.UUID(key) if isinstance(key, str) else key
+
+def createFkeyLoader(asyncSessionMaker, DBModel, foreignKeyName, idLoader=None):
+    """Vytvori loader, ktery pro hodnotu ciziho klice vraci list radku.
+    Vsechny klice pozadovane ve stejnem tiku jsou sdruzeny do jednoho dotazu WHERE fk IN (...)
+    a vysledky jsou rozdeleny zpet podle hodnoty klice.
+    Pokud je dodan idLoader, nactene radky jsou v nem zaregistrovany (load(id) pak nejde do DB).
+    """
+    fkeyattr = getattr(DBModel, foreignKeyName)
+    mainstmt = select(DBModel)
+    toKey = createKeyConverter(fkeyattr)
+
+    class FkeyLoader(DataLoader):
+        # 👇 id z tokenu / kontextu muze byt str, radky z DB nesou uuid.UUID
+        def load(self, key):
+            return super().load(toKey(key))
+
+        def load_many(self, keys):
+            return super().load_many([toKey(key) for key in keys])
+
+        def prime(self, key, value):
+            return super().prime(toKey(key), value)
+
+        def clear(self, key):
+            return super().clear(toKey(key))
+
+        async def batch_load_fn(self, keys):
+            keys = [toKey(key) for key in keys]
+            statement = mainstmt.filter(fkeyattr.in_(set(keys)))
+            async with asyncSessionMaker() as session:
+                rows = await session.execute(statement)
+                rows = list(rows.scalars())
+            groupedResults = {key: [] for key in keys}
+            for row in rows:
+                groupedResults[getattr(row, foreignKeyName)].append(row)
+                if idLoader is not None:
+                    idLoader.registerResult(row)
+            return [groupedResults[key] for key in keys]
+
+    return FkeyLoader(cache=True)
+
+def createMemberOfLoader(asyncSessionMaker, groupLoader=None):
+    """Loader skupin, kterych je uzivatel clenem, klic je (user_id, grouptype_id), grouptype_id muze byt None (vsechny typy).
+    Vsechny klice z jednoho tiku jsou jeden dotaz memberships ⨝ groups, filtr typu skupiny je v SQL.
+    Skupina je ve vysledku jednou (i pri vice clenstvich), serazeno podle jmena.
+    Pokud je dodan groupLoader, nactene skupiny jsou v nem zaregistrovany.
+    """
+    class MemberOfLoader(DataLoader):
+        async def batch_load_fn(self, keys):
+            anyTypeUserIds = set()
+            userIdsByType = {}
+            for (user_id, grouptype_id) in keys:
+                if grouptype_id is None:
+                    anyTypeUserIds.add(user_id)
+                else:
+                    userIdsByType.setdefault(grouptype_id, set()).add(user_id)
+            conditions = []
+            if anyTypeUserIds:
+                conditions.append(MembershipModel.user_id.in_(anyTypeUserIds))
+            for (grouptype_id, userIds) in userIdsByType.items():
+                conditions.append(and_(GroupModel.grouptype_id == grouptype_id, MembershipModel.user_id.in_(userIds)))
+            statement = (
+                select(MembershipModel.user_id, GroupModel)
+                .join(GroupModel, GroupModel.id == MembershipModel.group_id)
+                .where(or_(*conditions))
+                .order_by(GroupModel.name, GroupModel.id)
+            )
+            async with asyncSessionMaker() as session:
+                rows = list(await session.execute(statement))
+            groupsByUser = {}
+            for (user_id, group) in rows:
+                groups = groupsByUser.setdefault(user_id, {})
+                groups[group.id] = group
+                if groupLoader is not None:
+                    groupLoader.registerResult(group)
+            return [
+                [
+                    group for group in groupsByUser.get(user_id, {}).values()
+                    if (grouptype_id is None) or (group.grouptype_id == grouptype_id)
+                ]
+                for (user_id, grouptype_id) in keys
+            ]
+
+    return MemberOfLoader(cache=True)
+
+def createRBACRolesLoader(asyncSessionMaker, roleLoader=None):
+    """Loader roli vztazenych k rbacobject (user nebo group), klic je id rbacobject.
+    Role ve skupinach, kde je user clenem, a role ve skupine (group) a vsech jejich nadrizenych skupinach.
+    Vsechny klice z jednoho tiku jsou jeden dotaz (predci skupin z groupclosures, clenstvi z memberships),
+    typicky has_permission pro kazdou polozku listu (userPage { gdpr }).
+    Pokud je dodan roleLoader, nactene role jsou v nem zaregistrovany.
+    """
+    class RBACRolesLoader(DataLoader):
+        async def batch_load_fn(self, keys):
+            # 👇 skupina a vsichni jeji predci z uzaveru stromu (groupclosures), jeden indexovany join
+            related = (
+                select(GroupClosureModel.descendant_id.label("rbacobject_id"), GroupClosureModel.ancestor_id.label("group_id"))
+                .where(GroupClosureModel.descendant_id.in_(set(keys)))
+                .union(
+                    select(MembershipModel.user_id.label("rbacobject_id"), MembershipModel.group_id)
+                    .where(MembershipModel.user_id.in_(set(keys)))
+                )
+                .subquery("related")
+            )
+            statement = (
+                select(related.c.rbacobject_id, RoleModel)
+                .join(RoleModel, RoleModel.group_id == related.c.group_id)
+            )
+            async with asyncSessionMaker() as session:
+                rows = list(await session.execute(statement))
+            rolesByObject = {}
+            for (rbacobject_id, role) in rows:
+                rolesByObject.setdefault(rbacobject_id, {})[role.id] = role
+                if roleLoader is not None:
+                    roleLoader.registerResult(role)
+            return [list(rolesByObject.get(key, {}).values()) for key in keys]
+
+    return RBACRolesLoader(cache=True)
+
+# 👇 loadery, jejichz vysledky jsou odvozene z vice tabulek (viz clearFkeyLoaders)
+derivedLoaders = {
+    "memberships": ["memberof", "rbacroles"],
+    "groups": ["memberof", "rbacroles"],
+    "roles": ["rbacroles"]
+}
+
+authorizationCacheHits = Counter("authorization_cache_hits", "authorization decisions reused within a request", namespace="gql_ug")
+authorizationCacheMisses = Counter("authorization_cache_misses", "authorization decisions computed", namespace="gql_ug")
 
-    def createLambda(loaderName, DBModel):
-        return lambda self: createIdLoader(asyncSessionMaker, DBModel)
+class AuthorizationCache:
+    """Pamet rozhodnuti o autorizaci v ramci jednoho dotazu, klic je (user_id, rbacobject, roleset).
+    Soubezne dotazy se stejnym klicem cekaji na jeden sdileny future.
+    """
+    def __init__(self):
+        self._decisions = {}
 
-    attrs = {}
+    async def decide(self, key, decider):
+        future = self._decisions.get(key, None)
+        if future is None:
+            authorizationCacheMisses.inc()
+            future = asyncio.ensure_future(decider())
+            future.add_done_callback(lambda f: self._forgetFailed(key, f))
+            self._decisions[key] = future
+        else:
+            authorizationCacheHits.inc()
+        # 👇 shield, zruseni jednoho cekajiciho nesmi zrusit rozhodnuti pro ostatni
+        return await asyncio.shield(future)
 
+    def _forgetFailed(self, key, future):
+        if future.cancelled() or (future.exception() is not None):
+            if self._decisions.get(key, None) is future:
+                del self._decisions[key]
+
+    def clear(self):
+        self._decisions.clear()
+
+@cache
+def getLoadersLayout():
+    """Rozlozeni loaderu, pocita se jednou za beh procesu.
+    Vraci dict jmeno -> (klic, factory), aliasy (tablename a jmeno tridy) sdileji klic, tedy i instanci loaderu.
+    factory je volana s instanci Loaders.
+    """
+    def createIdFactory(DBModel):
+        return lambda loaders: createIdLoader(loaders.asyncSessionMaker, DBModel)
+
+    def createFkeyFactory(DBModel, foreignKeyName):
+        return lambda loaders: createFkeyLoader(
+            loaders.asyncSessionMaker, DBModel, foreignKeyName, idLoader=getattr(loaders, DBModel.__tablename__))
+
+    layout = {}
     for DBModel in BaseModel.registry.mappers:
         cls = DBModel.class_
-        attrs[cls.__tablename__] = property(cache(createLambda(asyncSessionMaker, cls)))
-        attrs[cls.__name__] = attrs[cls.__tablename__]
-    
-    # attrs["authorizations"] = property(cache(lambda self: AuthorizationLoader()))
-    Loaders = type('Loaders', (), attrs)   
-    return Loaders()
+        entry = (cls.__tablename__, createIdFactory(cls))
+        layout[cls.__tablename__] = entry
+        layout[cls.__name__] = entry
+
+        # 👇 loadery podle cizich klicu, napr. loaders.memberships_user_id.load(user_id) -> [MembershipModel, ...]
+        for foreignKeyName in getFkeyColumnNames(cls):
+            entry = (f"{cls.__tablename__}_{foreignKeyName}", createFkeyFactory(cls, foreignKeyName))
+            layout[f"{cls.__tablename__}_{foreignKeyName}"] = entry
+            layout[f"{cls.__name__}_{foreignKeyName}"] = entry
+
+    layout["authorizations"] = ("authorizations", lambda loaders: AuthorizationCache())
+    # 👇 loaders.memberof.load((user_id, grouptype_id)) -> [GroupModel, ...]
+    layout["memberof"] = ("memberof", lambda loaders: createMemberOfLoader(loaders.asyncSessionMaker, groupLoader=loaders.groups))
+    # 👇 loaders.rbacroles.load(rbacobject_id) -> [RoleModel, ...]
+    layout["rbacroles"] = ("rbacroles", lambda loaders: createRBACRolesLoader(loaders.asyncSessionMaker, roleLoader=loaders.roles))
+    return layout
+
+class Loaders:
+    """Kontejner loaderu pro jeden dotaz, loadery vznikaji az pri prvnim pouziti"""
+    __slots__ = ("asyncSessionMaker", "_loaders")
+
+    def __init__(self, asyncSessionMaker):
+        self.asyncSessionMaker = asyncSessionMaker
+        self._loaders = {}
+
+    def __getattr__(self, name):
+        entry = getLoadersLayout().get(name, None)
+        if entry is None:
+            raise AttributeError(f"there is no loader named '{name}'")
+        key, factory = entry
+        loader = self._loaders.get(key, None)
+        if loader is None:
+            loader = factory(self)
+            self._loaders[key] = loader
+        return loader
+
+    def __dir__(self):
+        return [*super().__dir__(), *getLoadersLayout().keys()]
+
+def createLoaders(asyncSessionMaker):
+    return Loaders(asyncSessionMaker)
 
 
 def getUserFromInfo(info):
@@ -60,7 +278,24 @@ def getLoadersFromInfo(info):
     assert loaders is not None, f"'loaders' key missing in context"
     return loaders
 
+def clearFkeyLoaders(info, DBModel):
+    "after CUD operation on DBModel, lists cached by foreign key loaders are not valid anymore"
+    loaders = getLoadersFromInfo(info)
+    for foreignKeyName in getFkeyColumnNames(DBModel):
+        getattr(loaders, f"{DBModel.__tablename__}_{foreignKeyName}").clear_all()
+    for loaderName in derivedLoaders.get(DBModel.__tablename__, []):
+        getattr(loaders, loaderName).clear_all()
+
+def pinToPrimary(info):
+    "all following db operations in the request go to the primary db (if read replica is configured)"
+    asyncSessionMaker = getLoadersFromInfo(info).asyncSessionMaker
+    if hasattr(asyncSessionMaker, "pinToPrimary"):
+        asyncSessionMaker.pinToPrimary()
+
 def createLoadersContext(asyncSessionMaker):
+    # 👇 s read replikou ma kazdy dotaz vlastni pohled (cte z repliky, po mutaci z primarni DB)
+    if hasattr(asyncSessionMaker, "forRequest"):
+        asyncSessionMaker = asyncSessionMaker.forRequest()
     return {
         "loaders": createLoaders(asyncSessionMaker)
     }
@@ -0,0 +1,48 @@
+import os
+import json
+import logging
+
+from sqlalchemy import select
+
+from src.DBDefinitions import (
+    UserModel,
+    GroupModel,
+    MembershipModel,
+    RoleModel
+)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+exportModels = {
+    "users": UserModel,
+    "groups": GroupModel,
+    "memberships": MembershipModel,
+    "roles": RoleModel
+}
+
+class ContextInfo:
+    "nahrada strawberry.Info pro kontroly opravneni mimo GraphQL (potrebuje jen context)"
+    def __init__(self, context):
+        self.context = context
+
+async def isAdmin(context):
+    from src.GraphTypeDefinitions._GraphPermissions import OnlyForAdmins
+    if context.get("user", None) is None:
+        return False
+    adminRole = await OnlyForAdmins().testIsAdmin(ContextInfo(context))
+    return adminRole is not None
+
+async def exportNDJSON(asyncSessionMaker, DBModel, batchSize=EXPORT_BATCH_SIZE):
+    """Vsechny radky tabulky jako NDJSON (jeden JSON objekt na radek), po davkach velikosti batchSize.
+    Cte se pres server side cursor (session.stream, yield_per) a bez ORM objektu,
+    v pameti je tedy vzdy nejvyse jedna davka.
+    """
+    table = DBModel.__table__
+    statement = select(table).order_by(table.c.id).execution_options(yield_per=batchSize)
+    count = 0
+    async with asyncSessionMaker() as session:
+        result = await session.stream(statement)
+        async for partition in result.mappings().partitions():
+            count += len(partition)
+            yield "".join(json.dumps(dict(row), default=str) + "\n" for row in partition)
+    logging.info("export of %s done, %s rows", table.name, count)
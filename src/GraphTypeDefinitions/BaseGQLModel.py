@@ -11,14 +11,27 @@ class BaseGQLModel:
     def getLoader(cls, info):
         pass
 
+    @classmethod
+    def asGQLModel(cls, row):
+        "oznaci radek jako instanci cls (strawberry podle toho urci typ, napr. u _entities)"
+        if row is not None and getattr(row, "__strawberry_definition__", None) is not cls.__strawberry_definition__:
+            row.__strawberry_definition__ = cls.__strawberry_definition__  # little hack :)
+        return row
+
     @classmethod
     async def resolve_reference(cls, info: strawberry.types.Info, id: IDType):
         if id is not None:
             loader = cls.getLoader(info)
             if isinstance(id, str): id = uuid.UUID(id)
             result = await loader.load(id)
-            if result is not None:
-                result.__strawberry_definition__ = cls.__strawberry_definition__  # little hack :)
-            return result
+            return cls.asGQLModel(result)
         return None
 
+    @classmethod
+    async def resolve_references(cls, info: strawberry.types.Info, ids: typing.List[IDType]):
+        "jako resolve_reference, ale pro vice id najednou (jeden load_many), poradi odpovida ids"
+        ids = [uuid.UUID(id) if isinstance(id, str) else id for id in ids]
+        loader = cls.getLoader(info)
+        rows = await loader.load_many([id for id in ids if id is not None])
+        rows = iter(rows)
+        return [None if id is None else cls.asGQLModel(next(rows)) for id in ids]
@@ -24,14 +24,10 @@ class RBACObjectGQLModel:
     
     @classmethod
     async def resolve_roles(cls, info: strawberry.types.Info, id: IDType):
-        from .roleGQLModel import resolve_roles_on_user, resolve_roles_on_group
-        from ._GraphPermissions import RBACPermission
-        awaitableresult0 = resolve_roles_on_user(None, info, user_id=id)
-        awaitableresult1 = resolve_roles_on_group(None, info, group_id=id)
-        result0, result1 = await asyncio.gather(awaitableresult0, awaitableresult1)
-        roles = [*result0, *result1]
-        allRoleTypes = await RBACPermission.getAllRoles(info=info)
-        index = {roleType["id"]: roleType for roleType in allRoleTypes}
+        from .roleGQLModel import resolve_roles_on_rbacobject
+        from src.Caches import roleTypeCache
+        roles = await resolve_roles_on_rbacobject(info, rbacobject_id=id)
+        index = await roleTypeCache.byId(info)
         extresult = [
             {
                 "id": r.id,
@@ -39,32 +35,50 @@ class RBACObjectGQLModel:
                 "group_id": r.group_id,
                 "roletype_id": r.roletype_id,
                 "type": index[r.roletype_id]
-            } for r in roles
+            } for r in roles if r.roletype_id in index
         ]
         return extresult
 
     @classmethod
     async def resolve_reference(cls, info: strawberry.types.Info, id: IDType):
-        from .groupGQLModel import GroupGQLModel
-        from .userGQLModel import UserGQLModel
         if id is None: return None
-                
-        if isinstance(id, str): id = IDType(id)
-
-        loaderU = UserGQLModel.getLoader(info)
-        loaderG = GroupGQLModel.getLoader(info)
-        futures = [loaderU.load(id), loaderG.load(id)]
-        rows = await asyncio.gather(*futures)
-
-        asUser = rows[0] is not None
-        asGroup = rows[1] is not None
-
-        if asUser is None and asGroup is None: return None
-        
-        result = RBACObjectGQLModel(asGroup=asGroup, asUser=asUser)
-        result.id = id
+        [result] = await cls.resolve_references(info, [id])
         return result
 
+    @classmethod
+    async def resolve_references(cls, info: strawberry.types.Info, ids: List[IDType]):
+        """RBAC objekt je uzivatel nebo skupina. Druh znamych id je v rbacObjectKinds,
+        takova id se hledaji jen v jedne tabulce, ostatni v obou (jeden load_many na tabulku).
+        """
+        from .groupGQLModel import GroupGQLModel
+        from .userGQLModel import UserGQLModel
+        from src.Caches import rbacObjectKinds
+
+        ids = [IDType(id) if isinstance(id, str) else id for id in ids]
+        kinds = {id: rbacObjectKinds.get(id) for id in ids if id is not None}
+        userIds = [id for id, kind in kinds.items() if kind != "group"]
+        groupIds = [id for id, kind in kinds.items() if kind != "user"]
+        (userRows, groupRows) = await asyncio.gather(
+            UserGQLModel.getLoader(info).load_many(userIds),
+            GroupGQLModel.getLoader(info).load_many(groupIds)
+        )
+        users = {id for id, row in zip(userIds, userRows) if row is not None}
+        groups = {id for id, row in zip(groupIds, groupRows) if row is not None}
+
+        results = []
+        for id in ids:
+            asUser = id in users
+            asGroup = id in groups
+            if not asUser and not asGroup:
+                if id is not None: rbacObjectKinds.invalidate(id)
+                results.append(None)
+                continue
+            rbacObjectKinds.put(id, "user" if asUser else "group")
+            result = RBACObjectGQLModel(asGroup=asGroup, asUser=asUser)
+            result.id = id
+            results.append(result)
+        return results
+
     @strawberry.field(
         description="Roles associated with this RBAC",
         permission_classes=[OnlyForAuthentized])
@@ -90,23 +104,9 @@ class RBACObjectGQLModel:
             access: StateDataAccessType, 
             state_id: Optional[uuid.UUID] = None, 
             user_id: Optional[uuid.UUID] = None) -> Optional[bool]:
-        # user = getUserFromInfo(info=info)
-        _user_id = getUserFromInfo(info=info)["id"] if user_id is None else user_id
-
-        _rbacobject_id = self.id # uuid.UUID(rbacobject_id) if type(rbacobject_id) == str else rbacobject_id
-        rbacroles = await RBACObjectGQLModel.resolve_roles(info=info, id=_rbacobject_id)
-        rbacroletype_ids = set(rbacrole["roletype_id"] for rbacrole in rbacroles if rbacrole["user_id"] == _user_id)
-        print(f"rbacroletype_ids {rbacroletype_ids}", flush=True)
-
-        loader = StateGQLModel.getLoader(info=info)
-        state = await loader.load(id=state_id)
-
-        roletypes = await StateGQLModel.resolve_roletypes(state=state, info=info, access=access)
-        roletypes_ids = set(roletype.type_id for roletype in roletypes)
-        print(f"roletypes_ids {roletypes_ids}", flush=True)
-        intersection = roletypes_ids.intersection(rbacroletype_ids)
-        print(f"intersection {intersection}", flush=True)
-        return len(intersection) > 0
+        from .stateGQLModel import resolve_user_can_many
+        [result] = await resolve_user_can_many(info, access=access, state_ids=[state_id], rbacobject_ids=[self.id], user_id=user_id)
+        return result
 
     @strawberry.field(
         description="""If logged user is authorized to operation on rbacobject_id""",
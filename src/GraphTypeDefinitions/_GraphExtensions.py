@@ -0,0 +1,280 @@
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+
+from graphql import (
+    GraphQLError,
+    ExecutionResult,
+    FieldNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    FragmentDefinitionNode,
+    get_named_type,
+    get_nullable_type,
+    is_list_type,
+    is_composite_type,
+    value_from_ast
+)
+from graphql.pyutils import Undefined
+from graphql.utilities import get_operation_ast
+from prometheus_client import Counter
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from ._GraphResolvers import GQL_MAX_PAGE_SIZE
+
+GQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GQL_DOCUMENT_CACHE_SIZE", "256"))
+GQL_MAX_COST = int(os.getenv("GQL_MAX_COST", "20000"))
+GQL_MAX_DEPTH = int(os.getenv("GQL_MAX_DEPTH", "10"))
+GQL_COST_LIST_SIZE = int(os.getenv("GQL_COST_LIST_SIZE", "10"))
+GQL_COST_UNBOUNDED_LIST_SIZE = int(os.getenv("GQL_COST_UNBOUNDED_LIST_SIZE", "1000"))
+# 👇 metadata pole (strawberry.field(metadata=UNBOUNDED_LIST)), jehoz seznam neni omezen rodicem (strom, uzaver skupin)
+UNBOUNDED_LIST = {"unboundedList": True}
+
+documentCacheHits = Counter(
+    "document_cache_hits", "parsed and validated GraphQL documents served from cache",
+    namespace="gql_ug")
+documentCacheMisses = Counter(
+    "document_cache_misses", "GraphQL documents which had to be parsed and validated",
+    namespace="gql_ug")
+documentCacheSecondsSaved = Counter(
+    "document_cache_seconds_saved", "parse + validation time (measured at first use) saved by cache hits",
+    namespace="gql_ug")
+
+def queryHash(query):
+    "sha256 hex digest, stejny jako Apollo persistedQuery.sha256Hash"
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+class DocumentCacheEntry:
+    __slots__ = ("query", "document", "errors", "parseSeconds", "validateSeconds")
+
+    def __init__(self, query, document, parseSeconds):
+        self.query = query
+        self.document = document
+        self.errors = None
+        self.parseSeconds = parseSeconds
+        self.validateSeconds = 0.0
+
+class DocumentCache:
+    """LRU pamet rozparsovanych (a zvalidovanych) dotazu, klicem je sha256 textu dotazu.
+    Slouzi zaroven jako uloziste pro Apollo Automatic Persisted Queries (hash -> text dotazu).
+    """
+    def __init__(self, maxsize=GQL_DOCUMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key):
+        entry = self._items.get(key, None)
+        if entry is not None:
+            self._items.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if self.maxsize <= 0:
+            return
+        self._items[key] = entry
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def getQuery(self, key):
+        "text dotazu pro persisted query hash, None pokud neni znam"
+        entry = self.get(key)
+        return None if entry is None else entry.query
+
+    def invalidate(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+documentCache = DocumentCache()
+
+class CachedDocuments(SchemaExtension):
+    """Dotaz, ktery uz byl jednou rozparsovan a zvalidovan, se znovu neparsuje ani nevaliduje.
+    Pri prvnim pouziti se meri cas parsovani a validace, pri kazdem zasahu se pricte k ulozenemu casu.
+    """
+    def on_parse(self):
+        execution_context = self.execution_context
+        query = execution_context.query
+        self._entry = None
+        if not query or execution_context.graphql_document is not None:
+            yield
+            return
+        key = queryHash(query)
+        entry = self._entry = documentCache.get(key)
+        if entry is not None:
+            execution_context.graphql_document = entry.document
+            documentCacheHits.inc()
+            documentCacheSecondsSaved.inc(entry.parseSeconds + entry.validateSeconds)
+            yield
+            return
+
+        documentCacheMisses.inc()
+        start = time.perf_counter()
+        yield
+        # 👇 chyba parsovani vede na graphql_document None, takovy dotaz se neuklada
+        if execution_context.graphql_document is not None:
+            self._entry = DocumentCacheEntry(query, execution_context.graphql_document, time.perf_counter() - start)
+            documentCache.put(key, self._entry)
+
+    def on_validate(self):
+        execution_context = self.execution_context
+        entry = self._entry
+        if entry is None:
+            yield
+            return
+        if entry.errors is not None:
+            execution_context.pre_execution_errors = list(entry.errors)
+            yield
+            return
+
+        start = time.perf_counter()
+        yield
+        if execution_context.pre_execution_errors is not None:
+            entry.errors = list(execution_context.pre_execution_errors)
+            entry.validateSeconds = time.perf_counter() - start
+
+class QueryCost:
+    """Odhad poctu radku, ktere dotaz nacte, a hloubky vnoreni.
+    Seznam s argumenty skip/limit nacte skip + limit radku a vnorene pole nasobi limitem (first ma prednost pred limit),
+    seznam urceny vstupnim seznamem (representations, *InsertMany) ma jeho delku,
+    seznam podrizenych entit bez limit / first (stavy stavoveho automatu, ...) se pocita jako GQL_COST_LIST_SIZE,
+    neomezeny seznam (pole s UNBOUNDED_LIST, nebo null limit / first) jako GQL_COST_UNBOUNDED_LIST_SIZE,
+    objekt jako jeden radek, skalar je zdarma.
+    Zaporne skip / limit / first se pocitaji jako 0 (tak je orezavaji resolvery), first nejvyse GQL_MAX_PAGE_SIZE.
+    Hodnoty argumentu se berou z dotazu, z promennych, nebo z vychozich hodnot ve schematu.
+    """
+    def __init__(self, schema, document, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    def argument(self, fieldDef, fieldNode, name):
+        argDef = fieldDef.args.get(name, None)
+        if argDef is None:
+            return None
+        for argument in fieldNode.arguments or []:
+            if argument.name.value == name:
+                value = value_from_ast(argument.value, argDef.type, self.variables)
+                if value is not Undefined:
+                    return value
+        value = argDef.default_value
+        return None if value is Undefined else value
+
+    def rows(self, fieldDef, fieldNode):
+        "(nactene radky, nasobitel pro vnorena pole)"
+        if not is_list_type(get_nullable_type(fieldDef.type)):
+            return (1, 1)
+        for (name, argDef) in fieldDef.args.items():
+            if is_list_type(get_nullable_type(argDef.type)):
+                values = self.argument(fieldDef, fieldNode, name)
+                if values is not None:
+                    return (len(values), len(values))
+        # 👇 keyset strankovani (first / after) nic nepreskakuje, first orezavaji vsechny resolvery
+        first = self.argument(fieldDef, fieldNode, "first")
+        if first is not None:
+            first = max(0, min(first, GQL_MAX_PAGE_SIZE))
+            return (first, first)
+        if ("first" not in fieldDef.args) and ("limit" not in fieldDef.args):
+            definition = fieldDef.extensions.get("strawberry-definition", None)
+            metadata = getattr(definition, "metadata", None) or {}
+            size = GQL_COST_UNBOUNDED_LIST_SIZE if metadata.get("unboundedList", False) else GQL_COST_LIST_SIZE
+            return (size, size)
+        # 👇 limit se shora neorezava, ne vsechny resolvery s limit ho orezavaji
+        limit = self.argument(fieldDef, fieldNode, "limit")
+        limit = GQL_COST_UNBOUNDED_LIST_SIZE if limit is None else max(0, limit)
+        if self.argument(fieldDef, fieldNode, "after") is not None:
+            skip = 0
+        else:
+            skip = max(0, self.argument(fieldDef, fieldNode, "skip") or 0)
+        return (skip + limit, limit)
+
+    def fields(self, selectionSet, parentType):
+        "pole vyberu vcetne fragmentu, jako dvojice (typ, pole)"
+        for selection in selectionSet.selections:
+            if isinstance(selection, FieldNode):
+                yield (parentType, selection)
+            elif isinstance(selection, InlineFragmentNode):
+                fragmentType = parentType if selection.type_condition is None else self.schema.get_type(selection.type_condition.name.value)
+                yield from self.fields(selection.selection_set, fragmentType)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments[selection.name.value]
+                yield from self.fields(fragment.selection_set, self.schema.get_type(fragment.type_condition.name.value))
+
+    def measure(self, selectionSet, parentType, multiplier=1):
+        "vraci (cena, hloubka)"
+        cost = 0
+        depth = 0
+        for (fieldType, fieldNode) in self.fields(selectionSet, parentType):
+            name = fieldNode.name.value
+            # 👇 introspekce a __typename DB nezatezuji
+            if name.startswith("__"):
+                continue
+            fieldDef = getattr(fieldType, "fields", {}).get(name, None)
+            if fieldDef is None:
+                continue
+            namedType = get_named_type(fieldDef.type)
+            if not is_composite_type(namedType) or fieldNode.selection_set is None:
+                continue
+            (rows, fanout) = self.rows(fieldDef, fieldNode)
+            (childCost, childDepth) = self.measure(fieldNode.selection_set, namedType, multiplier * fanout)
+            cost += multiplier * rows + childCost
+            depth = max(depth, childDepth + 1)
+        return (cost, depth)
+
+    def ofOperation(self, operation):
+        rootType = self.schema.get_root_type(operation.operation)
+        return self.measure(operation.selection_set, rootType)
+
+class QueryCostAnalysis(SchemaExtension):
+    """Dotaz, jehoz odhadnuta cena (viz QueryCost) presahne GQL_MAX_COST nebo hloubka GQL_MAX_DEPTH,
+    je odmitnut pred provedenim (tedy bez jakekoliv prace s DB).
+    Odhad je soucasti extensions odpovedi.
+    Bezi az po validaci (a ne jako ValidationRule), protoze limit byva predan promennou.
+    """
+    def __init__(self, *, maxCost=None, maxDepth=None, execution_context=None):
+        super().__init__(execution_context=execution_context)
+        self.maxCost = GQL_MAX_COST if maxCost is None else maxCost
+        self.maxDepth = GQL_MAX_DEPTH if maxDepth is None else maxDepth
+        self.cost = None
+        self.depth = None
+
+    def on_execute(self):
+        execution_context = self.execution_context
+        operation = get_operation_ast(execution_context.graphql_document, execution_context.operation_name)
+        if operation is not None:
+            queryCost = QueryCost(execution_context.schema._schema, execution_context.graphql_document, execution_context.variables)
+            (self.cost, self.depth) = queryCost.ofOperation(operation)
+            if (self.cost > self.maxCost) or (self.depth > self.maxDepth):
+                logging.info("query rejected, cost %s (max %s), depth %s (max %s)", self.cost, self.maxCost, self.depth, self.maxDepth)
+                execution_context.result = ExecutionResult(data=None, errors=[
+                    GraphQLError(
+                        f"Query is too complex, cost {self.cost} (max {self.maxCost}), depth {self.depth} (max {self.maxDepth})",
+                        extensions={"code": "QUERY_TOO_COMPLEX", "cost": self.cost, "depth": self.depth}
+                    )
+                ])
+        yield
+
+    def get_results(self):
+        if self.cost is None:
+            return {}
+        return {"cost": {"estimated": self.cost, "depth": self.depth, "maxCost": self.maxCost, "maxDepth": self.maxDepth}}
+
+class PrimaryDBForMutations(SchemaExtension):
+    """Mutace (vcetne cteni jejich vysledku) jdou na primarni DB, i kdyz je nastavena read replika"""
+    def on_execute(self):
+        execution_context = self.execution_context
+        if execution_context.operation_type == OperationType.MUTATION:
+            context = execution_context.context
+            loaders = context.get("loaders", None) if isinstance(context, dict) else None
+            asyncSessionMaker = getattr(loaders, "asyncSessionMaker", None)
+            if hasattr(asyncSessionMaker, "pinToPrimary"):
+                asyncSessionMaker.pinToPrimary()
+        yield
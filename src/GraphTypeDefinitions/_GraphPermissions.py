@@ -280,7 +280,8 @@ rolelist = [
 
 
 from src.Dataloaders import (
-    getUserFromInfo
+    getUserFromInfo,
+    getLoadersFromInfo
     )
 
 from strawberry.types.base import StrawberryList
@@ -325,7 +326,6 @@ class OnlyForAuthentized(strawberry.permission.BasePermission):
 # getAllRoles = createRoleGetter()    
 
 class RBACPermission(strawberry.permission.BasePermission):
-    _allRoles = None
     # @classmethod
     # def getAllRoles(cls):
     #     if cls._allRoles is not None:
@@ -341,27 +341,23 @@ class RBACPermission(strawberry.permission.BasePermission):
 
     @classmethod
     async def getAllRoles(cls, info: strawberry.types.Info):
-        if cls._allRoles is not None:
-            return cls._allRoles
-        from ..DBDefinitions import RoleTypeModel, startEngine
-        from ..Dataloaders import getLoadersFromInfo
-        loader = getLoadersFromInfo(info).RoleTypeModel
-        roles = await loader.page(limit=1000)
-        
-        result = [{"id": r.id, "name": r.name, "name_en": r.name_en} for r in roles]
+        "returns all role types, see src.Caches.roleTypeCache"
+        from ..Caches import roleTypeCache
+        result = await roleTypeCache.all(info)
         assert len(result) > 1, f"are roletypes initialized {result}?"
-        cls._allRoles = result
-
-        logging.info(f"loaded all roles {result}")
         return result
 
     async def getUserRoles(self, info: strawberry.types.Info):
-        from .roleGQLModel import RoleGQLModel
+        from ..Caches import roleTypeCache, userRolesCache
         user = getUserFromInfo(info)
         userroles = user.get("roles")
         if userroles is None:
-            loader = RoleGQLModel.getLoader(info)
-            rolerows = await loader.filter_by(user_id=user["id"])
+            userroles = userRolesCache.get(user["id"], generation=roleTypeCache.generation)
+        if userroles is None:
+            generation = roleTypeCache.generation
+            version = userRolesCache.version
+            loader = getLoadersFromInfo(info).RoleModel_user_id
+            rolerows = await loader.load(user["id"])
             rolerows = list(rolerows)
 
             ur = [
@@ -373,9 +369,8 @@ class RBACPermission(strawberry.permission.BasePermission):
                 } 
                 for rolerow in rolerows
             ]
-            logging.info(f"user {user['id']} has roles {ur}")
-            allRoles = await RBACPermission.getAllRoles(info)
-            indexedRoleTypes = {r["id"]: r for r in allRoles}
+            logging.debug("user %s has roles %s", user['id'], ur)
+            indexedRoleTypes = await roleTypeCache.byId(info)
 
             userroles = [
                 {
@@ -387,8 +382,9 @@ class RBACPermission(strawberry.permission.BasePermission):
                 } 
                 for rolerow in rolerows if indexedRoleTypes.get(rolerow.roletype_id, None) is not None]
             # write back to context and cache it for next use in current request
-            logging.info(f"user {user['id']} has roles {userroles}")
+            logging.debug("user %s has roles %s", user['id'], userroles)
             user["roles"] = userroles
+            userRolesCache.put(user["id"], userroles, generation=generation, version=version)
         return userroles
         
 
@@ -421,18 +417,33 @@ class RBACPermission(strawberry.permission.BasePermission):
         usersrole = [r for r in authorizedroles if (r["user_id"] == user_id)]
         return usersrole
     
+    def prefetchActiveRoles(self, rbacobject: Any, info: strawberry.types.Info):
+        "zaradi nacteni roli rbacobject do davky loaderu (bez cekani), getActiveRoles pak pouzije tentyz vysledek"
+        getLoadersFromInfo(info).rbacroles.load(rbacobject)
+
+    async def authorize(self, info: strawberry.types.Info, rbacobject, roleset, decide):
+        "decision is memoized within the request, key is (user, rbacobject, roleset)"
+        user = getUserFromInfo(info)
+        key = (user["id"], rbacobject, frozenset(roleset))
+        authorizations = getLoadersFromInfo(info).authorizations
+        return await authorizations.decide(key, decide)
+
     async def testIsAdmin(self, info: strawberry.types.Info, adminRoleNames=["administrátor"]):
         assert len(adminRoleNames) > 0, "as adminRoleNames is empty, this always fails"
-        userRoles = await self.getUserRoles(info)
-        adminRoles = filter(lambda role: role["type"]["name"] in adminRoleNames, userRoles)
-        # isAdmin = next(adminRoles, None) is not None
-        return next(adminRoles, None)
+        async def decide():
+            userRoles = await self.getUserRoles(info)
+            adminRoles = filter(lambda role: role["type"]["name"] in adminRoleNames, userRoles)
+            # isAdmin = next(adminRoles, None) is not None
+            return next(adminRoles, None)
+        return await self.authorize(info, None, adminRoleNames, decide)
     
     async def testIsAllowed(self, info: strawberry.types.Info, rbacobject, allowedRolesNames = []):
         assert len(allowedRolesNames) > 0, "as allowedRolesNames is empty, this always fails"
-        relatedRoles = await self.getActiveRoles(rbacobject, info)
-        allowedRoles = filter(lambda role: role["type"]["name"] in allowedRolesNames, relatedRoles)
-        return next(allowedRoles, None)
+        async def decide():
+            relatedRoles = await self.getActiveRoles(rbacobject, info)
+            allowedRoles = filter(lambda role: role["type"]["name"] in allowedRolesNames, relatedRoles)
+            return next(allowedRoles, None)
+        return await self.authorize(info, rbacobject, allowedRolesNames, decide)
 
     async def resolveUserRole(self, info: strawberry.types.Info, rbacobject, adminRoleNames=["administrátor"], allowedRoleNames = []):
         "test if logged user has appropriate global role (without relation to rbacobject) or appropriate role related to rbacobject"
@@ -451,6 +462,16 @@ class RBACPermission(strawberry.permission.BasePermission):
         # self.__class__.__name__
         return None
 
+    async def resolveUserRoles(self, info: strawberry.types.Info, rbacobjects, adminRoleNames=["administrátor"], allowedRoleNames = []):
+        "resolveUserRole pro kazdy ruzny rbacobject jen jednou, vraci dict rbacobject -> role (None pokud neni opravneni)"
+        result = {}
+        for rbacobject in rbacobjects:
+            if rbacobject not in result:
+                result[rbacobject] = await self.resolveUserRole(info, rbacobject,
+                    adminRoleNames=adminRoleNames,
+                    allowedRoleNames=allowedRoleNames)
+        return result
+
 
 class OnlyForAdmins(RBACPermission):
     message = "User is not allowed create new role category"
@@ -459,7 +480,7 @@ class OnlyForAdmins(RBACPermission):
         adminrole = await self.testIsAdmin(info, adminRoleNames=adminRoleNames)
         
         if not adminrole: 
-            logging.info(f"user has no admin role")
+            logging.info("user has no admin role")
             return False
         return True
 
@@ -515,17 +536,20 @@ class OnlyForAdmins(RBACPermission):
     
 @cache
 def RoleBasedPermission(roles: str = ""):
-    roleIdsNeeded = None
-        
+    from ..Caches import roleTypeCache
+    roleNames = roles.split(";")
+    roleNames = list(map(lambda item: item.strip(), roleNames))
+    # 👇 (generation, roleIdsNeeded), prepocita se po zmene typu roli
+    roleIdsNeeded = (None, None)
+
     async def updateRoleIdsNeeded(info: strawberry.types.Info):
         nonlocal roleIdsNeeded
-        if roleIdsNeeded is None:
-            allroles = await RBACPermission.getAllRoles(info=info)
-            roleIndex = {role["name"]: role["id"] for role in allroles}
-            roleNames = roles.split(";")
-            roleNames = list(map(lambda item: item.strip(), roleNames))
-            roleIdsNeeded = list(map(lambda roleName: roleIndex.get(roleName, None), roleNames))
-        return roleIdsNeeded
+        roleIndex = await roleTypeCache.byName(info)
+        generation, ids = roleIdsNeeded
+        if (ids is None) or (generation != roleTypeCache.generation):
+            ids = set(roleIndex[roleName]["id"] for roleName in roleNames if roleName in roleIndex)
+            roleIdsNeeded = (roleTypeCache.generation, ids)
+        return ids
 
     class RolebasedPermission(RBACPermission):
         message = "User has not appropriate roles"
@@ -538,16 +562,21 @@ def RoleBasedPermission(roles: str = ""):
             # self, source, info: strawberry.types.Info, **kwargs
             # self, source, **kwargs
         ) -> bool:
-            roleIdsNeeded = await updateRoleIdsNeeded(info=info)
             rbacobject = getattr(source, "id", None)
             assert rbacobject is not None, f"source rbacobject returned None {source}"
+            # 👇 role pro rbacobject se zaradi do davky jeste pred prvnim await,
+            # polozky listu tak sdili jeden dotaz i pri studene pameti typu roli
+            self.prefetchActiveRoles(rbacobject, info)
+            roleIdsNeeded = await updateRoleIdsNeeded(info=info)
             self.defaultResult = [] if info._field.type.__class__ == StrawberryList else None
             # return False
-            logging.info(f"has_permission {kwargs}")
+            logging.debug("has_permission %s", kwargs)
             # assert False
-            activeRoles = await self.getActiveRoles(rbacobject=rbacobject, info=info)
-            s = [r for r in activeRoles if (r["type"]["id"] in roleIdsNeeded)]           
-            isAllowed = len(s) > 0
+            async def decide():
+                activeRoles = await self.getActiveRoles(rbacobject=rbacobject, info=info)
+                s = [r for r in activeRoles if (r["type"]["id"] in roleIdsNeeded)]           
+                return len(s) > 0
+            isAllowed = await self.authorize(info, rbacobject, roleIdsNeeded, decide)
             return isAllowed
         
     return RolebasedPermission
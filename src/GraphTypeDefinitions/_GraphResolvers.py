@@ -1,5 +1,6 @@
 import strawberry
 import uuid
+import base64
 import datetime
 import typing
 from .BaseGQLModel import IDType
@@ -8,12 +9,26 @@ UserGQLModel = typing.Annotated["UserGQLModel", strawberry.lazy(".userGQLModel")
 GroupGQLModel = typing.Annotated["GroupGQLModel", strawberry.lazy(".groupGQLModel")]
 RBACObjectGQLModel = typing.Annotated["RBACObjectGQLModel", strawberry.lazy(".RBACObjectGQLModel")]
 from ._GraphPermissions import RoleBasedPermission, OnlyForAuthentized
-from ..Dataloaders import getUserFromInfo
+from ..Dataloaders import getUserFromInfo, getLoadersFromInfo, clearFkeyLoaders, pinToPrimary
 
 @strawberry.field(description="""Entity primary key""")
 def resolve_id(self) -> IDType:
     return self.id
 
+def encodeCursor(id) -> str:
+    "nepruhledny kurzor radku pro keyset strankovani (after), urlsafe base64 z id"
+    return base64.urlsafe_b64encode(id.bytes).decode("ascii").rstrip("=")
+
+def decodeCursor(cursor: str) -> IDType:
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError(f"invalid cursor {cursor}")
+
+@strawberry.field(description="""Opaque cursor of the entity, pass it as `after` to get the next page of `*Page` queries""")
+def resolve_cursor(self) -> str:
+    return encodeCursor(self.id)
+
 @strawberry.field(
     description="""Name """,
     permission_classes=[OnlyForAuthentized])
@@ -63,34 +78,188 @@ async def resolve_rbacobject(self) -> typing.Optional[RBACObjectGQLModel]:
     return result
 
 
-async def encapsulateUpdate(info, loader, entity, result):
+async def encapsulateUpdate(info, loader, entity, result, inTransaction=None):
+    """inTransaction(session, row) je volano v teze transakci jako zmena (odvozene tabulky, napr. groupclosures)"""
     user = getUserFromInfo(info)
     entity.changedby = user["id"]
-
-    row = await loader.update(entity)
+    pinToPrimary(info)
+
+    if inTransaction is None:
+        row = await loader.update(entity)
+    else:
+        row = await updateInTransaction(info, loader, entity, inTransaction)
+    clearFkeyLoaders(info, loader.getModel())
+    getLoadersFromInfo(info).authorizations.clear()
     result.msg = "fail" if row is None else "ok"
     return result
 
-async def encapsulateInsert(info, loader, entity, result):
+async def encapsulateInsert(info, loader, entity, result, inTransaction=None):
+    """inTransaction(session, row) je volano v teze transakci jako vlozeni (odvozene tabulky, napr. groupclosures)"""
     user = getUserFromInfo(info)
     entity.createdby = user["id"]
+    pinToPrimary(info)
     
-    row = await loader.insert(entity)
+    if inTransaction is None:
+        row = await loader.insert(entity)
+    else:
+        row = await insertInTransaction(info, loader, entity, inTransaction)
+    clearFkeyLoaders(info, loader.getModel())
+    getLoadersFromInfo(info).authorizations.clear()
     result.msg = "ok"
     result.id = result.id if result.id else row.id       
     return result   
 
+import logging
+import sqlalchemy
 import sqlalchemy.exc
 
-async def encapsulateDelete(info, loader, id, result):
+async def encapsulateDelete(info, loader, id, result, inTransaction=None):
+    """inTransaction(session, id) je volano v teze transakci pred smazanim (odvozene tabulky, napr. groupclosures)"""
     # try:
     #     await loader.delete(id)
     # except sqlalchemy.exc.IntegrityError as e:
     #     result.msg='fail'
     # return result
-    await loader.delete(id)
+    pinToPrimary(info)
+    if inTransaction is None:
+        await loader.delete(id)
+    else:
+        await deleteInTransaction(info, loader, id, inTransaction)
+    clearFkeyLoaders(info, loader.getModel())
+    getLoadersFromInfo(info).authorizations.clear()
     return result
-    
+
+async def insertInTransaction(info, loader, entity, inTransaction):
+    "jako loader.insert, navic inTransaction(session, row) pred potvrzenim"
+    DBModel = loader.getModel()
+    row = DBModel(**entityValues(DBModel, entity))
+    asyncSessionMaker = getLoadersFromInfo(info).asyncSessionMaker
+    async with asyncSessionMaker() as session:
+        async with session.begin():
+            session.add(row)
+            await session.flush()
+            await inTransaction(session, row)
+    loader.registerResult(row)
+    return row
+
+async def updateInTransaction(info, loader, entity, inTransaction):
+    "jako loader.update (kontrola lastchange), navic inTransaction(session, row) pred potvrzenim"
+    DBModel = loader.getModel()
+    asyncSessionMaker = getLoadersFromInfo(info).asyncSessionMaker
+    async with asyncSessionMaker() as session:
+        async with session.begin():
+            row = (await session.execute(sqlalchemy.select(DBModel).where(DBModel.id == entity.id))).scalar_one_or_none()
+            if (row is None) or (row.lastchange != entity.lastchange):
+                return None
+            for (name, value) in entityValues(DBModel, entity, {"lastchange": datetime.datetime.now()}).items():
+                setattr(row, name, value)
+            await session.flush()
+            await inTransaction(session, row)
+    loader.registerResult(row)
+    return row
+
+async def deleteInTransaction(info, loader, id, inTransaction):
+    "jako loader.delete, navic inTransaction(session, id) pred smazanim"
+    DBModel = loader.getModel()
+    asyncSessionMaker = getLoadersFromInfo(info).asyncSessionMaker
+    async with asyncSessionMaker() as session:
+        async with session.begin():
+            await inTransaction(session, id)
+            await session.execute(sqlalchemy.delete(DBModel).where(DBModel.id == id))
+    loader.clear(id)
+
+def entityValues(DBModel, entity, extraValues={}):
+    "hodnoty sloupcu DBModel z entity, hodnoty None se vynechavaji (stejne jako update z uoishelpers)"
+    values = {}
+    for name in DBModel.__table__.columns.keys():
+        value = getattr(entity, name, None)
+        if value is not None:
+            values[name] = value
+    return {**values, **extraValues}
+
+async def encapsulateInsertMany(info, loader, entities, resultType, extraValues=lambda entity: {}):
+    """Vlozi vsechny entity v jedne transakci jedinym INSERT ... RETURNING (u postgresu vice radku v jednom VALUES).
+    Vysledky jsou ve stejnem poradi jako entities. Entita bez id dostane nove id.
+    Pokud davka selze (duplicitni id, neexistujici cizi klic, ...), vklada se znovu po jedne entite,
+    kazda ve vlastni transakci, neuspesne maji msg="fail" a v reason duvod.
+    """
+    if len(entities) == 0:
+        return []
+    user = getUserFromInfo(info)
+    pinToPrimary(info)
+    DBModel = loader.getModel()
+    values = []
+    for entity in entities:
+        # 👇 vychozi hodnota vstupu by byla spolecna vsem polozkam
+        if entity.id is None:
+            entity.id = uuid.uuid1()
+        entity.createdby = user["id"]
+        values.append(entityValues(DBModel, entity, extraValues(entity)))
+
+    statement = sqlalchemy.insert(DBModel).returning(DBModel, sort_by_parameter_order=True)
+    asyncSessionMaker = getLoadersFromInfo(info).asyncSessionMaker
+    results = [resultType(id=entity.id, msg="ok") for entity in entities]
+    try:
+        async with asyncSessionMaker() as session:
+            async with session.begin():
+                rows = (await session.execute(statement, values)).scalars().all()
+    except sqlalchemy.exc.IntegrityError as e:
+        logging.info("insert of %s %s failed (%s), inserting one by one", len(values), DBModel.__tablename__, e.orig)
+        rows = []
+        async with asyncSessionMaker() as session:
+            for (value, result) in zip(values, results):
+                try:
+                    async with session.begin():
+                        rows.extend((await session.execute(statement, [value])).scalars().all())
+                except sqlalchemy.exc.IntegrityError as e:
+                    result.msg = "fail"
+                    result.reason = f"{e.orig}"
+
+    clearFkeyLoaders(info, DBModel)
+    getLoadersFromInfo(info).authorizations.clear()
+    for row in rows:
+        loader.prime(row.id, row)
+    return results
+
+async def encapsulateUpdateMany(info, loader, entities, resultType):
+    """Zmeni vsechny entity v jedne transakci, radky se nacitaji jednim selectem.
+    Kazda entita se kontroluje zvlast (lastchange), vysledky jsou ve stejnem poradi jako entities.
+    """
+    if len(entities) == 0:
+        return []
+    user = getUserFromInfo(info)
+    pinToPrimary(info)
+    DBModel = loader.getModel()
+    ids = [entity.id for entity in entities]
+    results = [resultType(id=entity.id, msg="fail") for entity in entities]
+    updated = []
+
+    asyncSessionMaker = getLoadersFromInfo(info).asyncSessionMaker
+    async with asyncSessionMaker() as session:
+        async with session.begin():
+            statement = sqlalchemy.select(DBModel).where(DBModel.id.in_(ids))
+            rows = {row.id: row for row in (await session.execute(statement)).scalars()}
+            now = datetime.datetime.now()
+            for (entity, result) in zip(entities, results):
+                row = rows.get(entity.id, None)
+                if row is None:
+                    result.reason = "not found"
+                    continue
+                if row.lastchange != entity.lastchange:
+                    result.reason = "lastchange mismatch"
+                    continue
+                entity.changedby = user["id"]
+                for (name, value) in entityValues(DBModel, entity, {"lastchange": now}).items():
+                    setattr(row, name, value)
+                result.msg = "ok"
+                updated.append(row)
+
+    clearFkeyLoaders(info, DBModel)
+    getLoadersFromInfo(info).authorizations.clear()
+    for row in updated:
+        loader.clear(row.id)
+        loader.prime(row.id, row)
+    return results
 
 resolve_result_id: IDType = strawberry.field(description="primary key of CU operation object",
     permission_classes=[OnlyForAuthentized])
@@ -341,3 +510,81 @@ from functools import wraps
 #         result = await loader.page(skip=skip, limit=limit, where=wf, orderby=orderby, desc=desc)
 #         return result
 #     return paged
+
+import os
+from sqlalchemy import select, and_, or_, tuple_
+from uoishelpers.dataloaders import prepareSelect
+
+GQL_MAX_PAGE_SIZE = int(os.getenv("GQL_MAX_PAGE_SIZE", "1000"))
+# 👇 velikost stranky, pokud limit / first neni zadan
+PAGE_SIZE = 10
+
+def clampPageSize(size, default=PAGE_SIZE, maxPageSize=None):
+    "velikost stranky v mezich 0..GQL_MAX_PAGE_SIZE, None znamena default (zaporny LIMIT je v SQLite bez omezeni)"
+    pageSize = GQL_MAX_PAGE_SIZE if maxPageSize is None else maxPageSize
+    size = default if size is None else size
+    return max(0, min(size, pageSize))
+
+def keysetStatement(DBModel, statement, orderby=None, desc=None, afterRow=None):
+    """Serazeni podle (orderby, id) a pokracovani za radkem afterRow (keyset, bez OFFSET).
+    Radky s NULL v orderby sloupci jsou vzdy na konci.
+    """
+    idColumn = DBModel.id
+    column = None if orderby is None else getattr(DBModel, orderby, None)
+    if column is None:
+        if afterRow is not None:
+            statement = statement.where(idColumn < afterRow.id if desc else idColumn > afterRow.id)
+        return statement.order_by(idColumn.desc() if desc else idColumn.asc())
+
+    if afterRow is not None:
+        value = getattr(afterRow, orderby)
+        if value is None:
+            # 👇 uz jsme v NULL casti
+            statement = statement.where(and_(column.is_(None), idColumn < afterRow.id if desc else idColumn > afterRow.id))
+        else:
+            key = tuple_(column, idColumn)
+            statement = statement.where(or_(
+                key < tuple_(value, afterRow.id) if desc else key > tuple_(value, afterRow.id),
+                column.is_(None)
+            ))
+    if desc:
+        return statement.order_by(column.desc().nulls_last(), idColumn.desc())
+    return statement.order_by(column.asc().nulls_last(), idColumn.asc())
+
+def createPageResolver(GQLModel, WhereFilterModel, maxPageSize=None):
+    """Resolver pro *_page s omezenou velikosti stranky (GQL_MAX_PAGE_SIZE).
+    Bez after / first se strankuje pres skip / limit (OFFSET) jako doposud.
+    S after (kurzor posledniho radku predchozi stranky, viz resolve_cursor) nebo first se pouzije keyset strankovani
+    na (orderby, id), ktere je stejne rychle pro prvni i posledni stranku.
+    Vetsi limit / first se zkrati na maximum (bez chyby), zaporny na 0, None znamena vychozi velikost.
+    """
+    async def page_resolver(self, info: strawberry.types.Info,
+        skip: typing.Optional[int] = 0,
+        limit: typing.Annotated[typing.Optional[int], strawberry.argument(
+            description="page size (OFFSET paging), 0 to GQL_MAX_PAGE_SIZE, values outside are clamped")] = PAGE_SIZE,
+        where: typing.Optional[WhereFilterModel] = None,
+        orderby: typing.Optional[str] = None,
+        desc: typing.Optional[bool] = None,
+        after: typing.Annotated[typing.Optional[str], strawberry.argument(
+            description="cursor of the last entity of previous page (its `cursor` field), switches to keyset paging")] = None,
+        first: typing.Annotated[typing.Optional[int], strawberry.argument(
+            description="page size (keyset paging), 0 to GQL_MAX_PAGE_SIZE, values outside are clamped")] = None
+    ) -> typing.List[GQLModel]:
+        wheredict = None if where is None else strawberry.asdict(where)
+        loader = GQLModel.getLoader(info)
+        if (after is None) and (first is None):
+            size = clampPageSize(limit, maxPageSize=maxPageSize)
+            return await loader.page(where=wheredict, skip=max(0, skip or 0), limit=size, orderby=orderby, desc=desc)
+
+        DBModel = loader.getModel()
+        afterRow = None
+        if after is not None:
+            afterRow = await loader.load(decodeCursor(after))
+            if afterRow is None:
+                raise ValueError(f"after={after} does not exist")
+        statement = select(DBModel) if wheredict is None else prepareSelect(DBModel, wheredict)
+        statement = keysetStatement(DBModel, statement, orderby=orderby, desc=desc, afterRow=afterRow)
+        size = clampPageSize(first if first is not None else limit, maxPageSize=maxPageSize)
+        statement = statement.limit(size)
+        return await loader.execute_select(statement)
+    return page_resolver
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+
+import strawberry
+from strawberry.types.info import Info
+from strawberry.federation.schema import FederationAny
+
+
+class Schema(strawberry.federation.Schema):
+    """Federovane schema, ktere _entities resi po typech.
+    Reprezentace typu s resolve_references (viz BaseGQLModel) a jedinym klicem id
+    se vyresi jednim volanim resolve_references pro kazdy typ, ostatni standardne po jedne.
+    """
+    async def entities_resolver(
+        self, info: Info, representations: list[FederationAny]
+    ) -> list[FederationAny]:
+        results = [None] * len(representations)
+        batches = {}
+        singles = []
+        for index, representation in enumerate(representations):
+            type_ = self.schema_converter.type_map[representation["__typename"]]
+            origin = type_.definition.origin
+            if hasattr(origin, "resolve_references") and representation.keys() == {"__typename", "id"}:
+                batches.setdefault(origin, []).append(index)
+            else:
+                singles.append(index)
+
+        async def resolveBatch(origin, indexes):
+            try:
+                rows = await origin.resolve_references(info, [representations[index]["id"] for index in indexes])
+            except Exception as e:
+                logging.info("_entities of %s failed: %s", origin.__name__, e)
+                rows = [e] * len(indexes)
+            for index, row in zip(indexes, rows):
+                results[index] = row
+
+        await asyncio.gather(*(resolveBatch(origin, indexes) for origin, indexes in batches.items()))
+        if singles:
+            singleResults = super().entities_resolver(info, [representations[index] for index in singles])
+            for index, result in zip(singles, singleResults):
+                results[index] = result
+        return results
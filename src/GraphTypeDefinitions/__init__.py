@@ -46,4 +46,11 @@ from .roleTypeGQLModel import RoleTypeGQLModel
 from .RBACObjectGQLModel import RBACObjectGQLModel
 from .BaseGQLModel import IDType
 
-schema = strawberry.federation.Schema(query=Query, types=(RBACObjectGQLModel, IDType), mutation=Mutation)
+from ._GraphExtensions import PrimaryDBForMutations, CachedDocuments, QueryCostAnalysis
+from ._GraphSchema import Schema
+schema = Schema(
+    query=Query, 
+    types=(RBACObjectGQLModel, IDType), 
+    mutation=Mutation,
+    extensions=[CachedDocuments, QueryCostAnalysis, PrimaryDBForMutations]
+)
@@ -13,6 +13,8 @@ from ._GraphPermissions import (
 )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -42,6 +44,7 @@ class GroupCategoryGQLModel(BaseGQLModel):
         return getLoader(info).GroupCategoryModel
         
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     name_en = resolve_name_en
     changedby = resolve_changedby
@@ -105,7 +108,7 @@ group_category_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.GroupCategoryModel.resolve_page(GroupCategoryGQLModel, GroupCategoryInputWhereFilter)
+    resolver=createPageResolver(GroupCategoryGQLModel, WhereFilterModel=GroupCategoryInputWhereFilter)
 )
 
 # @strawberry.field(
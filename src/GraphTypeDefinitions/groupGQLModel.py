@@ -16,6 +16,8 @@ from ._GraphPermissions import (
     )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -27,13 +29,26 @@ from ._GraphResolvers import (
 
     encapsulateInsert,
     encapsulateUpdate,
-    encapsulateDelete
+    encapsulateDelete,
+    clampPageSize,
+    decodeCursor
 )
+from ._GraphExtensions import UNBOUNDED_LIST
 
 from src.Dataloaders import (
     getLoadersFromInfo as getLoader,
     getUserFromInfo)
 from src.DBResolvers import DBResolvers
+from src.GroupTree import (
+    groupClosureInsert,
+    groupClosureMove,
+    groupClosureDelete,
+    ancestryIndex,
+    adjacencyIndex,
+    getGroupAncestors,
+    getGroupDescendants,
+    allMembersStatement
+)
 
 GroupTypeGQLModel = Annotated["GroupTypeGQLModel", strawberry.lazy(".groupTypeGQLModel")]
 MembershipGQLModel = Annotated["MembershipGQLModel", strawberry.lazy(".membershipGQLModel")]
@@ -41,6 +56,8 @@ MembershipInputWhereFilter = Annotated["MembershipInputWhereFilter", strawberry.
 RoleGQLModel = Annotated["RoleGQLModel", strawberry.lazy(".roleGQLModel")]
 RoleInputWhereFilter = Annotated["RoleInputWhereFilter", strawberry.lazy(".roleGQLModel")]
 GroupTypeInputWhereFilter = Annotated["GroupTypeInputWhereFilter", strawberry.lazy(".groupTypeGQLModel")]
+UserGQLModel = Annotated["UserGQLModel", strawberry.lazy(".userGQLModel")]
+UserInputWhereFilter = Annotated["UserInputWhereFilter", strawberry.lazy(".userGQLModel")]
 
 
 from .utils import createInputs
@@ -75,6 +92,7 @@ class GroupGQLModel(BaseGQLModel):
         return getLoader(info).GroupModel
 
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     name_en = resolve_name_en
     changedby = resolve_changedby
@@ -125,9 +143,18 @@ class GroupGQLModel(BaseGQLModel):
         where: Optional["GroupInputWhereFilter"] = None, 
         skip: Optional[int] = 0, limit: Optional[int] = 100
     ) -> List["GroupGQLModel"]:
-        wheredict = None if where is None else strawberry.asdict(where)
-        extendedfilter = {"mastergroup_id": self.id}
         loader = GroupGQLModel.getLoader(info)
+        # 👇 zaporne hodnoty by slice ve stromu i OFFSET / LIMIT v DB vykladaly jinak
+        skip = max(0, skip or 0)
+        limit = 100 if limit is None else max(0, limit)
+        if where is None:
+            # 👇 podrizene ze stromu v pameti, radky pres loader (jeden dotaz na celou uroven stromu)
+            index = await adjacencyIndex.ensure(loader.getAsyncSessionMaker())
+            ids = index.childIds(self.id)[skip:skip + limit]
+            rows = await loader.load_many(ids)
+            return [row for row in rows if row is not None]
+        wheredict = strawberry.asdict(where)
+        extendedfilter = {"mastergroup_id": self.id}
         return await loader.page(skip=skip, limit=limit, orderby="name", where=wheredict, extendedfilter=extendedfilter)
 
     @strawberry.field(
@@ -138,6 +165,8 @@ class GroupGQLModel(BaseGQLModel):
     async def mastergroup(
         self, info: strawberry.types.Info
     ) -> Optional["GroupGQLModel"]:
+        if self.mastergroup_id is None:
+            return None
         result = await GroupGQLModel.resolve_reference(info, id=self.mastergroup_id)
         return result
 
@@ -193,6 +222,29 @@ class GroupGQLModel(BaseGQLModel):
         resolver=DBResolvers.GroupModel.roles(RoleGQLModel, WhereFilterModel=RoleInputWhereFilter)
     )
 
+    @strawberry.field(
+        description="""Users with a valid membership in the group or in any of its subgroups (at any level), each user once.
+Ordered by user id, next page starts after the cursor of the last user of previous page.""",
+        permission_classes=[
+            OnlyForAuthentized
+        ])
+    async def all_members(
+        self, info: strawberry.types.Info,
+        where: Optional[UserInputWhereFilter] = None,
+        first: Annotated[Optional[int], strawberry.argument(
+            description="page size, 0 to GQL_MAX_PAGE_SIZE, values outside are clamped, null means 100")] = 100,
+        after: Annotated[Optional[str], strawberry.argument(
+            description="cursor of the last user of previous page (its `cursor` field)")] = None
+    ) -> List[UserGQLModel]:
+        from .userGQLModel import UserGQLModel
+        loader = UserGQLModel.getLoader(info)
+        statement = allMembersStatement(
+            self.id,
+            where=None if where is None else strawberry.asdict(where),
+            first=clampPageSize(first, default=100),
+            after=None if after is None else decodeCursor(after))
+        return await loader.execute_select(statement)
+
     RBACObjectGQLModel = Annotated["RBACObjectGQLModel", strawberry.lazy(".RBACObjectGQLModel")]
     @strawberry.field(
         description="""rbacobject represents an user or a group which allows to derive needed roles for CRUD operations""",
@@ -240,7 +292,7 @@ group_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.GroupModel.resolve_page(GroupGQLModel, WhereFilterModel=GroupInputWhereFilter)
+    resolver=createPageResolver(GroupGQLModel, WhereFilterModel=GroupInputWhereFilter)
 )
 
 # @strawberry.field(
@@ -263,6 +315,83 @@ group_by_id = strawberry.field(
     resolver=DBResolvers.GroupModel.resolve_by_id(GroupGQLModel)
 )
 
+@strawberry.type(description="""Node of the group tree (see groupTree, groupAncestors, groupDescendants)""")
+class GroupTreeNodeGQLModel:
+    id: IDType = strawberry.field(description="""Group's id""")
+    name: Optional[str] = strawberry.field(description="""Group's name""")
+    valid: Optional[bool] = strawberry.field(description="""Group's validity""")
+    grouptype_id: Optional[IDType] = strawberry.field(description="""Group's type id""")
+    mastergroup_id: Optional[IDType] = strawberry.field(description="""Commanding group's id""")
+    depth: int = strawberry.field(description="""Number of hops from the queried (root) group""")
+
+    @strawberry.field(
+        description="""The group itself""",
+        permission_classes=[
+            OnlyForAuthentized
+        ])
+    async def group(self, info: strawberry.types.Info) -> Optional[GroupGQLModel]:
+        return await GroupGQLModel.resolve_reference(info, self.id)
+
+def asTreeNodes(loader, rows):
+    "(GroupModel, hloubka) -> GroupTreeNodeGQLModel, radky se vlozi do loaderu (pole group uz DB nezatezuje)"
+    result = []
+    for (row, depth) in rows:
+        loader.prime(row.id, row)
+        result.append(GroupTreeNodeGQLModel(
+            id=row.id, name=row.name, valid=row.valid,
+            grouptype_id=row.grouptype_id, mastergroup_id=row.mastergroup_id,
+            depth=depth))
+    return result
+
+@strawberry.field(
+    description="""Returns all commanding groups of the group (the group itself excluded), nearest first, depth is the number of hops""",
+    permission_classes=[
+        OnlyForAuthentized
+    ])
+async def group_ancestors(
+    self, info: strawberry.types.Info, id: IDType
+) -> List[GroupTreeNodeGQLModel]:
+    loader = GroupGQLModel.getLoader(info)
+    rows = await getGroupAncestors(loader.getAsyncSessionMaker(), id)
+    return asTreeNodes(loader, rows)
+
+@strawberry.field(
+    description="""Returns all subgroups of the group at any level (the group itself excluded), ordered by depth and name.
+Can be limited by max_depth, grouptype_id and valid (like all departments under a faculty).""",
+    permission_classes=[
+        OnlyForAuthentized
+    ],
+    metadata=UNBOUNDED_LIST)
+async def group_descendants(
+    self, info: strawberry.types.Info, id: IDType,
+    max_depth: Optional[int] = None,
+    grouptype_id: Optional[IDType] = None,
+    valid: Optional[bool] = None
+) -> List[GroupTreeNodeGQLModel]:
+    loader = GroupGQLModel.getLoader(info)
+    rows = await getGroupDescendants(loader.getAsyncSessionMaker(), id, maxDepth=max_depth, grouptype_id=grouptype_id, valid=valid)
+    return asTreeNodes(loader, rows)
+
+@strawberry.field(
+    description="""Returns the subtree of the group rootId (root first, then subgroups depth first, ordered by name) up to depth levels.
+Nodes carry the tree structure (mastergroupId, depth), full groups are available via the `group` field.""",
+    permission_classes=[
+        OnlyForAuthentized
+    ],
+    metadata=UNBOUNDED_LIST)
+async def group_tree(
+    self, info: strawberry.types.Info, root_id: IDType, depth: Optional[int] = None
+) -> List[GroupTreeNodeGQLModel]:
+    loader = GroupGQLModel.getLoader(info)
+    index = await adjacencyIndex.ensure(loader.getAsyncSessionMaker())
+    return [
+        GroupTreeNodeGQLModel(
+            id=node.id, name=node.name, valid=node.valid,
+            grouptype_id=node.grouptype_id, mastergroup_id=node.mastergroup_id,
+            depth=level)
+        for (node, level) in index.subtree(root_id, depth)
+    ]
+
 # @strawberry.field(
 #     description="""Finds an user by letters in name and surname, letters should be atleast three""",
 #     deprecation_reason='replaced by `query($letters: String!){groupPage(where: {name: {_like: $letters}}) { id name }}`',
@@ -376,7 +505,15 @@ class UpdateGroupPermission(RBACPermission):
         UpdateGroupPermission
     ])
 async def group_update(self, info: strawberry.types.Info, group: GroupUpdateGQLModel) -> GroupResultGQLModel:
-    return await encapsulateUpdate(info, GroupGQLModel.getLoader(info), group, GroupResultGQLModel(id=group.id, msg="ok"))
+    loader = GroupGQLModel.getLoader(info)
+    async def moveInClosure(session, row):
+        if group.mastergroup_id is not None:
+            await groupClosureMove(session, row.id, row.mastergroup_id)
+    result = await encapsulateUpdate(info, loader, group, GroupResultGQLModel(id=group.id, msg="ok"), inTransaction=moveInClosure)
+    if result.msg == "ok":
+        ancestryIndex.invalidate(group.id)
+        adjacencyIndex.put(await loader.load(group.id))
+    return result
 
 class InsertGroupPermission(RBACPermission):
     message = "User is not allowed to create a new group"
@@ -389,7 +526,7 @@ class InsertGroupPermission(RBACPermission):
             allowedRoleNames=allowedRolesNames)
         if result is None:
             user = getUserFromInfo(info)
-            logging.info(f"user {user} has no right to insert new group {group}")
+            logging.info("user %s has no right to insert new group %s", user, group)
             print(f"user {user} has no right to insert new group {group}")
         # else:
         #     user = getUserFromInfo(info)
@@ -405,7 +542,12 @@ class InsertGroupPermission(RBACPermission):
     ])
 async def group_insert(self, info: strawberry.types.Info, group: GroupInsertGQLModel) -> Optional[GroupResultGQLModel]:
     group.rbacobject = group.id
-    return await encapsulateInsert(info, GroupGQLModel.getLoader(info), group, GroupResultGQLModel(id=group.id, msg="ok"))
+    loader = GroupGQLModel.getLoader(info)
+    async def insertIntoClosure(session, row):
+        await groupClosureInsert(session, row.id, row.mastergroup_id)
+    result = await encapsulateInsert(info, loader, group, GroupResultGQLModel(id=group.id, msg="ok"), inTransaction=insertIntoClosure)
+    adjacencyIndex.put(await loader.load(result.id))
+    return result
 
 
 @strawberry.mutation(
@@ -415,7 +557,11 @@ async def group_insert(self, info: strawberry.types.Info, group: GroupInsertGQLM
         OnlyForAdmins
     ])
 async def group_delete(self, info: strawberry.types.Info, id: IDType) -> GroupResultGQLModel:
-    return await encapsulateDelete(info, GroupGQLModel.getLoader(info), id, GroupResultGQLModel(msg="ok", id=None))
+    loader = GroupGQLModel.getLoader(info)
+    result = await encapsulateDelete(info, loader, id, GroupResultGQLModel(msg="ok", id=None), inTransaction=groupClosureDelete)
+    ancestryIndex.invalidate(id)
+    adjacencyIndex.remove(id)
+    return result
 
 
 # @strawberry.mutation(
@@ -13,6 +13,8 @@ from ._GraphPermissions import (
 )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -29,6 +31,7 @@ from src.Dataloaders import (
     getLoadersFromInfo as getLoader,
     getUserFromInfo)
 from src.DBResolvers import DBResolvers
+from src.Caches import groupTypeCache
 
 GroupGQLModel = Annotated["GroupGQLModel", strawberry.lazy(".groupGQLModel")]
 GroupCategoryGQLModel = Annotated["GroupCategoryGQLModel", strawberry.lazy(".groupCategoryGQLModel")]
@@ -46,6 +49,7 @@ class GroupTypeGQLModel(BaseGQLModel):
         return getLoader(info).GroupTypeModel
         
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     name_en = resolve_name_en
     changedby = resolve_changedby
@@ -104,7 +108,7 @@ group_type_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.GroupTypeModel.resolve_page(GroupTypeGQLModel, WhereFilterModel=GroupTypeInputWhereFilter)
+    resolver=createPageResolver(GroupTypeGQLModel, WhereFilterModel=GroupTypeInputWhereFilter)
 )
 
 group_type_by_id = strawberry.field(
@@ -154,7 +158,9 @@ class GroupTypeResultGQLModel:
         OnlyForAdmins
     ])
 async def group_type_update(self, info: strawberry.types.Info, group_type: GroupTypeUpdateGQLModel) -> GroupTypeResultGQLModel:
-    return await encapsulateUpdate(info, GroupTypeGQLModel.getLoader(info), group_type, GroupTypeResultGQLModel(id=group_type.id, msg="ok"))
+    result = await encapsulateUpdate(info, GroupTypeGQLModel.getLoader(info), group_type, GroupTypeResultGQLModel(id=group_type.id, msg="ok"))
+    groupTypeCache.invalidate()
+    return result
 
 @strawberry.mutation(
     description="""Inserts a group type""",
@@ -163,7 +169,9 @@ async def group_type_update(self, info: strawberry.types.Info, group_type: Group
         OnlyForAdmins
     ])
 async def group_type_insert(self, info: strawberry.types.Info, group_type: GroupTypeInsertGQLModel) -> GroupTypeResultGQLModel:
-    return await encapsulateInsert(info, GroupTypeGQLModel.getLoader(info), group_type, GroupTypeResultGQLModel(id=None, msg="ok"))
+    result = await encapsulateInsert(info, GroupTypeGQLModel.getLoader(info), group_type, GroupTypeResultGQLModel(id=None, msg="ok"))
+    groupTypeCache.invalidate()
+    return result
 
 @strawberry.mutation(
     description="Deletes the group type",
@@ -172,4 +180,6 @@ async def group_type_insert(self, info: strawberry.types.Info, group_type: Group
         OnlyForAdmins
     ])
 async def group_type_delete(self, info: strawberry.types.Info, id: IDType) -> GroupTypeResultGQLModel:
-    return await encapsulateDelete(info, GroupTypeGQLModel.getLoader(info), id, GroupTypeResultGQLModel(msg="ok", id=None))
+    result = await encapsulateDelete(info, GroupTypeGQLModel.getLoader(info), id, GroupTypeResultGQLModel(msg="ok", id=None))
+    groupTypeCache.invalidate()
+    return result
@@ -12,6 +12,8 @@ from ._GraphPermissions import (
 )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -21,7 +23,9 @@ from ._GraphResolvers import (
     
     encapsulateInsert,
     encapsulateUpdate,
-    encapsulateDelete
+    encapsulateDelete,
+    encapsulateInsertMany,
+    encapsulateUpdateMany
 )
 
 from src.Dataloaders import (
@@ -42,6 +46,7 @@ class MembershipGQLModel(BaseGQLModel):
         return getLoader(info).MembershipModel
 
     id = resolve_id
+    cursor = resolve_cursor
     changedby = resolve_changedby
     created = resolve_created
     lastchange = resolve_lastchange
@@ -121,7 +126,7 @@ membership_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.MembershipModel.resolve_page(MembershipGQLModel, WhereFilterModel=MembershipInputWhereFilter)
+    resolver=createPageResolver(MembershipGQLModel, WhereFilterModel=MembershipInputWhereFilter)
 )
 
 membership_by_id = strawberry.field(
@@ -152,7 +157,7 @@ class MembershipUpdateGQLModel:
 class MembershipInsertGQLModel:
     user_id: IDType
     group_id: IDType
-    id: Optional[IDType] = strawberry.field(description="Primary key of entity", default_factory=uuid.uuid1)
+    id: Optional[IDType] = strawberry.field(description="Primary key of entity", default=None)
     valid: Optional[bool] = True
     startdate: Optional[datetime.datetime] = None
     enddate: Optional[datetime.datetime] = None
@@ -163,6 +168,7 @@ class MembershipInsertGQLModel:
 class MembershipResultGQLModel:
     id: IDType = None
     msg: str = None
+    reason: Optional[str] = strawberry.field(description="why the operation failed (bulk operations), null if msg is ok", default=None)
 
     @strawberry.field(description="""Result of membership operation""")
     async def membership(self, info: strawberry.types.Info) -> Union[MembershipGQLModel, None]:
@@ -238,3 +244,53 @@ async def membership_insert(self,
     ])
 async def membership_delete(self, info: strawberry.types.Info, id: IDType) -> MembershipResultGQLModel:
     return await encapsulateDelete(info, MembershipGQLModel.getLoader(info), id, MembershipResultGQLModel(msg="ok", id=None))
+
+class InsertManyMembershipPermission(RBACPermission):
+    message = "User is not allowed create new memberships"
+    async def has_permission(self, source, info: strawberry.types.Info, memberships: List["MembershipInsertGQLModel"]) -> bool:
+        roles = await self.resolveUserRoles(info, 
+            [membership.group_id for membership in memberships],
+            adminRoleNames=["administrátor"], 
+            allowedRoleNames=["garant"])
+        return all(roles.values())
+
+@strawberry.mutation(
+    description="""Inserts new memberships in one transaction.
+Permission is checked once per group, results are in the same order as memberships.""",
+    permission_classes=[
+        OnlyForAuthentized,
+        InsertManyMembershipPermission
+    ])
+async def membership_insert_many(self, 
+    info: strawberry.types.Info, 
+    memberships: List[MembershipInsertGQLModel]
+) -> List[MembershipResultGQLModel]:
+    return await encapsulateInsertMany(info, MembershipGQLModel.getLoader(info), memberships, MembershipResultGQLModel)
+
+class UpdateManyMembershipPermission(RBACPermission):
+    message = "User is not allowed to change memberships"
+    async def has_permission(self, source, info: strawberry.types.Info, memberships: List["MembershipUpdateGQLModel"]) -> bool:
+        loader = MembershipGQLModel.getLoader(info)
+        rows = await loader.load_many([membership.id for membership in memberships])
+        # 👇 vstup se nemeni, group_id by jinak skoncilo v hodnotach UPDATE (entityValues)
+        groupIds = {row.id: row.group_id for row in rows if row is not None}
+        # 👇 neexistujici membership neni co menit, skonci jako fail ve vysledku
+        roles = await self.resolveUserRoles(info, 
+            list(groupIds.values()),
+            adminRoleNames=["administrátor"], 
+            allowedRoleNames=["garant"])
+        return all(roles.values())
+
+@strawberry.mutation(
+    description="""Updates memberships in one transaction, cannot update group / user.
+Permission is checked once per group, each membership is checked against its lastchange.
+Results are in the same order as memberships.""",
+    permission_classes=[
+        OnlyForAuthentized,
+        UpdateManyMembershipPermission
+    ])
+async def membership_update_many(self, 
+    info: strawberry.types.Info, 
+    memberships: List[MembershipUpdateGQLModel]
+) -> List[MembershipResultGQLModel]:
+    return await encapsulateUpdateMany(info, MembershipGQLModel.getLoader(info), memberships, MembershipResultGQLModel)
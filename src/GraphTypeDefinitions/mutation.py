@@ -24,20 +24,28 @@ class Mutation:
     from .membershipGQLModel import (
         membership_insert,
         membership_update,
-        membership_delete
+        membership_delete,
+        membership_insert_many,
+        membership_update_many
     )
     membership_insert = membership_insert
     membership_update = membership_update
     membership_delete = membership_delete
+    membership_insert_many = membership_insert_many
+    membership_update_many = membership_update_many
     
     from .roleGQLModel import (
         role_insert,
         role_update,
-        role_delete
+        role_delete,
+        role_insert_many,
+        role_update_many
     )
     role_insert = role_insert
     role_update = role_update
     role_delete = role_delete
+    role_insert_many = role_insert_many
+    role_update_many = role_update_many
 
     from .roleTypeGQLModel import (
         role_type_insert,
@@ -17,6 +17,15 @@ class Query:
     from .groupGQLModel import group_page
     group_page = group_page
 
+    from .groupGQLModel import (
+        group_tree,
+        group_ancestors,
+        group_descendants
+    )
+    group_tree = group_tree
+    group_ancestors = group_ancestors
+    group_descendants = group_descendants
+
     from .roleTypeGQLModel import role_type_by_id
     role_type_by_id = role_type_by_id
 
@@ -77,7 +86,8 @@ class Query:
         statemachine_page,
 
         statetransition_page,
-        statetransition_by_id
+        statetransition_by_id,
+        user_can_many
         # statec
     )
 
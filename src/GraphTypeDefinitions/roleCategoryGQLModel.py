@@ -14,6 +14,8 @@ from ._GraphPermissions import (
 )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -30,6 +32,7 @@ from src.Dataloaders import (
     getLoadersFromInfo as getLoader,
     getUserFromInfo)
 from src.DBResolvers import DBResolvers
+from src.Caches import roleCategoryCache
 
 RoleTypeGQLModel = Annotated["RoleTypeGQLModel", strawberry.lazy(".roleTypeGQLModel")]
 RoleTypeInputWhereFilter = Annotated["RoleTypeInputWhereFilter", strawberry.lazy(".roleTypeGQLModel")]
@@ -43,6 +46,7 @@ class RoleCategoryGQLModel(BaseGQLModel):
         return getLoader(info).RoleCategoryModel
     
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     name_en = resolve_name_en
     changedby = resolve_changedby
@@ -95,7 +99,7 @@ role_category_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.RoleCategoryModel.resolve_page(RoleCategoryGQLModel, WhereFilterModel=RoleCategoryInputWhereFilter)
+    resolver=createPageResolver(RoleCategoryGQLModel, WhereFilterModel=RoleCategoryInputWhereFilter)
 )
 #####################################################################
 #
@@ -154,7 +158,9 @@ async def role_category_update(self,
     role_category: RoleCategoryUpdateGQLModel
 
 ) -> RoleCategoryResultGQLModel:
-    return await encapsulateUpdate(info, RoleCategoryGQLModel.getLoader(info), role_category, RoleCategoryResultGQLModel(id=role_category.id, msg="ok"))
+    result = await encapsulateUpdate(info, RoleCategoryGQLModel.getLoader(info), role_category, RoleCategoryResultGQLModel(id=role_category.id, msg="ok"))
+    roleCategoryCache.invalidate()
+    return result
 
 # class InsertRoleCategoryPermission(RBACPermission):
 #     message = "User is not allowed create new role category"
@@ -180,7 +186,9 @@ async def role_category_insert(self,
     role_category: RoleCategoryInsertGQLModel
 
 ) -> RoleCategoryResultGQLModel:
-    return await encapsulateInsert(info, RoleCategoryGQLModel.getLoader(info), role_category, RoleCategoryResultGQLModel(msg="ok", id=None))
+    result = await encapsulateInsert(info, RoleCategoryGQLModel.getLoader(info), role_category, RoleCategoryResultGQLModel(msg="ok", id=None))
+    roleCategoryCache.invalidate()
+    return result
 
 @strawberry.mutation(
     description="Deletes the role category",
@@ -189,4 +197,6 @@ async def role_category_insert(self,
         OnlyForAdmins
     ])
 async def role_category_delete(self, info: strawberry.types.Info, id: IDType) -> RoleCategoryResultGQLModel:
-    return await encapsulateDelete(info, RoleCategoryGQLModel.getLoader(info), id, RoleCategoryResultGQLModel(msg="ok", id=None))
+    result = await encapsulateDelete(info, RoleCategoryGQLModel.getLoader(info), id, RoleCategoryResultGQLModel(msg="ok", id=None))
+    roleCategoryCache.invalidate()
+    return result
@@ -1,6 +1,7 @@
 import datetime
 import strawberry
 import uuid
+import asyncio
 from typing import List, Optional, Union, Annotated
 from uoishelpers.resolvers import createInputs
 
@@ -14,6 +15,8 @@ from ._GraphPermissions import (
 import src.GraphTypeDefinitions
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -23,13 +26,16 @@ from ._GraphResolvers import (
 
     encapsulateInsert,
     encapsulateUpdate,
-    encapsulateDelete
+    encapsulateDelete,
+    encapsulateInsertMany,
+    encapsulateUpdateMany
 )
 
 from src.Dataloaders import (
     getLoadersFromInfo as getLoader,
     getUserFromInfo)
 from src.DBResolvers import DBResolvers
+from src.Caches import userRolesCache
 
 GroupGQLModel = Annotated["GroupGQLModel", strawberry.lazy(".groupGQLModel")]
 UserGQLModel = Annotated["UserGQLModel", strawberry.lazy(".userGQLModel")]
@@ -45,6 +51,7 @@ class RoleGQLModel(BaseGQLModel):
         return getLoader(info).RoleModel
 
     id = resolve_id
+    cursor = resolve_cursor
     changedby = resolve_changedby
     created = resolve_created
     lastchange = resolve_lastchange
@@ -135,8 +142,8 @@ class RoleInputWhereFilter:
     description="",
     permission_classes=[OnlyForAuthentized])
 async def role_by_user(self, info: strawberry.types.Info, user_id: IDType) -> List["RoleGQLModel"]:
-    loader = RoleGQLModel.getLoader(info)
-    rows = await loader.filter_by(user_id=user_id)
+    loader = getLoader(info).RoleModel_user_id
+    rows = await loader.load(user_id)
     return rows
 
 role_by_id = strawberry.field(
@@ -153,7 +160,7 @@ role_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.RoleModel.resolve_page(RoleGQLModel, WhereFilterModel=RoleInputWhereFilter)
+    resolver=createPageResolver(RoleGQLModel, WhereFilterModel=RoleInputWhereFilter)
 )
 
 from src.DBDefinitions import (
@@ -163,9 +170,8 @@ from sqlalchemy import select
 
 async def resolve_roles_on_user(self, info: strawberry.types.Info, user_id: IDType, filter_user_id: Optional[IDType] = None) -> List["RoleGQLModel"]:
     # ve vsech skupinach, kde je user clenem najdi vsechny role a ty vrat
-    from .membershipGQLModel import MembershipGQLModel
-    loaderm = MembershipGQLModel.getLoader(info)
-    rows = await loaderm.filter_by(user_id = user_id)
+    loaderm = getLoader(info).MembershipModel_user_id
+    rows = await loaderm.load(user_id)
     groupids = [row.group_id for row in rows]
     # print("groupids", groupids)
     stmt = (
@@ -181,15 +187,11 @@ async def resolve_roles_on_user(self, info: strawberry.types.Info, user_id: IDTy
 
 async def resolve_roles_on_group(self, info: strawberry.types.Info, group_id: IDType, filter_user_id: Optional[IDType] = None) -> List["RoleGQLModel"]:
     # najdi vsechny role pro skupinu a nadrizene skupiny
+    # predci jsou ziskani z uzaveru stromu (groupclosures), misto dotazu na kazdou uroven
     from .groupGQLModel import GroupGQLModel
+    from src.GroupTree import getGroupAncestorIds
     grouploader = GroupGQLModel.getLoader(info)
-    groupids = []
-    cid = group_id
-    while cid is not None:
-        row = await grouploader.load(cid)
-        if row is None: break
-        groupids.append(row.id)
-        cid = row.mastergroup_id
+    groupids = await getGroupAncestorIds(grouploader.getAsyncSessionMaker(), group_id)
     # print("groupids", groupids)
     stmt = (
         select(RoleModel).
@@ -202,6 +204,12 @@ async def resolve_roles_on_group(self, info: strawberry.types.Info, group_id: ID
     rows = await roleloader.execute_select(stmt)
     return rows
 
+async def resolve_roles_on_rbacobject(info: strawberry.types.Info, rbacobject_id: IDType) -> List["RoleGQLModel"]:
+    # vsechny role vztazene k rbacobject (user nebo group) jednim dotazem, viz src.Dataloaders.createRBACRolesLoader
+    # 👇 soubezne dotazy (napr. has_permission pro kazdou polozku listu) jsou jeden dotaz pro vsechny rbacobjecty
+    rows = await getLoader(info).rbacroles.load(rbacobject_id)
+    return list(rows)
+
 roles_on_user_decsription = """
 ## Description
 
@@ -249,7 +257,7 @@ class RoleInsertGQLModel:
     user_id: IDType
     group_id: IDType
     roletype_id: IDType
-    id: Optional[IDType] = strawberry.field(description="primary key", default_factory=uuid.uuid1)
+    id: Optional[IDType] = strawberry.field(description="primary key", default=None)
     valid: Optional[bool] = True
     startdate: Optional[datetime.datetime] = strawberry.field(description="start datetime of role", default_factory=datetime.datetime.now)
     enddate: Optional[datetime.datetime] = None
@@ -260,6 +268,7 @@ class RoleInsertGQLModel:
 class RoleResultGQLModel:
     id: Optional[IDType] = None
     msg: str = None
+    reason: Optional[str] = strawberry.field(description="why the operation failed (bulk operations), null if msg is ok", default=None)
 
     @strawberry.field(description="""Result of user operation""")
     async def role(self, info: strawberry.types.Info) -> Optional[RoleGQLModel]:
@@ -291,7 +300,11 @@ async def role_update(self,
     info: strawberry.types.Info, 
     role: RoleUpdateGQLModel
 ) -> RoleResultGQLModel:
-    return await encapsulateUpdate(info, RoleGQLModel.getLoader(info), role, RoleResultGQLModel(msg="ok", id=role.id))
+    loader = RoleGQLModel.getLoader(info)
+    row = await loader.load(role.id)
+    result = await encapsulateUpdate(info, loader, role, RoleResultGQLModel(msg="ok", id=role.id))
+    userRolesCache.invalidate(None if row is None else row.user_id)
+    return result
 
 class InsertRolePermission(RBACPermission):
     message = "User is not allowed create new role"
@@ -317,7 +330,9 @@ async def role_insert(self,
     role: RoleInsertGQLModel
 ) -> RoleResultGQLModel:
     role.rbacobject = role.group_id
-    return await encapsulateInsert(info, RoleGQLModel.getLoader(info), role, RoleResultGQLModel(msg="ok", id=None))
+    result = await encapsulateInsert(info, RoleGQLModel.getLoader(info), role, RoleResultGQLModel(msg="ok", id=None))
+    userRolesCache.invalidate(role.user_id)
+    return result
     
 @strawberry.mutation(
     description="Deletes the role",
@@ -326,5 +341,65 @@ async def role_insert(self,
         OnlyForAdmins
     ])
 async def role_delete(self, info: strawberry.types.Info, id: IDType) -> RoleResultGQLModel:
-    return await encapsulateDelete(info, RoleGQLModel.getLoader(info), id, RoleResultGQLModel(msg="ok", id=None))
+    loader = RoleGQLModel.getLoader(info)
+    row = await loader.load(id)
+    result = await encapsulateDelete(info, loader, id, RoleResultGQLModel(msg="ok", id=None))
+    userRolesCache.invalidate(None if row is None else row.user_id)
+    return result
+
+class InsertManyRolePermission(RBACPermission):
+    message = "User is not allowed create new roles"
+    async def has_permission(self, source, info: strawberry.types.Info, roles: List[RoleInsertGQLModel]) -> bool:
+        userRoles = await self.resolveUserRoles(info, 
+            [role.group_id for role in roles],
+            adminRoleNames=["administrátor"], 
+            allowedRoleNames=["garant"])
+        return all(userRoles.values())
 
+@strawberry.mutation(
+    description="""Inserts roles in one transaction.
+Permission is checked once per group, results are in the same order as roles.""",
+    permission_classes=[
+        OnlyForAuthentized,
+        InsertManyRolePermission
+    ])
+async def role_insert_many(self, 
+    info: strawberry.types.Info, 
+    roles: List[RoleInsertGQLModel]
+) -> List[RoleResultGQLModel]:
+    for role in roles:
+        role.rbacobject = role.group_id
+    result = await encapsulateInsertMany(info, RoleGQLModel.getLoader(info), roles, RoleResultGQLModel)
+    for user_id in set(role.user_id for role in roles):
+        userRolesCache.invalidate(user_id)
+    return result
+
+class UpdateManyRolePermission(RBACPermission):
+    message = "User is not allowed to update the roles"
+    async def has_permission(self, source, info: strawberry.types.Info, roles: List[RoleUpdateGQLModel]) -> bool:
+        loader = RoleGQLModel.getLoader(info)
+        rows = await loader.load_many([role.id for role in roles])
+        userRoles = await self.resolveUserRoles(info, 
+            [row.group_id for row in rows if row is not None],
+            adminRoleNames=["administrátor"], 
+            allowedRoleNames=["garant"])
+        return all(userRoles.values())
+
+@strawberry.mutation(
+    description="""Updates roles in one transaction.
+Permission is checked once per group, each role is checked against its lastchange.
+Results are in the same order as roles.""",
+    permission_classes=[
+        OnlyForAuthentized,
+        UpdateManyRolePermission
+    ])
+async def role_update_many(self, 
+    info: strawberry.types.Info, 
+    roles: List[RoleUpdateGQLModel]
+) -> List[RoleResultGQLModel]:
+    loader = RoleGQLModel.getLoader(info)
+    rows = await loader.load_many([role.id for role in roles])
+    result = await encapsulateUpdateMany(info, loader, roles, RoleResultGQLModel)
+    for user_id in set(row.user_id for row in rows if row is not None):
+        userRolesCache.invalidate(user_id)
+    return result
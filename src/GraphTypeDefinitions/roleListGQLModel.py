@@ -23,6 +23,7 @@ from src.Dataloaders import (
     getLoadersFromInfo,
     getUserFromInfo)
 from src.DBResolvers import DBResolvers
+from src.Caches import statePermissionMatrix
 
 RoleTypeGQLModel = Annotated["RoleTypeGQLModel", strawberry.lazy(".roleTypeGQLModel")]
 
@@ -35,10 +36,10 @@ class RoleTypeListGQLModel(BaseGQLModel):
     @classmethod
     async def resolve_reference(cls, info: strawberry.types.Info, id: IDType):
         if id is not None:
-            loader = cls.getLoader(info)
+            loader = getLoadersFromInfo(info).RoleTypeListModel_list_id
             if isinstance(id, str): id = IDType(id)
-            rows = await loader.filter_by(list_id=id)
-            row = next(rows, None)
+            rows = await loader.load(id)
+            row = next(iter(rows), None)
             return None if row is None else cls(id=id) # it has not any real row in a table
         return None
 
@@ -56,9 +57,9 @@ class RoleTypeListGQLModel(BaseGQLModel):
         permission_classes=[OnlyForAuthentized])
     async def roletypes(self, info: strawberry.types.Info) -> List["RoleTypeGQLModel"]:
         from .roleTypeGQLModel import RoleTypeGQLModel
-        loader = RoleTypeListGQLModel.getLoader(info)
+        loader = getLoadersFromInfo(info).RoleTypeListModel_list_id
         # print("self.id", self.id, type(self.id), flush=True)
-        results = await loader.filter_by(list_id=self.id)
+        results = await loader.load(self.id)
         results = (RoleTypeGQLModel.resolve_reference(info, id=r.type_id) for r in results)
         return await asyncio.gather(*results)
     pass
@@ -148,6 +149,7 @@ async def role_type_list_add(
         whatToInsert.createdby = user["id"]
             
         row = await loader.insert(whatToInsert)
+        statePermissionMatrix.invalidate()
         result.msg = "fail" if row is None else "ok"
     return result
 
@@ -174,5 +176,6 @@ async def role_type_list_remove(
     result.msg = "fail" if isIn is None else "ok"
     # if isIn:
     #     await loader.delete(isIn.id)
+    statePermissionMatrix.invalidate()
     return result
     
\ No newline at end of file
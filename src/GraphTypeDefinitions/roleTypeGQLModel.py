@@ -13,6 +13,8 @@ from ._GraphPermissions import (
 )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -29,6 +31,7 @@ from src.Dataloaders import (
     getLoadersFromInfo as getLoader,
     getUserFromInfo)
 from src.DBResolvers import DBResolvers
+from src.Caches import roleTypeCache
 
 RoleGQLModel = Annotated["RoleGQLModel", strawberry.lazy(".roleGQLModel")]
 RoleInputWhereFilter = Annotated["RoleInputWhereFilter", strawberry.lazy(".roleGQLModel")]
@@ -51,6 +54,8 @@ class RoleTypeGQLModel(BaseGQLModel):
     def id(self) -> IDType:
         return self.id
 
+    cursor = resolve_cursor
+
     @strawberry.field(
         description="""Name """,
         # permission_classes=[OnlyForAuthentized]
@@ -124,7 +129,7 @@ role_type_page = strawberry.field(
     permission_classes=[
         # OnlyForAuthentized
     ],
-    resolver=DBResolvers.RoleTypeModel.resolve_page(RoleTypeGQLModel, WhereFilterModel=RoleTypeInputWhereFilter)
+    resolver=createPageResolver(RoleTypeGQLModel, WhereFilterModel=RoleTypeInputWhereFilter)
 )
 
 #####################################################################
@@ -185,7 +190,8 @@ async def role_type_update(self,
     role_type: RoleTypeUpdateGQLModel
 
 ) -> RoleTypeResultGQLModel:
-    result = await encapsulateUpdate(info, RoleTypeGQLModel.getLoader(info), role_type, RoleTypeResultGQLModel(msg="ok", id=role_type.id))   
+    result = await encapsulateUpdate(info, RoleTypeGQLModel.getLoader(info), role_type, RoleTypeResultGQLModel(msg="ok", id=role_type.id))
+    roleTypeCache.invalidate()
     return result
 
 # class InsertRoleTypePermission(RBACPermission):
@@ -214,7 +220,9 @@ async def role_type_insert(self,
 
 ) -> RoleTypeResultGQLModel:
     #print("role_type_update", role_type, flush=True)
-    return await encapsulateInsert(info, RoleTypeGQLModel.getLoader(info), role_type, RoleTypeResultGQLModel(msg="ok", id=None)) 
+    result = await encapsulateInsert(info, RoleTypeGQLModel.getLoader(info), role_type, RoleTypeResultGQLModel(msg="ok", id=None))
+    roleTypeCache.invalidate()
+    return result
 
 @strawberry.mutation(
     description="Deletes the roleType",
@@ -223,5 +231,7 @@ async def role_type_insert(self,
         OnlyForAdmins
     ])
 async def role_type_delete(self, info: strawberry.types.Info, id: IDType) -> RoleTypeResultGQLModel:
-    return await encapsulateDelete(info, RoleTypeGQLModel.getLoader(info), id, RoleTypeResultGQLModel(msg="ok", id=None))
+    result = await encapsulateDelete(info, RoleTypeGQLModel.getLoader(info), id, RoleTypeResultGQLModel(msg="ok", id=None))
+    roleTypeCache.invalidate()
+    return result
 
@@ -15,6 +15,8 @@ from .BaseGQLModel import BaseGQLModel
 from ._GraphPermissions import RoleBasedPermission, OnlyForAuthentized
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -31,6 +33,7 @@ from ._GraphResolvers import (
 )
 
 from src.DBResolvers import DBResolvers
+from src.Caches import statePermissionMatrix
 
 RoleTypeGQLModel = Annotated["RoleTypeGQLModel", strawberry.lazy('.roleTypeGQLModel')]
 
@@ -45,6 +48,7 @@ class StateMachineGQLModel(BaseGQLModel):
         return getLoadersFromInfo(info).StateMachineModel
     
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     changedby = resolve_changedby
     lastchange = resolve_lastchange
@@ -57,16 +61,16 @@ class StateMachineGQLModel(BaseGQLModel):
         description="""All states associated with this state machine""",
         permission_classes=[OnlyForAuthentized])
     async def states(self, info: strawberry.types.Info) -> typing.List["StateGQLModel"]:
-        loader = StateGQLModel.getLoader(info)
-        results = await loader.filter_by(statemachine_id=self.id)
+        loader = getLoadersFromInfo(info).StateModel_statemachine_id
+        results = await loader.load(self.id)
         return results
            
     @strawberry.field(
         description="""All states associated with this state machine""",
         permission_classes=[OnlyForAuthentized])
     async def transitions(self, info: strawberry.types.Info) -> typing.List["StateTransitionGQLModel"]:
-        loader = StateTransitionGQLModel.getLoader(info)
-        results = await loader.filter_by(statemachine_id=self.id)
+        loader = getLoadersFromInfo(info).StateTransitionModel_statemachine_id
+        results = await loader.load(self.id)
         return results
     
 
@@ -86,6 +90,7 @@ class StateGQLModel(BaseGQLModel):
         return getLoadersFromInfo(info).StateModel
     
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     changedby = resolve_changedby
     lastchange = resolve_lastchange
@@ -112,16 +117,16 @@ class StateGQLModel(BaseGQLModel):
         description="""Transitions linked into thist state""",
         permission_classes=[OnlyForAuthentized])
     async def sources(self, info: strawberry.types.Info) -> typing.List["StateTransitionGQLModel"]:
-        loader = StateTransitionGQLModel.getLoader(info)
-        results = await loader.filter_by(target_id=self.id)
+        loader = getLoadersFromInfo(info).StateTransitionModel_target_id
+        results = await loader.load(self.id)
         return results
     
     @strawberry.field(
         description="""Transitions going out of this state""",
         permission_classes=[OnlyForAuthentized])
     async def targets(self, info: strawberry.types.Info) -> typing.List["StateTransitionGQLModel"]:
-        loader = StateTransitionGQLModel.getLoader(info)
-        results = await loader.filter_by(source_id=self.id)
+        loader = getLoadersFromInfo(info).StateTransitionModel_source_id
+        results = await loader.load(self.id)
         return results
 
     # @strawberry.field(
@@ -154,12 +159,11 @@ class StateGQLModel(BaseGQLModel):
 
     @classmethod
     async def resolve_roletypes(cls, state, info: strawberry.types.Info, access: typing.Optional[StateDataAccessType] = StateDataAccessType.READ) -> typing.List["RoleTypeGQLModel"]:
-        from .roleListGQLModel import RoleTypeListGQLModel
-        loader = RoleTypeListGQLModel.getLoader(info)
-        if access == StateDataAccessType.READ:
-            results = await loader.filter_by(list_id=state.readerslist_id)
-        else:
-            results = await loader.filter_by(list_id=state.writerslist_id)
+        loader = getLoadersFromInfo(info).RoleTypeListModel_list_id
+        list_id = state.readerslist_id if access == StateDataAccessType.READ else state.writerslist_id
+        if list_id is None:
+            return []
+        results = await loader.load(list_id)
         return results
 
     @strawberry.field(
@@ -184,21 +188,33 @@ class StateGQLModel(BaseGQLModel):
         description="""If logged user is authorized to operation on rbacobject_id""",
         permission_classes=[OnlyForAuthentized])
     async def user_can(self, info: strawberry.types.Info, access: StateDataAccessType, rbacobject_id: uuid.UUID, user_id: typing.Optional[uuid.UUID] = None ) -> typing.Optional[bool]:
-        from .RBACObjectGQLModel import RBACObjectGQLModel
-        # user = getUserFromInfo(info=info)
-        _user_id = getUserFromInfo(info=info)["id"] if user_id is None else user_id
-        roletypes = await StateGQLModel.resolve_roletypes(state=self, info=info, access=access)
-        roletypes_ids = set(roletype.type_id for roletype in roletypes)
-        print(f"roletypes_ids {roletypes_ids}", flush=True)
-        _rbacobject_id = uuid.UUID(rbacobject_id) if type(rbacobject_id) == str else rbacobject_id
-        rbacroles = await RBACObjectGQLModel.resolve_roles(info=info, id=_rbacobject_id)
-        rbacroletype_ids = set(rbacrole["roletype_id"] for rbacrole in rbacroles if rbacrole["user_id"] == _user_id)
-        print(f"rbacroletype_ids {rbacroletype_ids}", flush=True)
-        intersection = roletypes_ids.intersection(rbacroletype_ids)
-        print(f"intersection {intersection}", flush=True)
-        return len(intersection) > 0
+        [result] = await resolve_user_can_many(info, access=access, state_ids=[self.id], rbacobject_ids=[rbacobject_id], user_id=user_id)
+        return result
         
 
+async def resolve_user_roletype_ids(info: strawberry.types.Info, rbacobject_id, user_id):
+    "set of roletype ids the user has on rbacobject"
+    from .RBACObjectGQLModel import RBACObjectGQLModel
+    rbacroles = await RBACObjectGQLModel.resolve_roles(info=info, id=rbacobject_id)
+    return set(rbacrole["roletype_id"] for rbacrole in rbacroles if rbacrole["user_id"] == user_id)
+
+async def resolve_user_can_many(info: strawberry.types.Info, access: StateDataAccessType, state_ids, rbacobject_ids, user_id=None):
+    """for each pair (state_id, rbacobject_id) tells if the user has a role allowing access,
+    role types per state are read from statePermissionMatrix, roles are resolved once per distinct rbacobject
+    """
+    assert len(state_ids) == len(rbacobject_ids), "state_ids and rbacobject_ids must have the same length"
+    _user_id = getUserFromInfo(info=info)["id"] if user_id is None else user_id
+    _user_id = uuid.UUID(_user_id) if isinstance(_user_id, str) else _user_id
+    rbacobject_ids = [uuid.UUID(id) if isinstance(id, str) else id for id in rbacobject_ids]
+    distinct = list(dict.fromkeys(rbacobject_ids))
+    roletypeSets = await asyncio.gather(*(resolve_user_roletype_ids(info, rbacobject_id, _user_id) for rbacobject_id in distinct))
+    userRoletypeIds = dict(zip(distinct, roletypeSets))
+    result = []
+    for state_id, rbacobject_id in zip(state_ids, rbacobject_ids):
+        roletypes_ids = await statePermissionMatrix.roletypeIds(info, state_id, access.value)
+        result.append(not roletypes_ids.isdisjoint(userRoletypeIds[rbacobject_id]))
+    return result
+
 @strawberry.federation.type(
     keys=["id"], description="""Entity representing an entity type"""
 )
@@ -210,6 +226,7 @@ class StateTransitionGQLModel(BaseGQLModel):
         return getLoadersFromInfo(info).StateTransitionModel
     
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     changedby = resolve_changedby
     lastchange = resolve_lastchange
@@ -284,10 +301,22 @@ from src.DBResolvers import (
     StatemachineCategoryResolvers,
     StateTransitionResolvers
 )
+@strawberry.field(
+    description="""For each pair (stateIds[i], rbacobjectIds[i]) tells if the user (logged one if userId is not defined) is authorized to access""",
+    permission_classes=[OnlyForAuthentized])
+async def user_can_many(
+    self, info: strawberry.types.Info, 
+    access: StateDataAccessType, 
+    state_ids: typing.List[uuid.UUID], 
+    rbacobject_ids: typing.List[uuid.UUID], 
+    user_id: typing.Optional[uuid.UUID] = None
+) -> typing.List[bool]:
+    return await resolve_user_can_many(info, access=access, state_ids=state_ids, rbacobject_ids=rbacobject_ids, user_id=user_id)
+
 state_page = strawberry.field(
     description="",
     permission_classes=[OnlyForAuthentized],
-    resolver=StateResolvers.Page(GQLModel=StateGQLModel, WhereFilterModel=StateWhereFilter))
+    resolver=createPageResolver(StateGQLModel, WhereFilterModel=StateWhereFilter))
 
 state_by_id = strawberry.field(
     description="",
@@ -297,7 +326,7 @@ state_by_id = strawberry.field(
 statemachine_page = strawberry.field(
     description="",
     permission_classes=[OnlyForAuthentized],
-    resolver=StateMachineResolvers.Page(GQLModel=StateMachineGQLModel, WhereFilterModel=StateMachineWhereFilter))
+    resolver=createPageResolver(StateMachineGQLModel, WhereFilterModel=StateMachineWhereFilter))
 
 statemachine_by_id = strawberry.field(
     description="",
@@ -307,7 +336,7 @@ statemachine_by_id = strawberry.field(
 statetransition_page = strawberry.field(
     description="",
     permission_classes=[OnlyForAuthentized],
-    resolver=StateTransitionResolvers.Page(GQLModel=StateTransitionGQLModel, WhereFilterModel=StateTransitionWhereFilter))
+    resolver=createPageResolver(StateTransitionGQLModel, WhereFilterModel=StateTransitionWhereFilter))
 
 statetransition_by_id = strawberry.field(
     description="",
@@ -425,12 +454,14 @@ async def state_insert(self, info: strawberry.types.Info, state: StateInsertGQLM
         StateResultGQLModel(id=state.id, msg="ok", machine_id=dbrow.statemachine_id) 
         if dbrow else StateResultGQLModel(id=state.id, msg="fail")
     )   
-    return await encapsulateInsert(
+    result = await encapsulateInsert(
         info=info,
         loader=RoleTypeListGQLModel.getLoader(info),
         entity=state,
         result=result
         )
+    statePermissionMatrix.invalidate()
+    return result
 
 @strawberry.mutation(
     description="U operation",
@@ -443,23 +474,27 @@ async def state_update(self, info: strawberry.types.Info, state: StateUpdateGQLM
         StateResultGQLModel(id=state.id, msg="ok", machine_id=dbrow.statemachine_id) 
         if dbrow else StateResultGQLModel(id=state.id, msg="fail")
     )   
-    return await encapsulateUpdate(
+    result = await encapsulateUpdate(
         info=info,
         loader=RoleTypeListGQLModel.getLoader(info),
         entity=state,
         result=result
     )
+    statePermissionMatrix.invalidate()
+    return result
 
 @strawberry.mutation(
     description="U operation",
     permission_classes=[OnlyForAuthentized])
 async def state_delete(self, info: strawberry.types.Info, id: uuid.UUID) -> StateResultGQLModel:
-    return await encapsulateDelete(
+    result = await encapsulateDelete(
         info=info,
         loader=StateGQLModel.getLoader(info),
         id=id,
         result=StateResultGQLModel(id=id, msg="ok")
     )
+    statePermissionMatrix.invalidate()
+    return result
 
 
 @strawberry.input(description="Input structure - C operation")
@@ -505,34 +540,40 @@ For update operation fail should be also stated when bad lastchange has been ent
     description="C operation",
     permission_classes=[OnlyForAuthentized])
 async def statetransition_insert(self, info: strawberry.types.Info, statetransition: StatetransitionInsertGQLModel) -> StatetransitionResultGQLModel:
-    return await encapsulateInsert(
+    result = await encapsulateInsert(
         info=info,
         loader=StateTransitionGQLModel.getLoader(info),
         entity=statetransition,
         result=StatetransitionResultGQLModel(id=statetransition.id, msg="ok")
         )
+    statePermissionMatrix.invalidate()
+    return result
 
 @strawberry.mutation(
     description="U operation",
     permission_classes=[OnlyForAuthentized])
 async def statetransition_update(self, info: strawberry.types.Info, statetransition: StatetransitionUpdateGQLModel) -> StatetransitionResultGQLModel:
-    return await encapsulateUpdate(
+    result = await encapsulateUpdate(
         info=info,
         loader=StateTransitionGQLModel.getLoader(info),
         entity=statetransition,
         result=StatetransitionResultGQLModel(id=statetransition.id, msg="ok")
     )
+    statePermissionMatrix.invalidate()
+    return result
 
 @strawberry.mutation(
     description="U operation",
     permission_classes=[OnlyForAuthentized])
 async def statetransition_delete(self, info: strawberry.types.Info, id: uuid.UUID) -> StatetransitionResultGQLModel:
-    return await encapsulateDelete(
+    result = await encapsulateDelete(
         info=info,
         loader=StateTransitionGQLModel.getLoader(info),
         id=id,
         result=StatetransitionResultGQLModel(id=id, msg="ok")
     )
+    statePermissionMatrix.invalidate()
+    return result
 
 # from enum import Enum
 # @strawberry.enum(description="")
@@ -15,6 +15,8 @@ from ._GraphPermissions import (
 )
 from ._GraphResolvers import (
     resolve_id,
+    resolve_cursor,
+    createPageResolver,
     resolve_name,
     resolve_name_en,
     resolve_changedby,
@@ -26,6 +28,7 @@ from ._GraphResolvers import (
     encapsulateUpdate,
     encapsulateDelete
 )
+from ._GraphExtensions import UNBOUNDED_LIST
 
 from src.Dataloaders import (
     getLoadersFromInfo as getLoader,
@@ -47,6 +50,7 @@ class UserGQLModel(BaseGQLModel):
         return getLoader(info).UserModel
 
     id = resolve_id
+    cursor = resolve_cursor
     name = resolve_name
     changedby = resolve_changedby
     created = resolve_created
@@ -176,19 +180,14 @@ class UserGQLModel(BaseGQLModel):
 
     @strawberry.field(
         description="""List of groups given type, where the user is member""",
-        permission_classes=[OnlyForAuthentized])
+        permission_classes=[OnlyForAuthentized],
+        metadata=UNBOUNDED_LIST)
     async def member_of(
         self, info: strawberry.types.Info, grouptype_id: Optional[IDType] = None, 
     ) -> List["GroupGQLModel"]:
-        from .groupGQLModel import GroupGQLModel
-        from .membershipGQLModel import MembershipGQLModel
-        loader = MembershipGQLModel.getLoader(info)
-        rows = await loader.filter_by(user_id=self.id)# , grouptype_id=grouptype_id)
-        results = (GroupGQLModel.resolve_reference(info, row.group_id) for row in rows)
-        results = await asyncio.gather(*results)
-        if grouptype_id:
-            results = filter(lambda item: item.grouptype_id == grouptype_id, results)
-        return results
+        # 👇 memberships ⨝ groups s filtrem typu v SQL, sdruzeno pres vsechny uzivatele v odpovedi (userPage)
+        loader = getLoader(info).memberof
+        return await loader.load((self.id, grouptype_id))
     
     RBACObjectGQLModel = Annotated["RBACObjectGQLModel", strawberry.lazy(".RBACObjectGQLModel")]
     @strawberry.field(
@@ -238,7 +237,7 @@ user_page = strawberry.field(
     permission_classes=[
         OnlyForAuthentized
     ],
-    resolver=DBResolvers.UserModel.resolve_page(UserGQLModel, WhereFilterModel=UserInputWhereFilter)
+    resolver=createPageResolver(UserGQLModel, WhereFilterModel=UserInputWhereFilter)
     )
 
 
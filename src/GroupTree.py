@@ -0,0 +1,362 @@
+import os
+import time
+import uuid
+import logging
+from collections import namedtuple
+
+from sqlalchemy import select, delete, insert, or_
+from sqlalchemy.exc import IntegrityError
+
+from uoishelpers.dataloaders import prepareSelect
+
+from src.DBDefinitions import GroupModel, GroupClosureModel, UserModel, MembershipModel
+from src.Caches import SingleFlight
+
+# region in-process index
+
+GROUPTREE_CACHE_TTL = float(os.getenv("GROUPTREE_CACHE_TTL", "60"))
+
+class GroupAncestryIndex:
+    """Procesova pamet predku skupin, klic je id skupiny, hodnota je tuple id predku (od skupiny samotne smerem ke koreni).
+    Polozky jsou zneplatnovany mutacemi skupin v tomto procesu,
+    zmeny provedene jinym procesem (worker) se projevi nejpozdeji po ttl sekundach.
+    """
+    def __init__(self, ttl=GROUPTREE_CACHE_TTL):
+        self.ttl = ttl
+        self._ancestors = {}
+
+    def get(self, group_id):
+        item = self._ancestors.get(group_id, None)
+        if item is None:
+            return None
+        (expiresAt, ancestorIds) = item
+        if expiresAt < time.monotonic():
+            del self._ancestors[group_id]
+            return None
+        return ancestorIds
+
+    def put(self, group_id, ancestorIds):
+        self._ancestors[group_id] = (time.monotonic() + self.ttl, tuple(ancestorIds))
+
+    def invalidate(self, group_id=None):
+        "drops all items which contains group_id as an ancestor (or whole index if group_id is None)"
+        if group_id is None:
+            self._ancestors.clear()
+            return
+        toDrop = [key for key, (_, ancestorIds) in self._ancestors.items() if group_id in ancestorIds]
+        for key in toDrop:
+            del self._ancestors[key]
+
+ancestryIndex = GroupAncestryIndex()
+
+GroupNode = namedtuple("GroupNode", ["id", "mastergroup_id", "grouptype_id", "valid", "name"])
+
+class GroupAdjacencyIndex:
+    """Procesova pamet celeho stromu skupin, pro kazdou skupinu GroupNode a seznam podrizenych (serazeny podle name).
+    Nacita se jednim dotazem, mutace skupin v tomto procesu ho prubezne udrzuji (put / remove),
+    zmeny provedene jinym procesem (worker) se projevi nejpozdeji po ttl sekundach (index se nacte znovu).
+    """
+    def __init__(self, ttl=GROUPTREE_CACHE_TTL):
+        self.ttl = ttl
+        self.generation = 0
+        self._loadedGeneration = None
+        self._expiresAt = 0
+        self._nodes = {}
+        self._children = {}
+        self._loading = SingleFlight()
+
+    def invalidate(self):
+        self.generation += 1
+
+    def isValid(self):
+        return (self._loadedGeneration == self.generation) and (time.monotonic() < self._expiresAt)
+
+    async def ensure(self, asyncSessionMaker):
+        if self.isValid():
+            return self
+        # 👇 soubezna volani po vyprseni ttl ctou tabulku groups jen jednou
+        await self._loading.run(self.generation, lambda: self._load(asyncSessionMaker))
+        return self
+
+    async def _load(self, asyncSessionMaker):
+        generation = self.generation
+        stmt = select(GroupModel.id, GroupModel.mastergroup_id, GroupModel.grouptype_id, GroupModel.valid, GroupModel.name)
+        async with asyncSessionMaker() as session:
+            rows = await session.execute(stmt)
+            nodes = {row.id: GroupNode(*row) for row in rows}
+        children = {}
+        for node in nodes.values():
+            children.setdefault(node.mastergroup_id, []).append(node.id)
+        for ids in children.values():
+            ids.sort(key=lambda id: nodes[id].name or "")
+        # 👇 zmena behem nacitani, vysledek se pouzije, ale neplati
+        self._expiresAt = 0 if generation != self.generation else time.monotonic() + self.ttl
+        self._loadedGeneration = generation
+        self._nodes = nodes
+        self._children = children
+        logging.info("group adjacency index loaded, %s groups", len(nodes))
+
+    def _unlink(self, node):
+        siblings = self._children.get(node.mastergroup_id, None)
+        if siblings is not None and node.id in siblings:
+            siblings.remove(node.id)
+
+    def put(self, row):
+        "vlozi nebo zmeni skupinu (row ma atributy GroupNode), vola se po mutaci"
+        if self._loadedGeneration is None:
+            return
+        node = GroupNode(*(getattr(row, name) for name in GroupNode._fields))
+        previous = self._nodes.get(node.id, None)
+        if previous is not None:
+            self._unlink(previous)
+        self._nodes[node.id] = node
+        siblings = self._children.setdefault(node.mastergroup_id, [])
+        siblings.append(node.id)
+        siblings.sort(key=lambda id: self._nodes[id].name or "")
+
+    def remove(self, group_id):
+        node = self._nodes.pop(group_id, None)
+        if node is not None:
+            self._unlink(node)
+
+    def node(self, group_id):
+        return self._nodes.get(group_id, None)
+
+    def childIds(self, group_id):
+        return self._children.get(group_id, [])
+
+    def subtree(self, rootId, depth=None):
+        "(GroupNode, hloubka) podstromu rootId do hloubky depth (None = cely), pruchod do hloubky (preorder)"
+        root = self._nodes.get(rootId, None)
+        if root is None:
+            return []
+        result = []
+        visited = set()
+        stack = [(rootId, 0)]
+        while stack:
+            (group_id, level) = stack.pop()
+            if group_id in visited:
+                continue
+            visited.add(group_id)
+            result.append((self._nodes[group_id], level))
+            if (depth is None) or (level < depth):
+                stack.extend((childId, level + 1) for childId in reversed(self.childIds(group_id)))
+        return result
+
+adjacencyIndex = GroupAdjacencyIndex()
+
+# endregion
+
+# region closure table maintenance
+
+def computeAncestors(parents):
+    """parents je dict id -> mastergroup_id, vraci dict id -> list id predku (vcetne sebe, nejblizsi prvni)"""
+    result = {}
+    for group_id in parents.keys():
+        chain = []
+        cid = group_id
+        while (cid is not None) and (cid not in chain):
+            known = result.get(cid, None)
+            if known is not None:
+                chain.extend(known)
+                break
+            chain.append(cid)
+            cid = parents.get(cid, None)
+        result[group_id] = chain
+    return result
+
+async def rebuildGroupClosure(asyncSessionMaker, retries=3):
+    """Srovna tabulku groupclosures s groups.mastergroup_id.
+    Chybejici radky vlozi, prebyvajici (nebo se spatnou vzdalenosti) smaze, spravna tabulka se nemeni,
+    soubezne startujici repliky tak nic neduplikuji (pri kolizi na unikatnim klici se srovnani opakuje).
+    Vraci pocet radku uzaveru.
+    """
+    for attempt in range(retries):
+        try:
+            async with asyncSessionMaker() as session:
+                async with session.begin():
+                    (count, changed) = await syncGroupClosure(session)
+            if changed:
+                ancestryIndex.invalidate()
+                adjacencyIndex.invalidate()
+            return count
+        except IntegrityError as e:
+            # 👇 jiny proces vlozil tytez radky mezitim
+            logging.info("group closure sync collided (%s), attempt %s", e.orig, attempt + 1)
+    raise RuntimeError("group closure sync failed repeatedly")
+
+async def syncGroupClosure(session):
+    "srovnani uzaveru v ramci transakce session, vraci (pocet radku, zda doslo ke zmene), viz rebuildGroupClosure"
+    rows = await session.execute(select(GroupModel.id, GroupModel.mastergroup_id))
+    parents = {row.id: row.mastergroup_id for row in rows}
+    expected = {
+        (ancestor_id, group_id): depth
+        for group_id, ancestorIds in computeAncestors(parents).items()
+        for depth, ancestor_id in enumerate(ancestorIds)
+    }
+    rows = await session.execute(select(GroupClosureModel.id, GroupClosureModel.ancestor_id, GroupClosureModel.descendant_id, GroupClosureModel.depth))
+    existing = {}
+    staleIds = []
+    for row in rows:
+        key = (row.ancestor_id, row.descendant_id)
+        if (expected.get(key, None) != row.depth) or (key in existing):
+            staleIds.append(row.id)
+        else:
+            existing[key] = row.depth
+    missingRows = [
+        {"id": uuid.uuid4(), "ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": depth}
+        for (ancestor_id, descendant_id), depth in expected.items()
+        if (ancestor_id, descendant_id) not in existing
+    ]
+    for start in range(0, len(staleIds), 1000):
+        await session.execute(delete(GroupClosureModel).where(GroupClosureModel.id.in_(staleIds[start:start+1000])))
+    for start in range(0, len(missingRows), 1000):
+        await session.execute(insert(GroupClosureModel), missingRows[start:start+1000])
+    logging.info("group closure synced, %s groups, %s rows, %s inserted, %s deleted", len(parents), len(expected), len(missingRows), len(staleIds))
+    return (len(expected), len(staleIds) + len(missingRows) > 0)
+
+# 👇 udrzba uzaveru bezi v transakci session spolu se zmenou skupiny (viz groupGQLModel mutace),
+# pri chybe se tak nepotvrdi ani zmena skupiny; ancestryIndex zneplatnuje volajici az po potvrzeni
+
+async def groupClosureInsert(session, group_id, mastergroup_id=None):
+    """Zaradi nove vlozenou skupinu do uzaveru"""
+    closureRows = [{"id": uuid.uuid4(), "ancestor_id": group_id, "descendant_id": group_id, "depth": 0}]
+    if mastergroup_id is not None:
+        stmt = select(GroupClosureModel.ancestor_id, GroupClosureModel.depth).where(GroupClosureModel.descendant_id == mastergroup_id)
+        rows = await session.execute(stmt)
+        closureRows.extend(
+            {"id": uuid.uuid4(), "ancestor_id": row.ancestor_id, "descendant_id": group_id, "depth": row.depth + 1}
+            for row in rows
+        )
+    await session.execute(insert(GroupClosureModel), closureRows)
+
+async def groupClosureMove(session, group_id, mastergroup_id):
+    """Presune podstrom skupiny group_id pod mastergroup_id"""
+    subtreeStmt = select(GroupClosureModel.descendant_id, GroupClosureModel.depth).where(GroupClosureModel.ancestor_id == group_id)
+    subtree = list(await session.execute(subtreeStmt))
+    if len(subtree) == 0:
+        subtree = [(group_id, 0)]
+        await session.execute(insert(GroupClosureModel), [{"id": uuid.uuid4(), "ancestor_id": group_id, "descendant_id": group_id, "depth": 0}])
+    subtreeIds = [descendant_id for descendant_id, _ in subtree]
+
+    # 👇 odpojeni podstromu od puvodnich predku
+    await session.execute(
+        delete(GroupClosureModel)
+        .where(GroupClosureModel.descendant_id.in_(subtreeIds))
+        .where(GroupClosureModel.ancestor_id.not_in(subtreeIds))
+    )
+
+    # 👇 pripojeni podstromu k novym predkum
+    if mastergroup_id is not None:
+        ancestorsStmt = select(GroupClosureModel.ancestor_id, GroupClosureModel.depth).where(GroupClosureModel.descendant_id == mastergroup_id)
+        ancestors = list(await session.execute(ancestorsStmt))
+        closureRows = [
+            {"id": uuid.uuid4(), "ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": ancestorDepth + descendantDepth + 1}
+            for ancestor_id, ancestorDepth in ancestors
+            for descendant_id, descendantDepth in subtree
+        ]
+        if len(closureRows) > 0:
+            await session.execute(insert(GroupClosureModel), closureRows)
+
+async def groupClosureDelete(session, group_id):
+    """Odstrani skupinu z uzaveru"""
+    await session.execute(
+        delete(GroupClosureModel)
+        .where(or_(GroupClosureModel.descendant_id == group_id, GroupClosureModel.ancestor_id == group_id))
+    )
+
+# endregion
+
+# region queries
+
+async def walkGroupAncestorIds(asyncSessionMaker, group_id):
+    "puvodni pruchod pres mastergroup_id, jeden dotaz na kazdou uroven"
+    ancestorIds = []
+    cid = group_id
+    async with asyncSessionMaker() as session:
+        while (cid is not None) and (cid not in ancestorIds):
+            rows = await session.execute(select(GroupModel.id, GroupModel.mastergroup_id).where(GroupModel.id == cid))
+            row = rows.first()
+            if row is None: break
+            ancestorIds.append(row.id)
+            cid = row.mastergroup_id
+    return ancestorIds
+
+async def getGroupAncestorIds(asyncSessionMaker, group_id):
+    """Vraci tuple id skupiny a vsech jejich nadrizenych skupin (nejblizsi prvni).
+    Pouziva procesovou pamet, jinak jeden indexovany dotaz do groupclosures.
+    """
+    ancestorIds = ancestryIndex.get(group_id)
+    if ancestorIds is not None:
+        return ancestorIds
+
+    stmt = (
+        select(GroupClosureModel.ancestor_id)
+        .where(GroupClosureModel.descendant_id == group_id)
+        .order_by(GroupClosureModel.depth)
+    )
+    async with asyncSessionMaker() as session:
+        rows = await session.execute(stmt)
+        ancestorIds = tuple(rows.scalars())
+
+    if len(ancestorIds) == 0:
+        # uzaver pro skupinu neexistuje (neni dosud sestaven, nebo skupina neexistuje)
+        ancestorIds = tuple(await walkGroupAncestorIds(asyncSessionMaker, group_id))
+        if len(ancestorIds) > 0:
+            logging.warning("group %s is missing in groupclosures, mastergroup walk used", group_id)
+
+    if len(ancestorIds) > 0:
+        ancestryIndex.put(group_id, ancestorIds)
+    return ancestorIds
+
+async def getGroupAncestors(asyncSessionMaker, group_id):
+    "(GroupModel, vzdalenost) vsech nadrizenych skupin (bez skupiny samotne), nejblizsi prvni, jeden dotaz groupclosures ⨝ groups"
+    stmt = (
+        select(GroupModel, GroupClosureModel.depth)
+        .join(GroupClosureModel, GroupClosureModel.ancestor_id == GroupModel.id)
+        .where(GroupClosureModel.descendant_id == group_id)
+        .where(GroupClosureModel.depth > 0)
+        .order_by(GroupClosureModel.depth)
+    )
+    async with asyncSessionMaker() as session:
+        rows = await session.execute(stmt)
+        return [(row[0], row[1]) for row in rows]
+
+async def getGroupDescendants(asyncSessionMaker, group_id, maxDepth=None, grouptype_id=None, valid=None):
+    """(GroupModel, vzdalenost) vsech podrizenych skupin (bez skupiny samotne) do hloubky maxDepth,
+    volitelne jen daneho typu / platnosti, serazeno podle vzdalenosti a jmena, jeden dotaz groupclosures ⨝ groups
+    """
+    stmt = (
+        select(GroupModel, GroupClosureModel.depth)
+        .join(GroupClosureModel, GroupClosureModel.descendant_id == GroupModel.id)
+        .where(GroupClosureModel.ancestor_id == group_id)
+        .where(GroupClosureModel.depth > 0)
+    )
+    if maxDepth is not None:
+        stmt = stmt.where(GroupClosureModel.depth <= maxDepth)
+    if grouptype_id is not None:
+        stmt = stmt.where(GroupModel.grouptype_id == grouptype_id)
+    if valid is not None:
+        stmt = stmt.where(GroupModel.valid == valid)
+    stmt = stmt.order_by(GroupClosureModel.depth, GroupModel.name)
+    async with asyncSessionMaker() as session:
+        rows = await session.execute(stmt)
+        return [(row[0], row[1]) for row in rows]
+
+def allMembersStatement(group_id, where=None, first=100, after=None):
+    """select uzivatelu s platnym clenstvim ve skupine group_id nebo v jejim podstromu (groupclosures),
+    jeden dotaz: users, kde id in (memberships ⨝ groupclosures), tedy kazdy uzivatel jednou, keyset podle users.id
+    """
+    subtree = select(GroupClosureModel.descendant_id).where(GroupClosureModel.ancestor_id == group_id)
+    members = (
+        select(MembershipModel.user_id)
+        .where(MembershipModel.group_id.in_(subtree))
+        .where(MembershipModel.valid == True)
+    )
+    statement = select(UserModel) if where is None else prepareSelect(UserModel, where)
+    statement = statement.where(UserModel.id.in_(members))
+    if after is not None:
+        statement = statement.where(UserModel.id > after)
+    return statement.order_by(UserModel.id).limit(first)
+
+# endregion
@@ -0,0 +1,96 @@
+import os
+import asyncio
+import logging
+
+from prometheus_client import Enum, Gauge
+
+INIT_READY_TIMEOUT = float(os.getenv("INIT_READY_TIMEOUT", "30"))
+
+initStateMetric = Enum(
+    "init_state", "state of the database initialization (initDB)",
+    states=["none", "starting", "seeding", "ready", "failed"],
+    namespace="gql_ug")
+initTablesDone = Gauge("init_tables_done", "tables already seeded by initDB", namespace="gql_ug")
+initRowsImported = Gauge("init_rows_imported", "rows inserted by initDB", ["table"], namespace="gql_ug")
+initTableSeconds = Gauge("init_table_seconds", "time spent seeding the table", ["table"], namespace="gql_ug")
+
+class NotReadyError(Exception):
+    pass
+
+class InitState:
+    """Stav inicializace databaze v procesu:
+    none (nic se neinicializuje, napr. testy) -> starting (engine) -> seeding (initDB) -> ready | failed.
+    Kdo potrebuje ciselniky, ceka (waitReady) na ready, nejdele timeout sekund.
+    Ve stavu none se neceka.
+    """
+    def __init__(self):
+        self.state = "none"
+        self.error = None
+        self.tables = {}
+        self._ready = asyncio.Event()
+        self._ready.set()
+        initStateMetric.state(self.state)
+
+    def _set(self, state):
+        logging.info("init state %s -> %s", self.state, state)
+        self.state = state
+        initStateMetric.state(state)
+
+    def starting(self):
+        self._ready.clear()
+        self.error = None
+        self.tables = {}
+        initTablesDone.set(0)
+        self._set("starting")
+
+    def seeding(self):
+        self._set("seeding")
+
+    def tableImported(self, tableName, count, seconds):
+        self.tables[tableName] = (count, seconds)
+        initTablesDone.set(len(self.tables))
+        initRowsImported.labels(tableName).set(count)
+        initTableSeconds.labels(tableName).set(seconds)
+
+    def ready(self):
+        self._set("ready")
+        self._ready.set()
+
+    def failed(self, error):
+        self.error = error
+        self._set("failed")
+        # 👇 cekajici se dozvi chybu hned, ne az po timeoutu
+        self._ready.set()
+
+    def isReady(self):
+        return self.state in ["none", "ready"]
+
+    async def waitReady(self, timeout=INIT_READY_TIMEOUT):
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise NotReadyError(f"database is not initialized yet ({self.state}), try again later")
+        if self.state == "failed":
+            raise NotReadyError(f"database initialization failed ({self.error})")
+
+    async def track(self, coroutine):
+        "provede inicializaci (coroutine) a podle vysledku nastavi ready nebo failed"
+        self.seeding()
+        try:
+            result = await coroutine
+        except Exception as e:
+            logging.exception("database initialization failed")
+            self.failed(e)
+            return None
+        self.ready()
+        return result
+
+    def asDict(self):
+        return {
+            "state": self.state,
+            "error": None if self.error is None else f"{self.error}",
+            "tables": {tableName: {"rows": count, "seconds": seconds} for (tableName, (count, seconds)) in self.tables.items()}
+        }
+
+initState = InitState()
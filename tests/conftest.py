@@ -90,6 +90,10 @@ async def SQLite(Async_Session_Maker, DemoData, DBModels):
         DBModels=DBModels,
         jsonData=DemoData,
     )    
+    from src.GroupTree import rebuildGroupClosure
+    await rebuildGroupClosure(Async_Session_Maker)
+    from src.Caches import resetCaches
+    resetCaches()
     logging.info(f"database loaded (SQLite)")
     return Async_Session_Maker
 
@@ -0,0 +1,67 @@
+import time
+import pytest
+
+
+class InnerSentinel:
+    "pocita overeni, chova se jako sentinel z uoishelpers"
+    def __init__(self):
+        self.calls = 0
+
+    async def authenticate(self, request):
+        self.calls += 1
+        token = request.headers["Authorization"].split("Bearer ")[1]
+        if token == "invalid":
+            raise Exception("Invalid signature")
+        request.scope["jwt"] = token
+        request.scope["user"] = {"id": "user"}
+
+def createRequest(token):
+    class Request:
+        def __init__(self):
+            self.headers = {"Authorization": f"Bearer {token}"}
+            self.cookies = {}
+            self.scope = {}
+    return Request()
+
+class Item:
+    def __init__(self, query):
+        self.query = query
+        self.variables = {}
+
+@pytest.mark.asyncio
+async def test_cached_sentinel():
+    import jwt
+    from src.Authentication import CachedSentinel
+
+    inner = InnerSentinel()
+    sentinel = CachedSentinel(sentinel=inner, queriesWOAuthentization=["free"], onAuthenticationError=lambda item: "unauthorized")
+    token = jwt.encode({"user_id": "user", "exp": int(time.time()) + 60}, "secret", algorithm="HS256")
+
+    request = createRequest(token)
+    assert await sentinel(request, Item("query")) is None
+    assert await sentinel(request, Item("")) is None
+    assert inner.calls == 1, "authentication runs once per request"
+    assert sentinel.isAuthenticated(request)
+
+    request = createRequest(token)
+    assert await sentinel(request, Item("query")) is None
+    assert inner.calls == 1, "verified token is served from cache"
+    assert request.scope["user"] == {"id": "user"}
+
+    expired = jwt.encode({"user_id": "user", "exp": int(time.time()) - 1}, "secret", algorithm="HS256")
+    for _ in range(2):
+        assert await sentinel(createRequest(expired), Item("query")) is None
+    assert inner.calls == 3, "token without valid exp is not cached"
+
+    # 👇 bez exp plati expires_in, jinak vychozi ttl
+    for claims in [{"user_id": "user", "expires_in": 60}, {"user_id": "user", "iat": int(time.time())}]:
+        token = jwt.encode(claims, "secret", algorithm="HS256")
+        for _ in range(2):
+            assert await sentinel(createRequest(token), Item("query")) is None
+    assert inner.calls == 5, "token without exp is cached as well"
+
+    request = createRequest("invalid")
+    assert await sentinel(request, Item("query")) == "unauthorized"
+    assert await sentinel(request, Item("free")) is None
+    assert inner.calls == 6
+    assert not sentinel.isAuthenticated(request)
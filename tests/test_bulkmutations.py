@@ -0,0 +1,109 @@
+import uuid
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_membership_insert_update_many(SchemaExecutor, DemoData):
+    users = DemoData["users"][:3]
+    groups = DemoData["groups"][:2]
+    memberships = [
+        {"id": f"{uuid.uuid4()}", "userId": f"{user['id']}", "groupId": f"{group['id']}"}
+        for user in users for group in groups
+    ]
+    query = """mutation($memberships: [MembershipInsertGQLModel!]!) {
+        membershipInsertMany(memberships: $memberships) { id msg membership { id user { id } group { id } } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"memberships": memberships})
+    assert result.get("errors", None) is None, result
+    results = result["data"]["membershipInsertMany"]
+    assert len(results) == len(memberships)
+    for membership, item in zip(memberships, results):
+        assert item["msg"] == "ok"
+        assert item["id"] == membership["id"]
+        assert item["membership"]["user"]["id"] == membership["userId"]
+        assert item["membership"]["group"]["id"] == membership["groupId"]
+
+    # 👇 duplicitni id, davka selze, polozky se vkladaji po jedne, neuspesna nese duvod
+    query = """mutation($memberships: [MembershipInsertGQLModel!]!) {
+        membershipInsertMany(memberships: $memberships) { id msg reason membership { id } }
+    }"""
+    extra = {"id": f"{uuid.uuid4()}", "userId": f"{users[0]['id']}", "groupId": f"{groups[0]['id']}"}
+    result = await SchemaExecutor(query=query, variable_values={"memberships": memberships[:1] + [extra]})
+    assert result.get("errors", None) is None, result
+    results = result["data"]["membershipInsertMany"]
+    assert [item["msg"] for item in results] == ["fail", "ok"]
+    assert results[0]["reason"] is not None
+    assert results[1]["reason"] is None
+    assert results[1]["membership"]["id"] == extra["id"]
+
+    # 👇 polozky bez id dostanou kazda vlastni id
+    result = await SchemaExecutor(query=query, variable_values={"memberships": [
+        {"userId": f"{user['id']}", "groupId": f"{groups[1]['id']}"} for user in users
+    ]})
+    assert result.get("errors", None) is None, result
+    results = result["data"]["membershipInsertMany"]
+    assert [item["msg"] for item in results] == ["ok"] * len(users)
+    assert len(set(item["id"] for item in results)) == len(users)
+    assert all(item["membership"]["id"] == item["id"] for item in results)
+
+    query = """query($id: UUID!) { membershipById(id: $id) { id lastchange } }"""
+    first = await SchemaExecutor(query=query, variable_values={"id": memberships[0]["id"]})
+    second = await SchemaExecutor(query=query, variable_values={"id": memberships[1]["id"]})
+    updates = [
+        {"id": memberships[0]["id"], "lastchange": first["data"]["membershipById"]["lastchange"], "valid": False},
+        {"id": memberships[1]["id"], "lastchange": "2000-01-01T00:00:00", "valid": False},
+        {"id": f"{uuid.uuid4()}", "lastchange": "2000-01-01T00:00:00", "valid": False},
+    ]
+    query = """mutation($memberships: [MembershipUpdateGQLModel!]!) {
+        membershipUpdateMany(memberships: $memberships) { id msg reason membership { id valid } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"memberships": updates})
+    assert result.get("errors", None) is None, result
+    results = result["data"]["membershipUpdateMany"]
+    assert [item["msg"] for item in results] == ["ok", "fail", "fail"]
+    assert [item["reason"] for item in results] == [None, "lastchange mismatch", "not found"]
+    assert [item["id"] for item in results] == [update["id"] for update in updates]
+    assert results[0]["membership"]["valid"] is False
+    assert second["data"]["membershipById"] is not None
+
+
+@pytest.mark.asyncio
+async def test_role_insert_update_many(SchemaExecutor, DemoData):
+    users = DemoData["users"][:2]
+    group = DemoData["groups"][0]
+    roletype = DemoData["roletypes"][0]
+    roles = [
+        {"id": f"{uuid.uuid4()}", "userId": f"{user['id']}", "groupId": f"{group['id']}", "roletypeId": f"{roletype['id']}"}
+        for user in users
+    ]
+    query = """mutation($roles: [RoleInsertGQLModel!]!) {
+        roleInsertMany(roles: $roles) { id msg role { id lastchange } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"roles": roles})
+    assert result.get("errors", None) is None, result
+    results = result["data"]["roleInsertMany"]
+    assert [item["msg"] for item in results] == ["ok", "ok"]
+    assert [item["id"] for item in results] == [role["id"] for role in roles]
+
+    updates = [
+        {"id": item["id"], "lastchange": item["role"]["lastchange"], "valid": False}
+        for item in results
+    ]
+    query = """mutation($roles: [RoleUpdateGQLModel!]!) {
+        roleUpdateMany(roles: $roles) { id msg role { id valid } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"roles": updates})
+    assert result.get("errors", None) is None, result
+    results = result["data"]["roleUpdateMany"]
+    assert [item["msg"] for item in results] == ["ok", "ok"]
+    assert [item["role"]["valid"] for item in results] == [False, False]
+
+@pytest.mark.asyncio
+async def test_membership_update_many_permission_keeps_input(Info, SQLite, DemoData):
+    import datetime
+    from src.GraphTypeDefinitions.membershipGQLModel import MembershipUpdateGQLModel, UpdateManyMembershipPermission
+    membership = DemoData["memberships"][0]
+    update = MembershipUpdateGQLModel(id=membership["id"], lastchange=datetime.datetime.now(), valid=False)
+    await UpdateManyMembershipPermission().has_permission(None, Info, memberships=[update])
+    # 👇 group_id se do vstupu nezapisuje, jinak by skoncilo v hodnotach UPDATE
+    assert update.group_id is None
@@ -0,0 +1,127 @@
+import uuid
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_catalogcache_invalidation(Info, SQLite, DemoData):
+    from src.DBDefinitions import RoleTypeModel
+    from src.Caches import roleTypeCache
+    async_session_maker = SQLite
+    roleTypeCache.invalidate()
+
+    roletypes = DemoData["roletypes"]
+    items = await roleTypeCache.all(Info)
+    assert len(items) == len(roletypes)
+    for roletype in roletypes:
+        item = await roleTypeCache.get(Info, roletype["id"])
+        assert item["name"] == roletype["name"]
+        assert (await roleTypeCache.getByName(Info, roletype["name"]))["id"] == roletype["id"]
+
+    newId = uuid.uuid1()
+    async with async_session_maker() as session:
+        async with session.begin():
+            session.add(RoleTypeModel(id=newId, name="new role type", name_en="new role type"))
+
+    assert await roleTypeCache.get(Info, newId) is None, "cache is expected to hold old content"
+    roleTypeCache.invalidate()
+    assert (await roleTypeCache.get(Info, newId))["name"] == "new role type"
+    roleTypeCache.invalidate()
+
+def test_userrolescache_lru_and_generation():
+    from src.Caches import UserRolesCache
+    cache = UserRolesCache(ttl=60, maxsize=2)
+    cache.put("a", ["role a"], generation=1)
+    cache.put("b", ["role b"], generation=1)
+    assert cache.get("a", generation=1) == ["role a"]
+    cache.put("c", ["role c"], generation=1)
+    assert cache.get("b", generation=1) is None, "least recently used item should be evicted"
+    assert cache.get("a", generation=1) == ["role a"]
+    assert cache.get("c", generation=2) is None, "item from other generation is not valid"
+    cache.invalidate("a")
+    assert cache.get("a", generation=1) is None
+
+    expired = UserRolesCache(ttl=-1, maxsize=2)
+    expired.put("a", ["role a"])
+    assert expired.get("a") is None
+
+    # 👇 nacteni zacate pred invalidate (mutace roli) nesmi ulozit stare role
+    version = cache.version
+    cache.invalidate("a")
+    cache.put("a", ["old role a"], generation=1, version=version)
+    assert cache.get("a", generation=1) is None
+    cache.put("a", ["role a"], generation=1, version=cache.version)
+    assert cache.get("a", generation=1) == ["role a"]
+
+@pytest.mark.asyncio
+async def test_concurrent_cold_loads_share_one_query(Info, SQLite, DemoData):
+    import asyncio
+    from src.Dataloaders import getLoadersFromInfo
+    from src.Caches import roleTypeCache, statePermissionMatrix
+    from src.GroupTree import GroupAdjacencyIndex
+
+    loaders = getLoadersFromInfo(Info)
+    calls = []
+    def counted(loader):
+        execute_select = loader.execute_select
+        async def execute(statement):
+            calls.append(statement)
+            return await execute_select(statement)
+        loader.execute_select = execute
+
+    counted(loaders.RoleTypeModel)
+    roleTypeCache.invalidate()
+    results = await asyncio.gather(*(roleTypeCache.byId(Info) for _ in range(50)))
+    assert len(calls) == 1, "cold catalog should be loaded once"
+    assert all(result is results[0] for result in results)
+    assert len(results[0]) == len(DemoData["roletypes"])
+
+    calls.clear()
+    counted(loaders.StateModel)
+    counted(loaders.RoleTypeListModel)
+    statePermissionMatrix.invalidate()
+    state_id = DemoData["states"][0]["id"]
+    await asyncio.gather(*(statePermissionMatrix.roletypeIds(Info, state_id, "read") for _ in range(50)))
+    assert len(calls) == 2, "states and role type lists should be loaded once"
+
+    sessions = []
+    def sessionMaker():
+        sessions.append(1)
+        return SQLite()
+    index = GroupAdjacencyIndex()
+    await asyncio.gather(*(index.ensure(sessionMaker) for _ in range(50)))
+    assert len(sessions) == 1, "groups should be loaded once"
+    assert len(index.childIds(None)) > 0
+
+@pytest.mark.asyncio
+async def test_statematrix_reloads_on_unknown_state(Info, SQLite, DemoData):
+    import uuid
+    import asyncio
+    import sqlalchemy
+    from src.Caches import statePermissionMatrix
+    from src.DBDefinitions import StateModel
+
+    statePermissionMatrix.invalidate()
+    state = DemoData["states"][0]
+    await statePermissionMatrix.roletypeIds(Info, state["id"], "read")
+    generation = statePermissionMatrix.generation
+
+    # 👇 stav zalozeny jinym procesem (primo v DB), matice o nem nevi
+    new_id = uuid.uuid1()
+    async with SQLite() as session:
+        async with session.begin():
+            await session.execute(sqlalchemy.insert(StateModel), [{
+                "id": new_id, "name": "new state", "statemachine_id": state["statemachine_id"],
+                "readerslist_id": state["readerslist_id"], "writerslist_id": state["writerslist_id"]
+            }])
+
+    expected = await statePermissionMatrix.roletypeIds(Info, state["id"], "read")
+    results = await asyncio.gather(*(statePermissionMatrix.roletypeIds(Info, new_id, "read") for _ in range(20)))
+    assert all(result == expected for result in results)
+    assert statePermissionMatrix.generation == generation + 1, "concurrent misses should reload once"
+
+    # 👇 opakovany dotaz na neexistujici stav nenacita matici znovu
+    missing = uuid.uuid1()
+    assert await statePermissionMatrix.roletypeIds(Info, missing, "read") == frozenset()
+    assert await statePermissionMatrix.roletypeIds(Info, missing, "write") == frozenset()
+    assert statePermissionMatrix.generation == generation + 2
+    statePermissionMatrix.invalidate()
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_fkeyloader_batches(LoadersContext, DemoData):
+    loaders = LoadersContext["loaders"]
+    memberships = DemoData["memberships"]
+    user_ids = [user["id"] for user in DemoData["users"]]
+
+    batches = []
+    loader = loaders.memberships_user_id
+    batch_load_fn = loader.batch_load_fn
+    async def counted(keys):
+        batches.append(keys)
+        return await batch_load_fn(keys)
+    loader.batch_load_fn = counted
+
+    results = await asyncio.gather(*(loader.load(user_id) for user_id in user_ids))
+    assert len(batches) == 1, "all keys from the same tick should share one query"
+
+    for user_id, rows in zip(user_ids, results):
+        expected = set(membership["id"] for membership in memberships if membership["user_id"] == user_id)
+        assert set(row.id for row in rows) == expected
+
+    # 👇 rows are registered into id loader
+    assert loaders.MembershipModel_user_id is loader
+    for rows in results:
+        for row in rows:
+            assert (await loaders.memberships.load(row.id)) is row
+
+@pytest.mark.asyncio
+async def test_memberofloader_batches(LoadersContext, DemoData):
+    loaders = LoadersContext["loaders"]
+    groups = {group["id"]: group for group in DemoData["groups"]}
+    memberships = DemoData["memberships"]
+    user_ids = [user["id"] for user in DemoData["users"]]
+    grouptype_id = groups[memberships[0]["group_id"]]["grouptype_id"]
+    keys = [(user_id, None) for user_id in user_ids] + [(user_id, grouptype_id) for user_id in user_ids]
+
+    batches = []
+    loader = loaders.memberof
+    batch_load_fn = loader.batch_load_fn
+    async def counted(keys):
+        batches.append(keys)
+        return await batch_load_fn(keys)
+    loader.batch_load_fn = counted
+
+    results = await asyncio.gather(*(loader.load(key) for key in keys))
+    assert len(batches) == 1, "all keys from the same tick should share one query"
+
+    for (user_id, typeFilter), rows in zip(keys, results):
+        expected = set(
+            membership["group_id"] for membership in memberships
+            if membership["user_id"] == user_id and (typeFilter is None or groups[membership["group_id"]]["grouptype_id"] == typeFilter)
+        )
+        assert len(rows) == len(set(row.id for row in rows)), "each group once"
+        assert set(row.id for row in rows) == expected
+    assert any(len(rows) > 0 for rows in results[len(user_ids):])
+
+    # 👇 groups are registered into id loader
+    for rows in results:
+        for row in rows:
+            assert (await loaders.groups.load(row.id)) is row
+
+@pytest.mark.asyncio
+async def test_fkeyloader_str_keys(LoadersContext, DemoData):
+    loaders = LoadersContext["loaders"]
+    memberships = DemoData["memberships"]
+    user_id = memberships[0]["user_id"]
+    expected = set(membership["id"] for membership in memberships if membership["user_id"] == user_id)
+
+    loader = loaders.memberships_user_id
+    # 👇 id z JWT je str, vysledek musi byt stejny jako pro uuid.UUID
+    rowsStr, rowsUUID = await asyncio.gather(loader.load(f"{user_id}"), loader.load(user_id))
+    assert set(row.id for row in rowsStr) == expected
+    assert rowsStr is rowsUUID
+    [rows] = await loader.load_many([f"{user_id}"])
+    assert rows is rowsUUID
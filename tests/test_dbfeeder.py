@@ -0,0 +1,52 @@
+import json
+import pytest
+import sqlalchemy
+
+
+def test_iterjsontables(tmp_path):
+    from src.DBFeeder import iterJsonTables
+
+    data = {
+        "numbers": [1, 12345, -3.5e10, None, True],
+        "empty": [],
+        "scalar": {"not": ["a", "table"]},
+        "rows": [{"id": "a", "name": "ž\"x\""}, {"id": "b", "nested": {"list": [1, 2, {"x": "]}"}]}}]
+    }
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    # 👇 maly blok, hodnoty se lamou mezi bloky
+    for blockSize in [1, 3, 7, 1 << 16]:
+        result = {}
+        for (tableName, row) in iterJsonTables(path, blockSize=blockSize):
+            result.setdefault(tableName, []).append(row)
+        assert result == {"numbers": data["numbers"], "rows": data["rows"]}
+
+    assert list(iterJsonTables(path, tableNames=["rows"])) == [("rows", row) for row in data["rows"]]
+
+@pytest.mark.asyncio
+async def test_importtables(Async_Session_Maker, DemoData):
+    from src.DBDefinitions import allModels, GroupModel, UserModel
+    from src.DBFeeder import importTables
+
+    timings = await importTables(Async_Session_Maker, allModels, batchSize=5)
+    assert list(timings.keys()) == [DBModel.__tablename__ for DBModel in allModels]
+    assert timings["users"][0] == len(DemoData["users"])
+    assert timings["groups"][0] == len(DemoData["groups"])
+
+    async with Async_Session_Maker() as session:
+        users = {row.id: row for row in (await session.execute(sqlalchemy.select(UserModel))).scalars()}
+        groups = {row.id: row for row in (await session.execute(sqlalchemy.select(GroupModel))).scalars()}
+    for user in DemoData["users"]:
+        row = users[user["id"]]
+        assert row.name == user["name"]
+        assert row.valid is True
+        assert row.created is not None
+    for group in DemoData["groups"]:
+        row = groups[group["id"]]
+        assert row.mastergroup_id == group.get("mastergroup_id", None)
+        assert row.lastchange == group["lastchange"]
+
+    # 👇 opakovany import nic nevklada
+    timings = await importTables(Async_Session_Maker, allModels)
+    assert all(count == 0 for (count, seconds) in timings.values())
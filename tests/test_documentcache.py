@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_document_cache(SchemaExecutor, DemoData):
+    from src.GraphTypeDefinitions._GraphExtensions import (
+        documentCache,
+        documentCacheHits,
+        documentCacheMisses,
+        queryHash
+    )
+    documentCache.invalidate()
+
+    query = "query($id: UUID!) { userById(id: $id) { id name } }"
+    user = DemoData["users"][0]
+    hits = documentCacheHits._value.get()
+    misses = documentCacheMisses._value.get()
+    for _ in range(3):
+        result = await SchemaExecutor(query=query, variable_values={"id": f"{user['id']}"})
+        assert result.get("errors", None) is None, result
+        assert result["data"]["userById"]["name"] == user["name"]
+    assert documentCacheMisses._value.get() == misses + 1
+    assert documentCacheHits._value.get() == hits + 2
+    assert documentCache.getQuery(queryHash(query)) == query
+
+    # 👇 chyba validace je ulozena spolu s dokumentem
+    invalid = "{ userById(id: \"x\") { unknownField } }"
+    for _ in range(2):
+        result = await SchemaExecutor(query=invalid)
+        assert result.get("errors", None) is not None
+        assert result["data"] is None
+    assert documentCache.get(queryHash(invalid)).errors
+
+    # 👇 dotaz, ktery nejde rozparsovat, se neuklada
+    broken = "{ userById("
+    result = await SchemaExecutor(query=broken)
+    assert result.get("errors", None) is not None
+    assert documentCache.get(queryHash(broken)) is None
+    documentCache.invalidate()
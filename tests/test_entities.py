@@ -0,0 +1,37 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_entities_batched(SchemaExecutor, DemoData):
+    from src.Caches import rbacObjectKinds
+    rbacObjectKinds.invalidate()
+
+    users = DemoData["users"][:3]
+    groups = DemoData["groups"][:3]
+    representations = []
+    for user, group in zip(users, groups):
+        representations.append({"__typename": "UserGQLModel", "id": f"{user['id']}"})
+        representations.append({"__typename": "GroupGQLModel", "id": f"{group['id']}"})
+        representations.append({"__typename": "RBACObjectGQLModel", "id": f"{group['id']}"})
+    representations.append({"__typename": "RBACObjectGQLModel", "id": f"{users[0]['id']}"})
+    representations.append({"__typename": "UserGQLModel", "id": "00000000-0000-0000-0000-000000000000"})
+
+    query = """query($representations: [_Any!]!) {
+        _entities(representations: $representations) {
+            ... on UserGQLModel { id name }
+            ... on GroupGQLModel { id name }
+            ... on RBACObjectGQLModel { id }
+        }
+    }"""
+    for _ in range(2):
+        result = await SchemaExecutor(query=query, variable_values={"representations": representations})
+        assert result.get("errors", None) is None, result
+        entities = result["data"]["_entities"]
+        assert len(entities) == len(representations)
+        for representation, entity in zip(representations[:-1], entities):
+            assert entity["id"] == representation["id"]
+        assert entities[-1] is None
+
+    assert rbacObjectKinds.get(groups[0]["id"]) == "group"
+    assert rbacObjectKinds.get(users[0]["id"]) == "user"
+    rbacObjectKinds.invalidate()
@@ -0,0 +1,20 @@
+import json
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson(SQLite, DemoData):
+    from src.Export import exportModels, exportNDJSON
+    for (entity, DBModel) in exportModels.items():
+        chunks = [chunk async for chunk in exportNDJSON(SQLite, DBModel, batchSize=2)]
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        assert len(rows) == len(DemoData[entity]), entity
+        assert {row["id"] for row in rows} == {f"{item['id']}" for item in DemoData[entity]}
+        if len(rows) > 2:
+            assert len(chunks) > 1, "rows are expected to be streamed in batches"
+
+@pytest.mark.asyncio
+async def test_export_admin_check(Context):
+    from src.Export import isAdmin
+    assert await isAdmin(Context)
+    assert not await isAdmin({**Context, "user": None})
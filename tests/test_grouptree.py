@@ -0,0 +1,287 @@
+import uuid
+import pytest
+import sqlalchemy
+
+
+async def walk(async_session_maker, group_id):
+    from src.GroupTree import walkGroupAncestorIds
+    return tuple(await walkGroupAncestorIds(async_session_maker, group_id))
+
+@pytest.mark.asyncio
+async def test_groupclosure_matches_mastergroups(SQLite, DemoData):
+    from src.GroupTree import getGroupAncestorIds, ancestryIndex
+    async_session_maker = SQLite
+    ancestryIndex.invalidate()
+
+    for group in DemoData["groups"]:
+        ancestorIds = await getGroupAncestorIds(async_session_maker, group["id"])
+        assert ancestorIds == await walk(async_session_maker, group["id"]), f"bad closure for {group}"
+        assert ancestorIds[0] == group["id"]
+
+@pytest.mark.asyncio
+async def test_groupclosure_insert_move_delete(SQLite, DemoData):
+    from src.DBDefinitions import GroupModel, GroupClosureModel
+    from src.GroupTree import (
+        getGroupAncestorIds,
+        ancestryIndex,
+        groupClosureInsert,
+        groupClosureMove,
+        groupClosureDelete
+    )
+    async_session_maker = SQLite
+    groups = DemoData["groups"]
+    root = next(group for group in groups if group.get("mastergroup_id", None) is None)
+    other = next(group for group in groups if group.get("mastergroup_id", None) is not None)
+
+    parent_id = uuid.uuid1()
+    child_id = uuid.uuid1()
+    async with async_session_maker() as session:
+        async with session.begin():
+            session.add(GroupModel(id=parent_id, name="parent", mastergroup_id=root["id"]))
+            session.add(GroupModel(id=child_id, name="child", mastergroup_id=parent_id))
+    async with async_session_maker() as session:
+        async with session.begin():
+            await groupClosureInsert(session, parent_id, root["id"])
+            await groupClosureInsert(session, child_id, parent_id)
+    assert await getGroupAncestorIds(async_session_maker, child_id) == await walk(async_session_maker, child_id)
+
+    async with async_session_maker() as session:
+        async with session.begin():
+            parent = await session.get(GroupModel, parent_id)
+            parent.mastergroup_id = other["id"]
+            await groupClosureMove(session, parent_id, other["id"])
+    ancestryIndex.invalidate(parent_id)
+    assert await getGroupAncestorIds(async_session_maker, child_id) == await walk(async_session_maker, child_id)
+
+    async with async_session_maker() as session:
+        async with session.begin():
+            await groupClosureDelete(session, child_id)
+    async with async_session_maker() as session:
+        rows = await session.execute(
+            sqlalchemy.select(GroupClosureModel.id).where(GroupClosureModel.descendant_id == child_id)
+        )
+        assert len(list(rows)) == 0
+
+@pytest.mark.asyncio
+async def test_groupclosure_rebuild_idempotent(SQLite, DemoData):
+    import asyncio
+    from src.DBDefinitions import GroupClosureModel
+    from src.GroupTree import rebuildGroupClosure, ancestryIndex
+    async_session_maker = SQLite
+
+    async def closureRows():
+        async with async_session_maker() as session:
+            rows = await session.execute(sqlalchemy.select(
+                GroupClosureModel.id, GroupClosureModel.ancestor_id, GroupClosureModel.descendant_id, GroupClosureModel.depth))
+            return set(tuple(row) for row in rows)
+
+    before = await closureRows()
+    # 👇 spravna tabulka se nemeni (ani id radku), soubezne srovnani nic neduplikuje
+    await asyncio.gather(*(rebuildGroupClosure(async_session_maker) for _ in range(3)))
+    assert await closureRows() == before
+
+    # 👇 chybejici a poskozene radky se doplni / opravi
+    group = next(group for group in DemoData["groups"] if group.get("mastergroup_id", None) is not None)
+    async with async_session_maker() as session:
+        async with session.begin():
+            await session.execute(sqlalchemy.delete(GroupClosureModel).where(GroupClosureModel.descendant_id == group["id"]))
+            await session.execute(
+                sqlalchemy.update(GroupClosureModel)
+                .where(GroupClosureModel.descendant_id == group["mastergroup_id"])
+                .values(depth=GroupClosureModel.depth + 5))
+    await rebuildGroupClosure(async_session_maker)
+    ancestryIndex.invalidate()
+    after = await closureRows()
+    assert set(row[1:] for row in after) == set(row[1:] for row in before)
+
+    # 👇 dvojice (predek, potomek) je unikatni
+    with pytest.raises(sqlalchemy.exc.IntegrityError):
+        async with async_session_maker() as session:
+            async with session.begin():
+                await session.execute(sqlalchemy.insert(GroupClosureModel), [
+                    {"id": uuid.uuid4(), "ancestor_id": group["id"], "descendant_id": group["id"], "depth": 0}
+                ])
+
+@pytest.mark.asyncio
+async def test_grouptree_query(SchemaExecutor, DemoData):
+    from src.GroupTree import adjacencyIndex
+    adjacencyIndex.invalidate()
+    groups = DemoData["groups"]
+    root = next(group for group in groups if group.get("mastergroup_id", None) is None)
+
+    def children(group_id):
+        return sorted(
+            (group for group in groups if group.get("mastergroup_id", None) == group_id),
+            key=lambda group: group["name"])
+
+    def expected(group_id, level, depth):
+        group = next(group for group in groups if group["id"] == group_id)
+        result = [(f"{group_id}", level)]
+        if (depth is None) or (level < depth):
+            for child in children(group_id):
+                result.extend(expected(child["id"], level + 1, depth))
+        return result
+
+    query = """query($id: UUID!, $depth: Int) {
+        groupTree(rootId: $id, depth: $depth) { id depth mastergroupId group { id name } }
+    }"""
+    for depth in [None, 0, 1]:
+        result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "depth": depth})
+        assert result.get("errors", None) is None, result
+        nodes = result["data"]["groupTree"]
+        assert [(node["id"], node["depth"]) for node in nodes] == expected(root["id"], 0, depth)
+        assert all(node["group"]["id"] == node["id"] for node in nodes)
+
+    query = """query($id: UUID!) { groupById(id: $id) { id subgroups { id } } }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}"})
+    assert result.get("errors", None) is None, result
+    assert [group["id"] for group in result["data"]["groupById"]["subgroups"]] == [f"{group['id']}" for group in children(root["id"])]
+
+    query = """query($id: UUID!, $skip: Int, $limit: Int) { groupById(id: $id) { subgroups(skip: $skip, limit: $limit) { id } } }"""
+    for (skip, limit, expected_ids) in [(-5, 1, children(root["id"])[:1]), (0, -1, []), (None, None, children(root["id"]))]:
+        result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "skip": skip, "limit": limit})
+        assert result.get("errors", None) is None, result
+        assert [group["id"] for group in result["data"]["groupById"]["subgroups"]] == [f"{group['id']}" for group in expected_ids]
+
+    # 👇 index je udrzovan mutacemi
+    new_id = f"{uuid.uuid1()}"
+    mutation = """mutation($id: UUID!, $masterId: UUID!, $typeId: UUID!) {
+        groupInsert(group: {id: $id, name: "AAA new", mastergroupId: $masterId, grouptypeId: $typeId}) { id msg }
+    }"""
+    result = await SchemaExecutor(query=mutation, variable_values={"id": new_id, "masterId": f"{root['id']}", "typeId": f"{root['grouptype_id']}"})
+    assert result.get("errors", None) is None, result
+    node = adjacencyIndex.node(uuid.UUID(new_id))
+    assert node is not None and node.mastergroup_id == root["id"]
+    assert adjacencyIndex.childIds(root["id"])[0] == uuid.UUID(new_id)
+
+    other = next(group for group in groups if group.get("mastergroup_id", None) is not None)
+    query = """query($id: UUID!) { groupById(id: $id) { lastchange } }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": new_id})
+    mutation = """mutation($id: UUID!, $lastchange: DateTime!, $masterId: UUID!) {
+        groupUpdate(group: {id: $id, lastchange: $lastchange, mastergroupId: $masterId}) { id msg }
+    }"""
+    result = await SchemaExecutor(query=mutation, variable_values={
+        "id": new_id, "lastchange": result["data"]["groupById"]["lastchange"], "masterId": f"{other['id']}"})
+    assert result.get("errors", None) is None, result
+    assert result["data"]["groupUpdate"]["msg"] == "ok"
+    assert adjacencyIndex.node(uuid.UUID(new_id)).mastergroup_id == other["id"]
+    assert uuid.UUID(new_id) in adjacencyIndex.childIds(other["id"])
+    assert uuid.UUID(new_id) not in adjacencyIndex.childIds(root["id"])
+
+    mutation = """mutation($id: UUID!) { groupDelete(id: $id) { msg } }"""
+    result = await SchemaExecutor(query=mutation, variable_values={"id": new_id})
+    assert result.get("errors", None) is None, result
+    assert adjacencyIndex.node(uuid.UUID(new_id)) is None
+    assert uuid.UUID(new_id) not in adjacencyIndex.childIds(other["id"])
+    adjacencyIndex.invalidate()
+
+@pytest.mark.asyncio
+async def test_group_ancestors_descendants(SchemaExecutor, DemoData):
+    groups = DemoData["groups"]
+    byId = {group["id"]: group for group in groups}
+    root = next(group for group in groups if group.get("mastergroup_id", None) is None)
+
+    def descendants(group_id, level=1):
+        for group in groups:
+            if group.get("mastergroup_id", None) == group_id:
+                yield (group, level)
+                yield from descendants(group["id"], level + 1)
+
+    query = """query($id: UUID!, $maxDepth: Int, $grouptypeId: UUID) {
+        groupDescendants(id: $id, maxDepth: $maxDepth, grouptypeId: $grouptypeId) { id depth group { id name } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}"})
+    assert result.get("errors", None) is None, result
+    nodes = result["data"]["groupDescendants"]
+    expected = sorted(((f"{group['id']}", level) for (group, level) in descendants(root["id"])), key=lambda item: item[1])
+    assert sorted((node["id"], node["depth"]) for node in nodes) == sorted(expected)
+    assert [node["depth"] for node in nodes] == sorted(node["depth"] for node in nodes)
+    assert all(node["group"]["id"] == node["id"] for node in nodes)
+
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "maxDepth": 1})
+    assert {node["id"] for node in result["data"]["groupDescendants"]} == {f"{group['id']}" for (group, level) in descendants(root["id"]) if level == 1}
+
+    (deepest, level) = max(descendants(root["id"]), key=lambda item: item[1])
+    grouptype_id = deepest["grouptype_id"]
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "grouptypeId": f"{grouptype_id}"})
+    assert {node["id"] for node in result["data"]["groupDescendants"]} == {
+        f"{group['id']}" for (group, level) in descendants(root["id"]) if group["grouptype_id"] == grouptype_id}
+
+    query = """query($id: UUID!) { groupAncestors(id: $id) { id depth } }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{deepest['id']}"})
+    assert result.get("errors", None) is None, result
+    expected = []
+    current = byId[deepest["mastergroup_id"]]
+    while current is not None:
+        expected.append((f"{current['id']}", len(expected) + 1))
+        current = byId.get(current.get("mastergroup_id", None), None)
+    assert [(node["id"], node["depth"]) for node in result["data"]["groupAncestors"]] == expected
+
+@pytest.mark.asyncio
+async def test_group_all_members(SchemaExecutor, DemoData):
+    groups = DemoData["groups"]
+    root = next(group for group in groups if group.get("mastergroup_id", None) is None)
+
+    def subtree(group_id):
+        yield group_id
+        for group in groups:
+            if group.get("mastergroup_id", None) == group_id:
+                yield from subtree(group["id"])
+
+    groupIds = set(subtree(root["id"]))
+    expected = sorted({
+        membership["user_id"] for membership in DemoData["memberships"]
+        if membership["group_id"] in groupIds and membership.get("valid", True)
+    })
+    assert len(expected) > 2
+
+    query = """query($id: UUID!, $first: Int, $after: String) {
+        groupById(id: $id) { allMembers(first: $first, after: $after) { id cursor } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "first": 1000})
+    assert result.get("errors", None) is None, result
+    assert [user["id"] for user in result["data"]["groupById"]["allMembers"]] == [f"{id}" for id in expected]
+
+    # 👇 null znamena vychozi velikost stranky, zaporna velikost prazdnou stranku
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "first": None})
+    assert result.get("errors", None) is None, result
+    assert [user["id"] for user in result["data"]["groupById"]["allMembers"]] == [f"{id}" for id in expected[:100]]
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "first": -1})
+    assert result.get("errors", None) is None, result
+    assert result["data"]["groupById"]["allMembers"] == []
+
+    # 👇 po strankach (keyset podle id, kurzor posledniho uzivatele)
+    ids = []
+    after = None
+    while True:
+        result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "first": 2, "after": after})
+        assert result.get("errors", None) is None, result
+        page = result["data"]["groupById"]["allMembers"]
+        if len(page) == 0:
+            break
+        ids.extend(user["id"] for user in page)
+        after = page[-1]["cursor"]
+    assert ids == [f"{id}" for id in expected]
+
+    user = next(user for user in DemoData["users"] if user["id"] == expected[0])
+    query = """query($id: UUID!, $where: UserInputWhereFilter) {
+        groupById(id: $id) { allMembers(where: $where) { id } }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{root['id']}", "where": {"email": {"_eq": user["email"]}}})
+    assert result.get("errors", None) is None, result
+    assert [user["id"] for user in result["data"]["groupById"]["allMembers"]] == [f"{user['id']}"]
+
+@pytest.mark.asyncio
+async def test_group_insert_rolls_back_with_closure(Info, SQLite, DemoData):
+    from src.GraphTypeDefinitions.groupGQLModel import GroupGQLModel, GroupInsertGQLModel, GroupResultGQLModel
+    from src.GraphTypeDefinitions._GraphResolvers import encapsulateInsert
+    from src.DBDefinitions import GroupModel
+    loader = GroupGQLModel.getLoader(Info)
+    group = GroupInsertGQLModel(id=uuid.uuid1(), name="rolled back", grouptype_id=DemoData["groups"][0]["grouptype_id"])
+
+    async def failingClosure(session, row):
+        raise RuntimeError("closure failed")
+    with pytest.raises(RuntimeError):
+        await encapsulateInsert(Info, loader, group, GroupResultGQLModel(id=group.id, msg="ok"), inTransaction=failingClosure)
+    async with SQLite() as session:
+        assert await session.get(GroupModel, group.id) is None
@@ -0,0 +1,22 @@
+import queue
+import logging
+
+
+def test_deferredqueuehandler_formats_mutable_args(DemoFalse, FastAPIClient):
+    from main import DeferredQueueHandler
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+
+    def makeRecord(msg, args):
+        return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+    # 👇 nemenne argumenty, skladani zpravy se odklada
+    record = handler.prepare(makeRecord("user %s has %s roles", ("john", 3)))
+    assert record.args == ("john", 3)
+    assert record.getMessage() == "user john has 3 roles"
+
+    # 👇 menitelny argument, zprava je slozena hned (pozdejsi zmena se neprojevi)
+    context = {"user": "john"}
+    record = handler.prepare(makeRecord("context %s", (context,)))
+    context["user"] = "julia"
+    assert record.args is None
+    assert record.getMessage() == "context {'user': 'john'}"
@@ -0,0 +1,67 @@
+import pytest
+
+
+async def pageAll(SchemaExecutor, orderby=None, desc=None, first=3):
+    query = """query($first: Int, $after: String, $orderby: String, $desc: Boolean) {
+        userPage(first: $first, after: $after, orderby: $orderby, desc: $desc) { id name cursor }
+    }"""
+    result = []
+    after = None
+    while True:
+        response = await SchemaExecutor(query=query, variable_values={"first": first, "after": after, "orderby": orderby, "desc": desc})
+        assert response.get("errors", None) is None, response
+        page = response["data"]["userPage"]
+        result.extend(page)
+        if len(page) < first:
+            return result
+        after = page[-1]["cursor"]
+
+@pytest.mark.asyncio
+async def test_keyset_pagination(SchemaExecutor, DemoData):
+    users = DemoData["users"]
+    byId = sorted(users, key=lambda user: f"{user['id']}")
+    rows = await pageAll(SchemaExecutor)
+    assert [row["id"] for row in rows] == [f"{user['id']}" for user in byId]
+
+    rows = await pageAll(SchemaExecutor, orderby="name", desc=True)
+    assert len(rows) == len(users)
+    assert len({row["id"] for row in rows}) == len(users)
+    expected = sorted(users, key=lambda user: (user["name"], f"{user['id']}"), reverse=True)
+    assert [row["id"] for row in rows] == [f"{user['id']}" for user in expected]
+
+@pytest.mark.asyncio
+async def test_max_page_size(SchemaExecutor, DemoData, monkeypatch):
+    from src.GraphTypeDefinitions import _GraphResolvers
+    monkeypatch.setattr(_GraphResolvers, "GQL_MAX_PAGE_SIZE", 2)
+    for query in ["{ userPage(limit: 100) { id } }", "{ userPage(first: 100) { id } }"]:
+        response = await SchemaExecutor(query=query)
+        assert response.get("errors", None) is None, response
+        assert len(response["data"]["userPage"]) == 2
+
+@pytest.mark.asyncio
+async def test_page_size_defaults_and_cursor(SchemaExecutor, DemoData):
+    from src.GraphTypeDefinitions._GraphResolvers import encodeCursor, decodeCursor, PAGE_SIZE
+    users = DemoData["users"]
+    # 👇 null znamena vychozi velikost stranky
+    for query in ["{ userPage(limit: null) { id } }", "{ userPage(first: null, after: null) { id } }"]:
+        response = await SchemaExecutor(query=query)
+        assert response.get("errors", None) is None, response
+        assert len(response["data"]["userPage"]) == min(PAGE_SIZE, len(users))
+
+    cursor = encodeCursor(users[0]["id"])
+    assert decodeCursor(cursor) == users[0]["id"]
+    response = await SchemaExecutor(query="""query($after: String) { userPage(after: $after, first: null) { id } }""", variable_values={"after": cursor})
+    assert response.get("errors", None) is None, response
+
+    response = await SchemaExecutor(query="""{ userPage(after: "not a cursor") { id } }""")
+    assert response.get("errors", None) is not None
+
+@pytest.mark.asyncio
+async def test_negative_page_size(SchemaExecutor, DemoData, monkeypatch):
+    from src.GraphTypeDefinitions import _GraphResolvers
+    monkeypatch.setattr(_GraphResolvers, "GQL_MAX_PAGE_SIZE", 2)
+    # 👇 LIMIT -1 je v SQLite bez omezeni, nesmi obejit GQL_MAX_PAGE_SIZE
+    for query in ["{ userPage(limit: -1) { id } }", "{ userPage(first: -1) { id } }", "{ userPage(skip: -5, limit: -1) { id } }"]:
+        response = await SchemaExecutor(query=query)
+        assert response.get("errors", None) is None, response
+        assert response["data"]["userPage"] == []
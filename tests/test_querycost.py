@@ -0,0 +1,71 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_query_cost(SQLite, Info):
+    from src.GraphTypeDefinitions import schema
+
+    query = "query($limit: Int!) { userPage(limit: $limit) { id memberships { group { id } } } }"
+    result = await schema.execute(query=query, variable_values={"limit": 5}, context_value=Info.context)
+    assert result.errors is None, result.errors
+    # 👇 userPage 5 radku, memberships 5 * 10, group 5 * 10
+    assert result.extensions["cost"]["estimated"] == 5 + 50 + 50
+    assert result.extensions["cost"]["depth"] == 3
+
+    query = """{ groupPage { subgroups { subgroups { subgroups { memberships { user { roles { group { id } } } } } } } } }"""
+    result = await schema.execute(query=query, context_value=Info.context)
+    assert result.data is None
+    assert len(result.errors) == 1
+    assert result.errors[0].extensions["code"] == "QUERY_TOO_COMPLEX"
+    assert result.extensions["cost"]["estimated"] > result.extensions["cost"]["maxCost"]
+
+@pytest.mark.asyncio
+async def test_query_cost_fragments(SQLite, Info):
+    from src.GraphTypeDefinitions._GraphExtensions import QueryCost
+    from src.GraphTypeDefinitions import schema
+    from graphql import parse
+    from graphql.utilities import get_operation_ast
+
+    document = parse("""
+        query { groupPage(skip: 5, limit: 2) { ...G ... on GroupGQLModel { roles(limit: 3) { id } } } }
+        fragment G on GroupGQLModel { subgroups { id } }
+    """)
+    (cost, depth) = QueryCost(schema._schema, document).ofOperation(get_operation_ast(document))
+    # 👇 groupPage 5 + 2 radku, subgroups 2 * 100, roles 2 * 3
+    assert cost == 7 + 200 + 6
+    assert depth == 2
+
+@pytest.mark.asyncio
+async def test_query_cost_negative_and_unbounded(SQLite, Info):
+    from src.GraphTypeDefinitions._GraphExtensions import QueryCost, GQL_COST_LIST_SIZE, GQL_COST_UNBOUNDED_LIST_SIZE
+    from src.GraphTypeDefinitions import schema
+    from graphql import parse
+    from graphql.utilities import get_operation_ast
+
+    def cost(query, variables=None):
+        document = parse(query)
+        return QueryCost(schema._schema, document, variables).ofOperation(get_operation_ast(document))[0]
+
+    expensive = "userPage(limit: 100) { memberships(limit: 100) { id } }"
+    base = cost(f"{{ {expensive} }}")
+    assert base == 100 + 100 * 100
+    # 👇 zaporne skip / limit / first nesmi snizit odhad sourozence
+    for sibling in [
+        "userPage(skip: -100000000, limit: 1) { id }",
+        "a: userPage(limit: -100000000) { id }",
+        "b: userPage(first: -100000000) { id }",
+        "groupPage(limit: 1) { subgroups(skip: -100000000, limit: 1) { id } }",
+        "groupPage(limit: 1) { subgroups(limit: -100000000) { id } }",
+    ]:
+        assert cost(f"{{ {expensive} {sibling} }}") >= base, sibling
+    assert cost("query($skip: Int) { userPage(skip: $skip, limit: 1) { id } }", {"skip": -100}) == 1
+    assert cost("{ userPage(first: 100000000) { id } }") == 1000
+
+    # 👇 seznamy bez velikosti (a s null) jsou neomezene
+    id = "00000000-0000-0000-0000-000000000000"
+    assert cost(f'{{ groupTree(rootId: "{id}") {{ id }} }}') == GQL_COST_UNBOUNDED_LIST_SIZE
+    assert cost(f'{{ groupDescendants(id: "{id}") {{ id }} }}') == GQL_COST_UNBOUNDED_LIST_SIZE
+    assert cost(f'{{ groupById(id: "{id}") {{ allMembers(first: null) {{ id }} }} }}') == 1 + GQL_COST_UNBOUNDED_LIST_SIZE
+    assert cost("{ userPage(limit: 1) { memberOf { id } } }") == 1 + GQL_COST_UNBOUNDED_LIST_SIZE
+    # 👇 podrizene entity bez limit jsou omezeny rodicem
+    assert cost(f'{{ statemachineById(id: "{id}") {{ states {{ id }} }} }}') == 1 + GQL_COST_LIST_SIZE
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_roles_on_rbacobject(Info, DemoData):
+    from src.GraphTypeDefinitions.roleGQLModel import (
+        resolve_roles_on_rbacobject,
+        resolve_roles_on_user,
+        resolve_roles_on_group
+    )
+    ids = [user["id"] for user in DemoData["users"]] + [group["id"] for group in DemoData["groups"]]
+    for id in ids:
+        rows = await resolve_roles_on_rbacobject(Info, rbacobject_id=id)
+        result0, result1 = await asyncio.gather(
+            resolve_roles_on_user(None, Info, user_id=id),
+            resolve_roles_on_group(None, Info, group_id=id)
+        )
+        expected = set(row.id for row in [*result0, *result1])
+        assert set(row.id for row in rows) == expected, f"roles differ for {id}"
+
+@pytest.mark.asyncio
+async def test_authorization_cache_shares_decisions(Info):
+    from src.Dataloaders import getLoadersFromInfo
+    authorizations = getLoadersFromInfo(Info).authorizations
+    calls = []
+    async def decide():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return True
+
+    key = ("user", "rbacobject", frozenset(["role"]))
+    results = await asyncio.gather(*(authorizations.decide(key, decide) for _ in range(10)))
+    assert results == [True] * 10
+    assert len(calls) == 1
+
+    async def fail():
+        raise ValueError("failed decision")
+    with pytest.raises(ValueError):
+        await authorizations.decide(("user", None, frozenset()), fail)
+    assert await authorizations.decide(("user", None, frozenset()), decide) is True
+
+@pytest.mark.asyncio
+async def test_rbacroles_loader_batches(Info, DemoData):
+    from src.Dataloaders import getLoadersFromInfo
+    from src.GraphTypeDefinitions.roleGQLModel import resolve_roles_on_user, resolve_roles_on_group
+    loader = getLoadersFromInfo(Info).rbacroles
+    batches = []
+    batch_load_fn = loader.batch_load_fn
+    async def counted(keys):
+        batches.append(keys)
+        return await batch_load_fn(keys)
+    loader.batch_load_fn = counted
+
+    ids = [user["id"] for user in DemoData["users"]] + [group["id"] for group in DemoData["groups"]]
+    results = await asyncio.gather(*(loader.load(id) for id in ids))
+    assert len(batches) == 1, "all rbacobjects from the same tick should share one query"
+    for id, rows in zip(ids, results):
+        result0, result1 = await asyncio.gather(
+            resolve_roles_on_user(None, Info, user_id=id),
+            resolve_roles_on_group(None, Info, group_id=id)
+        )
+        expected = set(row.id for row in [*result0, *result1])
+        assert set(row.id for row in rows) == expected, f"roles differ for {id}"
+
+@pytest.mark.asyncio
+async def test_rolebasedpermission_list_batches(SchemaExecutor, Info, DemoData):
+    from src.Dataloaders import getLoadersFromInfo
+    from src.Caches import roleTypeCache
+    # 👇 studena pamet typu roli, vysledek nesmi zalezet na predchozich testech
+    roleTypeCache.invalidate()
+    loader = getLoadersFromInfo(Info).rbacroles
+    batches = []
+    batch_load_fn = loader.batch_load_fn
+    async def counted(keys):
+        batches.append(keys)
+        return await batch_load_fn(keys)
+    loader.batch_load_fn = counted
+
+    result = await SchemaExecutor(query="query { userPage(limit: 100) { id gdpr } }", variable_values={})
+    assert result.get("errors", None) is None, result
+    users = result["data"]["userPage"]
+    assert len(users) == len(DemoData["users"])
+    assert sum(len(keys) for keys in batches) == len(users)
+    assert len(batches) == 1, "has_permission of list items should share one roles query"
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_initstate_ready():
+    from src.Readiness import InitState, NotReadyError
+
+    initState = InitState()
+    assert initState.isReady()
+    await initState.waitReady(timeout=0.01)
+
+    initState.starting()
+    assert not initState.isReady()
+    with pytest.raises(NotReadyError):
+        await initState.waitReady(timeout=0.01)
+
+    async def initDB():
+        await asyncio.sleep(0.05)
+        initState.tableImported("roletypes", 14, 0.01)
+        return "done"
+
+    task = asyncio.create_task(initState.track(initDB()))
+    await asyncio.sleep(0)
+    assert initState.state == "seeding"
+    # 👇 ceka se na dokonceni, ne na timeout
+    await initState.waitReady(timeout=5)
+    assert initState.state == "ready"
+    assert await task == "done"
+    assert initState.asDict()["tables"] == {"roletypes": {"rows": 14, "seconds": 0.01}}
+
+@pytest.mark.asyncio
+async def test_initstate_failed():
+    from src.Readiness import InitState, NotReadyError
+
+    initState = InitState()
+    initState.starting()
+
+    async def initDB():
+        raise RuntimeError("db is down")
+
+    waiter = asyncio.create_task(initState.waitReady(timeout=5))
+    await initState.track(initDB())
+    assert initState.state == "failed"
+    with pytest.raises(NotReadyError):
+        await waiter
+    assert initState.asDict()["error"] == "db is down"
@@ -0,0 +1,53 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_user_can_many(SchemaExecutor, DemoData, AdminUser):
+    from src.Caches import statePermissionMatrix
+    statePermissionMatrix.invalidate()
+
+    states = DemoData["states"]
+    lists = {}
+    for item in DemoData["roletypelists"]:
+        lists.setdefault(f"{item['list_id']}", set()).add(f"{item['type_id']}")
+    role = DemoData["roles"][0]
+    group_id = f"{role['group_id']}"
+    userRoletypes = {f"{r['roletype_id']}" for r in DemoData["roles"] if r["user_id"] == role["user_id"] and r["group_id"] == role["group_id"]}
+
+    query = """query($access: StateDataAccessType!, $stateIds: [UUID!]!, $rbacobjectIds: [UUID!]!, $userId: UUID) {
+        userCanMany(access: $access, stateIds: $stateIds, rbacobjectIds: $rbacobjectIds, userId: $userId)
+    }"""
+    async def userCanMany(access):
+        result = await SchemaExecutor(query=query, variable_values={
+            "access": access,
+            "stateIds": [f"{state['id']}" for state in states],
+            "rbacobjectIds": [group_id] * len(states),
+            "userId": f"{role['user_id']}"
+        })
+        assert result.get("errors", None) is None, result
+        return result["data"]["userCanMany"]
+
+    for (access, listKey) in [("READ", "readerslist_id"), ("WRITE", "writerslist_id")]:
+        expected = [len(lists.get(f"{state[listKey]}", set()) & userRoletypes) > 0 for state in states]
+        assert await userCanMany(access) == expected
+
+    # 👇 zmena seznamu typu roli se musi projevit
+    (access, listKey, state) = next(
+        (access, listKey, state)
+        for (access, listKey) in [("READ", "readerslist_id"), ("WRITE", "writerslist_id")]
+        for state in states if len(lists.get(f"{state[listKey]}", set()) & userRoletypes) == 0)
+    mutation = """mutation($listId: UUID!, $roletypeId: UUID!) {
+        roleTypeListAddRole(roleTypeListId: $listId, roleTypeId: $roletypeId) { msg }
+    }"""
+    result = await SchemaExecutor(query=mutation, variable_values={"listId": f"{state[listKey]}", "roletypeId": f"{role['roletype_id']}"})
+    assert result.get("errors", None) is None, result
+    index = states.index(state)
+    assert (await userCanMany(access))[index] is True
+
+    query = """query($id: UUID!, $access: StateDataAccessType!, $rbacobjectId: UUID!, $userId: UUID) {
+        stateById(id: $id) { userCan(access: $access, rbacobjectId: $rbacobjectId, userId: $userId) }
+    }"""
+    result = await SchemaExecutor(query=query, variable_values={"id": f"{state['id']}", "access": access, "rbacobjectId": group_id, "userId": f"{role['user_id']}"})
+    assert result.get("errors", None) is None, result
+    assert result["data"]["stateById"]["userCan"] is True
+    statePermissionMatrix.invalidate()